@@ -0,0 +1,162 @@
+"""Throughput benchmark of github_crawler_multipage against the local mock github api
+
+Run from the root of the repository::
+
+    python -m benchmark.github_crawler_benchmark --urls 200 --pages 3 --pc 1 2 4 --item-size 100 1000
+    python -m benchmark.github_crawler_benchmark --pc 1 --item-size 10000 --json-codec json orjson
+    python -m benchmark.github_crawler_benchmark --pc 1 --item-size 10000 --projection id url
+    python -m benchmark.github_crawler_benchmark --urls 400 --pages 2 --large-pages 200 --pc 4 --concurrency 8 --schedule input history probe
+
+Every configuration is crawled in a fresh process so the peak RSS of one run does not leak into the next.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+from src.torlib.crawler import github_crawler as gc
+from src.torlib.crawler.metrics import CrawlMetrics
+from .mock_github_server import MockGithubServer
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def _crawl(kwargs, result):
+    with open(os.devnull, 'w') as devnull:
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = devnull
+        try:
+            metrics = CrawlMetrics()
+            start = time.perf_counter()
+            gc.github_crawler_multipage(metrics=metrics, **kwargs)
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+    # ru_maxrss is in KB on linux; the worker processes are reaped so they are counted in RUSAGE_CHILDREN
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # cpu time of the crawl process and its worker process
+    cpu = sum(getattr(resource.getrusage(who), field) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+              for field in ('ru_utime', 'ru_stime'))
+    result.put((elapsed, peak_rss, cpu, metrics.snapshot()))
+
+
+def _crawl_process(kwargs):
+    """ run the crawler in a new process and return (elapsed, peak_rss, cpu, metrics snapshot)"""
+    result = mp.Queue()
+    process = mp.Process(target=_crawl, args=(kwargs, result))
+    process.start()
+    output = result.get()
+    process.join()
+    return output
+
+
+def run_benchmark(urls=100, pages=3, items_per_page=100, item_size=100, latency=0.0, failure_rate=0.0, pc=1, mode='process',
+                  concurrency=100, output_format='json', token=2, output_dir=None, json_codec='auto', pretty_json=False, projection=None,
+                  large_pages=None, schedule='input'):
+    """ crawl urls x pages pages from a fresh mock server and return the throughput
+
+    Args:
+        urls (int, optional): number of url to crawl. Defaults to 100.
+        pages (int, optional): number of page of every url. Defaults to 3.
+        items_per_page (int, optional): number of item in each page. Defaults to 100.
+        item_size (int, optional): size of the payload of each item in byte. Defaults to 100.
+        latency (float, optional): latency of the mock server in second. Defaults to 0.
+        failure_rate (float, optional): probability that the mock server return 502. Defaults to 0.
+        pc (int, optional): number of process. Defaults to 1.
+        mode (string, optional): 'process' or 'async'. Defaults to 'process'.
+        concurrency (int, optional): number of page requested at the same time. Defaults to 100.
+        output_format (string, optional): output_format of the crawler. Defaults to 'json'.
+        token (int, optional): number of token. Defaults to 2.
+        output_dir (string, optional): output directory (a temporary directory is used if None). Defaults to None.
+        json_codec (string, optional): json_codec of the crawler. Defaults to 'auto'.
+        pretty_json (boolean, optional): pretty_json of the crawler. Defaults to False.
+        projection (list, optional): projection of the crawler. Defaults to None.
+        large_pages (int, optional): number of page of the last url instead of pages (a large url at the end of the input). Defaults to None.
+        schedule (string, optional): schedule of the crawler, 'history' crawl the url once before the measured run to record the page count. Defaults to 'input'.
+
+    Returns:
+        dict: configuration and urls_per_s, pages_per_s, latency_p50, latency_p99 (server side, in ms),
+            client_p50, client_p99 (upper bound of the latency histogram bucket of the crawler, in ms), retries, peak_rss_mb,
+            page_cpu_ms (cpu time of the crawler including the mock server thread), output_mb, seconds and requests (including the warm-up crawl)
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_dir = output_dir or tmp_dir
+        page_count = pages
+        if large_pages is not None:
+            page_count = {f'/repos/{i}/items': pages for i in range(urls)}
+            page_count[f'/repos/{urls - 1}/items'] = large_pages
+        total_pages = urls * pages if large_pages is None else (urls - 1) * pages + large_pages
+        with MockGithubServer(pages=page_count, items_per_page=items_per_page, item_size=item_size, latency=latency,
+                              failure_rate=failure_rate, rate_limit=10**9) as server:
+            kwargs = {'savename': [f'repo{i}' for i in range(urls)], 'url': [server.api_url(i) for i in range(urls)],
+                      'GHtoken': [f'token{i}' for i in range(token)], 'pc': pc, 'mode': mode, 'concurrency': concurrency,
+                      'output_dir': output_dir, 'log_file': os.path.join(tmp_dir, 'github_crawler_log.txt'),
+                      'output_format': output_format, 'pretty_json': pretty_json, 'json_codec': json_codec, 'projection': projection,
+                      'schedule': schedule}
+            if schedule == 'history':
+                # record the page count of every url in a warm-up crawl and remove its output
+                _crawl_process(kwargs)
+                for entry in os.scandir(output_dir):
+                    if entry.is_file() and not entry.name.startswith('.'):
+                        os.remove(entry.path)
+            elapsed, peak_rss, cpu, snapshot = _crawl_process(kwargs)
+            stats = server.stop()
+        output_size = sum(entry.stat().st_size for entry in os.scandir(output_dir) if entry.is_file() and not entry.name.startswith('.'))
+    return {'mode': mode, 'pc': pc, 'concurrency': concurrency, 'urls': urls, 'pages': pages, 'item_size': item_size, 'json_codec': json_codec,
+            'schedule': schedule, 'urls_per_s': urls / elapsed, 'pages_per_s': total_pages / elapsed,
+            'latency_p50': _percentile(stats['latencies'], 0.5) * 1000, 'latency_p99': _percentile(stats['latencies'], 0.99) * 1000,
+            'client_p50': snapshot['request_latency']['p50'] * 1000, 'client_p99': snapshot['request_latency']['p99'] * 1000,
+            'retries': snapshot['retries'], 'peak_rss_mb': peak_rss / 1024,
+            'page_cpu_ms': cpu / total_pages * 1000, 'output_mb': output_size / 1024**2, 'seconds': elapsed, 'requests': stats['requests']}
+
+
+COLUMNS = ('mode', 'pc', 'concurrency', 'item_size', 'json_codec', 'schedule', 'seconds', 'urls_per_s', 'pages_per_s', 'latency_p50', 'latency_p99', 'client_p99',
+           'peak_rss_mb', 'page_cpu_ms', 'output_mb')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--urls', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--items-per-page', type=int, default=100)
+    parser.add_argument('--item-size', type=int, nargs='+', default=[100])
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--pc', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--mode', nargs='+', default=['process'], choices=['process', 'async'])
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--output-format', default='json')
+    parser.add_argument('--json-codec', nargs='+', default=['auto'], choices=['auto', 'json', 'orjson'])
+    parser.add_argument('--pretty-json', action='store_true')
+    parser.add_argument('--projection', nargs='+', default=None, help='field path kept in the output')
+    parser.add_argument('--large-pages', type=int, default=None, help='number of page of the last url')
+    parser.add_argument('--schedule', nargs='+', default=['input'], choices=['input', 'history', 'probe'])
+    parser.add_argument('--json', action='store_true', help='print one json object per run instead of a table')
+    args = parser.parse_args(argv)
+    if not args.json:
+        print(''.join(f'{c:>13}' for c in COLUMNS))
+    for mode in args.mode:
+        for pc in (args.pc if mode == 'process' else [1]):
+            for item_size in args.item_size:
+                for json_codec, schedule in [(j, s) for j in args.json_codec for s in args.schedule]:
+                    row = run_benchmark(urls=args.urls, pages=args.pages, items_per_page=args.items_per_page, item_size=item_size,
+                                        latency=args.latency, failure_rate=args.failure_rate, pc=pc, mode=mode,
+                                        concurrency=args.concurrency, output_format=args.output_format,
+                                        json_codec=json_codec, pretty_json=args.pretty_json, projection=args.projection,
+                                        large_pages=args.large_pages, schedule=schedule)
+                    if args.json:
+                        print(json.dumps(row))
+                    else:
+                        print(''.join(f'{row[c]:>13.1f}' if isinstance(row[c], float) else f'{row[c]:>13}' for c in COLUMNS))
+
+
+if __name__ == '__main__':
+    main()
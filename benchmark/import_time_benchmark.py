@@ -0,0 +1,63 @@
+"""Import time budget of the torlib modules measured with python -X importtime
+
+Run from the root of the repository::
+
+    python -m benchmark.import_time_benchmark --budget-ms 100 torlib torlib.crawler.github_crawler
+
+Every module is imported in a fresh interpreter (the best of ``--runs`` is reported) and the command exit with 1
+when a module is slower than the budget or import one of the forbidden module (pbr, responses, requests, tqdm).
+``-X importtime`` need python 3.7+.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+# dependency that must not be imported by importing torlib.crawler.github_crawler
+FORBIDDEN = ('pbr', 'responses', 'requests', 'tqdm', 'multiprocessing', 'asyncio')
+
+
+def measure_import(module, runs=3):
+    """ import the module in a fresh interpreter and return its cumulative import time in ms (best of runs) and the imported module
+
+    Returns:
+        tuple: (ms, set of module name imported by the module)
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR] + [p for p in os.environ.get('PYTHONPATH', '').split(os.pathsep) if p]))
+    best, imported = None, set()
+    for _ in range(runs):
+        stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], env=env, check=True,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True).stderr
+        # "import time: self [us] | cumulative | imported package", the module imported at startup (site) is not a child of the module
+        rows = [line.split('|') for line in stderr.splitlines() if line.startswith('import time:') and 'cumulative' not in line]
+        names = [row[2].rstrip() for row in rows]
+        start = -1
+        for i, name in enumerate(names):
+            if name.strip() == 'site':
+                start = i
+        rows, names = rows[start+1:], names[start+1:]
+        total = sum(int(row[1]) for row, name in zip(rows, names) if len(name) - len(name.lstrip()) == 1) / 1000
+        best = total if best is None else min(best, total)
+        imported = {name.strip() for name in names}
+    return best, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=['torlib', 'torlib.crawler.github_crawler'])
+    parser.add_argument('--budget-ms', type=float, default=100.0)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args(argv)
+    failed = False
+    for module in args.modules:
+        ms, imported = measure_import(module, args.runs)
+        forbidden = sorted({name.split('.')[0] for name in imported} & set(FORBIDDEN))
+        ok = ms <= args.budget_ms and not forbidden
+        failed = failed or not ok
+        print(f'{module:<40}{ms:>10.1f} ms  {"ok" if ok else "FAIL"}  {" ".join(forbidden)}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
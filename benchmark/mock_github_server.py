@@ -0,0 +1,280 @@
+import hashlib
+import json
+import multiprocessing as mp
+import random
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer is only in python 3.7+
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        start = time.perf_counter()
+        status, headers, body = self.server.github.respond(self.path, self.headers)
+        if self.server.github.latency:
+            time.sleep(self.server.github.latency)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+        self.server.github.record(time.perf_counter() - start)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status, headers, body = self.server.github.respond_graphql(body, self.headers)
+        if self.server.github.latency:
+            time.sleep(self.server.github.latency)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.github.record(time.perf_counter() - start)
+
+
+_ALIAS_PATTERN = re.compile(r'(\w+): repository\(owner: "([^"]*)", name: "([^"]*)"\)\s*\{\s*(?:(issue|pullRequest)\(number: (\d+)\))?')
+
+
+class _GithubApi:
+    """State of the mock api inside the server process"""
+
+    def __init__(self, base_url, pages, items_per_page, item_size, latency, rate_limit, rate_limit_window,
+                 failure_rate, secondary_rate_limit_rate, seed, graphql_max_alias):
+        self.base_url = base_url
+        self.graphql_max_alias = graphql_max_alias
+        self.pages = pages
+        self.items_per_page = items_per_page
+        self.item_size = item_size
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.failure_rate = failure_rate
+        self.secondary_rate_limit_rate = secondary_rate_limit_rate
+        self.random = random.Random(seed)
+        self.quota = {}
+        self.latencies = []
+        self.counter = {'requests': 0, 'failures': 0, 'rate_limited': 0, 'not_modified': 0}
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def _page_count(self, path):
+        if isinstance(self.pages, dict):
+            return self.pages.get(path, 0)
+        return self.pages
+
+    def _rate_limit_headers(self, token):
+        """ decrement the quota of the token and return its X-RateLimit-* header"""
+        now = time.time()
+        remaining, reset = self.quota.get(token, (self.rate_limit, now + self.rate_limit_window))
+        if reset <= now:
+            remaining, reset = self.rate_limit, now + self.rate_limit_window
+        if remaining > 0:
+            remaining -= 1
+            allowed = True
+        else:
+            allowed = False
+        self.quota[token] = (remaining, reset)
+        return allowed, {'X-RateLimit-Limit': str(self.rate_limit), 'X-RateLimit-Remaining': str(remaining),
+                         'X-RateLimit-Reset': str(int(reset) + 1)}
+
+    def respond_rate_limit(self, request_headers):
+        """ return (status, header, body) of the rate limit endpoint, the request does not use the quota"""
+        now = time.time()
+        with self.lock:
+            remaining, reset = self.quota.get(request_headers.get('Authorization', ''), (self.rate_limit, now + self.rate_limit_window))
+        if reset <= now:
+            remaining, reset = self.rate_limit, now + self.rate_limit_window
+        core = {'limit': self.rate_limit, 'remaining': remaining, 'reset': int(reset) + 1, 'used': self.rate_limit - remaining}
+        return 200, {'Content-Type': 'application/json; charset=utf-8'}, json.dumps({'resources': {'core': core}, 'rate': core}).encode()
+
+    def respond(self, raw_path, request_headers):
+        """ return (status, header, body) of the request"""
+        parsed = urlparse(raw_path)
+        if parsed.path == '/rate_limit':
+            return self.respond_rate_limit(request_headers)
+        query = parse_qs(parsed.query)
+        per_page = min(int(query.get('per_page', ['30'])[0]), 100)
+        page = int(query.get('page', ['1'])[0])
+        with self.lock:
+            self.counter['requests'] += 1
+            allowed, headers = self._rate_limit_headers(request_headers.get('Authorization', ''))
+            failure = self.random.random()
+        headers['Content-Type'] = 'application/json; charset=utf-8'
+        if not allowed:
+            return self._error(403, headers, 'API rate limit exceeded', 'rate_limited')
+        if failure < self.secondary_rate_limit_rate:
+            headers['Retry-After'] = '1'
+            return self._error(403, headers, 'You have exceeded a secondary rate limit', 'failures')
+        if failure < self.secondary_rate_limit_rate + self.failure_rate:
+            return self._error(502, headers, 'Server Error', 'failures')
+        last = self._page_count(parsed.path)
+        if last == 0:
+            return self._error(404, headers, 'Not Found', 'failures')
+        etag = '"' + hashlib.md5(f'{parsed.path}/{page}/{per_page}'.encode()).hexdigest() + '"'
+        headers['ETag'] = etag
+        if request_headers.get('If-None-Match') == etag:
+            with self.lock:
+                self.counter['not_modified'] += 1
+            return 304, headers, b''
+        if page < last:
+            url = self.base_url + parsed.path
+            headers['Link'] = (f'<{url}?per_page={per_page}&page={page + 1}>; rel="next", '
+                               f'<{url}?per_page={per_page}&page={last}>; rel="last"')
+        items = []
+        if page <= last:
+            count = min(per_page, self.items_per_page)
+            first = (page - 1) * count
+            items = [{'id': first + i, 'url': f'{parsed.path}/{first + i}', 'payload': 'x' * self.item_size} for i in range(count)]
+        return 200, headers, json.dumps(items).encode()
+
+    def respond_graphql(self, body, request_headers):
+        """ return (status, header, body) of the graphql query, every repository exist except the one whose owner is 'missing'"""
+        with self.lock:
+            self.counter['requests'] += 1
+            allowed, headers = self._rate_limit_headers(request_headers.get('Authorization', ''))
+        headers['Content-Type'] = 'application/json; charset=utf-8'
+        if not allowed:
+            return self._error(403, headers, 'API rate limit exceeded', 'rate_limited')
+        aliases = _ALIAS_PATTERN.findall(json.loads(body)['query'])
+        if len(aliases) > self.graphql_max_alias:
+            errors = [{'type': 'MAX_NODE_LIMIT_EXCEEDED', 'message': f'query has {len(aliases)} alias'}]
+            return 200, headers, json.dumps({'errors': errors}).encode()
+        data, errors = {}, []
+        for alias, owner, name, kind, number in aliases:
+            if owner == 'missing':
+                data[alias] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [alias], 'message': f'Could not resolve to a Repository with the name \'{owner}/{name}\'.'})
+            elif kind:
+                data[alias] = {kind: {'number': int(number), 'title': f'{owner}/{name}#{number}', 'payload': 'x' * self.item_size}}
+            else:
+                data[alias] = {'nameWithOwner': f'{owner}/{name}', 'payload': 'x' * self.item_size}
+        response = {'data': data}
+        if errors:
+            response['errors'] = errors
+        return 200, headers, json.dumps(response).encode()
+
+    def _error(self, status, headers, message, counter):
+        with self.lock:
+            self.counter[counter] += 1
+        return status, headers, json.dumps({'message': message}).encode()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counter)
+            stats['latencies'] = list(self.latencies)
+        return stats
+
+
+def _serve(config, address, stop_event, stats_queue):
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    server.github = _GithubApi(base_url, **config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    address.put(base_url)
+    stop_event.wait()
+    server.shutdown()
+    stats_queue.put(server.github.stats())
+    server.server_close()
+
+
+class MockGithubServer:
+    """Local server that behave like the paginated github rest api for benchmark and test
+
+    Every path return ``pages`` pages of ``items_per_page`` items with ``Link``, ``ETag`` and
+    ``X-RateLimit-*`` header, so the crawler can be measured without the network and the real rate limit.
+    POST ``/graphql`` answer the aliased repository, issue and pull request lookup of the graphql crawler.
+    GET ``/rate_limit`` answer the core rate limit of the token like github without using the quota.
+    The server run in its own process so it does not share the GIL with the crawler.
+
+    Args:
+        pages (int or dict, optional): number of page of every path or {path: number of page}. Defaults to 1.
+        items_per_page (int, optional): number of item in each page (capped by per_page). Defaults to 100.
+        item_size (int, optional): size of the payload of each item in byte. Defaults to 100.
+        latency (float, optional): seconds to wait before sending each response. Defaults to 0.
+        rate_limit (int, optional): number of request of each token per rate_limit_window. Defaults to 5000.
+        rate_limit_window (float, optional): seconds until the quota of a token reset. Defaults to 3600.
+        failure_rate (float, optional): probability of returning 502. Defaults to 0.
+        secondary_rate_limit_rate (float, optional): probability of returning 403 secondary rate limit
+            with ``Retry-After: 1``. Defaults to 0.
+        seed (int, optional): seed of the failure injection. Defaults to 0.
+        graphql_max_alias (int, optional): maximum number of alias in a graphql query before returning MAX_NODE_LIMIT_EXCEEDED. Defaults to 100.
+
+    Example:
+        >>> with MockGithubServer(pages=3) as server:
+        ...     github_crawler_multipage(['repo'], [server.api_url(0)], ['token'])
+    """
+
+    def __init__(self, pages=1, items_per_page=100, item_size=100, latency=0.0, rate_limit=5000, rate_limit_window=3600,
+                 failure_rate=0.0, secondary_rate_limit_rate=0.0, seed=0, graphql_max_alias=100):
+        self.config = {'pages': pages, 'items_per_page': items_per_page, 'item_size': item_size, 'latency': latency,
+                       'rate_limit': rate_limit, 'rate_limit_window': rate_limit_window, 'failure_rate': failure_rate,
+                       'secondary_rate_limit_rate': secondary_rate_limit_rate, 'seed': seed,
+                       'graphql_max_alias': graphql_max_alias}
+        self.url = None
+        self._process = None
+        self._stats = None
+
+    def start(self):
+        """ start the server process and wait until it accept connection"""
+        address = mp.Queue()
+        self._stop_event = mp.Event()
+        self._stats_queue = mp.Queue()
+        self._process = mp.Process(target=_serve, args=(self.config, address, self._stop_event, self._stats_queue), daemon=True)
+        self._process.start()
+        self.url = address.get(timeout=10)
+        return self
+
+    def stop(self):
+        """ stop the server process
+
+        Returns:
+            dict: number of requests, failures, rate_limited and not_modified response and the latency of every response
+        """
+        if self._process is not None:
+            self._stop_event.set()
+            self._stats = self._stats_queue.get(timeout=10)
+            self._process.join()
+            self._process = None
+        return self._stats
+
+    def api_url(self, i):
+        """ return the url of the i-th repository"""
+        return f'{self.url}/repos/{i}/items'
+
+    def repo_url(self, owner, name):
+        """ return the rest api url of the repository"""
+        return f'{self.url}/repos/{owner}/{name}'
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
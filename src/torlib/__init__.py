@@ -1,4 +1,2 @@
-from pbr.version import VersionInfo
-
-
-__version__ = VersionInfo('torlib').version_string()
+# static version (keep in sync with setup.cfg) so importing torlib does not load pbr and setuptools
+__version__ = '0.0.5'
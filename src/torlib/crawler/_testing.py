@@ -0,0 +1,29 @@
+# mock api used by for_test=True, kept out of the crawler module so the test only responses library is imported only when testing
+import responses
+from . import github_crawler
+
+
+@responses.activate
+def _collect_json_multipage_for_testing(input_tuple):
+    """ function used for testing only"""
+    _add_test_responses(responses)
+    return github_crawler._collect_pages(input_tuple)
+
+
+def _start_test_mock():
+    """ return the started RequestsMock with the mock api used for testing only"""
+    mock = responses.RequestsMock(assert_all_requests_are_fired=False)
+    _add_test_responses(mock)
+    mock.start()
+    return mock
+
+
+def _add_test_responses(rsps):
+    """ register the mock api used for testing only"""
+    for i in range(1, 4):
+        rsps.add(responses.GET,
+                 f'http://test_github/api/{i}?per_page=100&page=1',
+                 status=200,
+                 content_type='application/json',
+                 headers={'X-RateLimit-Remaining': '100000'},
+                 body='{"test": "test'+str(i)+'"}')
@@ -0,0 +1,507 @@
+import asyncio
+import collections
+import concurrent.futures
+import copy
+import os
+import time
+import requests
+from tqdm import tqdm
+from .session import SessionPool
+from .token_scheduler import TokenScheduler
+from .retry import RetryPolicy, is_secondary_rate_limited
+from .writer import open_writer
+from .codec import get_codec
+from .projection import compile_projection
+from .checkpoint import CheckpointManifest
+from .output_store import open_store
+from .dedup import dedup_crawl_list
+from .schedule import PageCountHistory
+from .incremental import HighWaterMark, DeltaCollector, newest_timestamp, newest_in_file, incremental_params, merge_output
+from .github_crawler import _check_input, _prepare_crawl_list, _write_fail_log, _page_url, _is_rate_limited, _retry_delay, _send, _last_page, _prepare_hooks, _fan_out, NoTokenError, InputNotStringError
+
+
+def run_coroutine(coroutine):
+    """ run the coroutine in a new event loop and return its result
+
+    Args:
+        coroutine (coroutine): coroutine to run
+
+    Returns:
+        object: result of the coroutine
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def github_crawler_multipage_async(savename, url, GHtoken, retry=3, concurrency=100, log_file='github_crawler_log.txt', output_dir='', for_test=False, pretty_json=True, pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, output_format='json', checkpoint=False, http_cache=None, shard_size=256*1024**2, metrics=None, hooks=None, incremental=False, concurrency_controller=None, dedup=False, json_codec='auto', projection=None, pace=False, record_history=False):
+    """ crawl the github api with asyncio and save file to json this function will also generate the log file that show the url of api that cannot be crawled
+
+    All of the url are crawled in a single process, the blocking request is run in a thread pool
+    so at most ``concurrency`` requests are in-flight at the same time.
+    The page of the same url are fetched concurrently after the last page is read from the link header of the first page.
+    The output files and the log file are the same as :func:`github_crawler_multipage`.
+
+    Args:
+        savename (list): contain string of the save file name (need to be same length as url)
+        url (list): contain string of url of the target api (need to be same length as savename)
+        GHtoken (list): list of github token, each request use the token with the most remaining rate limit
+        retry (int, optional): number of time to retry a request that fail with transient error (connection error, 5xx, 429 or secondary rate limit), only the failed page is requested again. Defaults to 3.
+        concurrency (int, optional): maximum number of in-flight requests. Defaults to 100.
+        log_file (str, optional): name of the log file showing the detail of fail case. Defaults to 'github_crawler_log.txt'.
+        output_dir (str, optional): output directory. Defaults to ''.
+        for_test (boolean, optional): used for testing or not. Defaults to False.
+        pretty_json (boolean, optional): make to output json file easier to read. Defaults to True.
+        pool_size (int, optional): maximum number of keep-alive connection per host in the session of each token. Defaults to concurrency.
+        keep_alive (boolean, optional): reuse the connection of the session across request. Defaults to True.
+        connection_stats (ConnectionStats, optional): counter that will be updated with the number of connection opened and reused. Defaults to None.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry. Defaults to None (exponential backoff with jitter and ``retry`` maximum retry).
+        output_format (str, optional): 'json' to save each url as json array (savename.json), 'jsonl' to save each url as JSON Lines (savename.jsonl),
+            'json.gz', 'jsonl.gz', 'json.zst' or 'jsonl.zst' to save each url as compressed file (zstd require zstandard package),
+            'jsonl_shard' to save every url as JSON Lines shard files with an index or 'archive' to save every url in a single indexed archive.
+            The item of each page is written to the file as soon as the page arrive. The output can be read with :func:`torlib.crawler.output_store.read_output`. Defaults to 'json'.
+        checkpoint (boolean, optional): record the progress of every url in a checkpoint log in output_dir, when the crawler is run again the completed url are skipped and the partially crawled url continue from the last written page. Defaults to False.
+        http_cache (HttpCache, optional): on-disk cache used to send conditional request (ETag / Last-Modified) and reuse the cached page when github return 304. Defaults to None.
+        shard_size (int, optional): size in byte of each shard before rolling over to a new shard (only used when output_format is 'jsonl_shard'). Defaults to 256 MB.
+        metrics (CrawlMetrics, optional): metrics that will be updated with the request latency, byte downloaded, page per url, waiting time, retry and token quota. Defaults to None.
+        hooks (list, optional): list of CrawlHooks that is called before and after every request. Defaults to None.
+        incremental (boolean, optional): record the newest ``updated_at`` (or commit date or ``created_at``) of the item of every url in output_dir,
+            when the output file of the url exist only the item updated since then are requested (with ``since``, ``sort=updated`` and ``direction=desc``)
+            and merged into the output file. Only for the output format that save one file per url. Defaults to False.
+        concurrency_controller (AdaptiveConcurrency, optional): controller that adjust the number of in-flight requests (at most concurrency)
+            from the latency, error and rate limit of the response. Defaults to None (always concurrency).
+        dedup (boolean, optional): request the url that is the same after normalization only once and give its output to every savename of the url
+            (as hardlink or as another index record of the output store). Defaults to False.
+        json_codec (str, optional): 'orjson', 'json' or 'auto' to decode the page and encode the compact item with orjson if it is installed otherwise json. Defaults to 'auto'.
+        projection (list, optional): list of field path, only these field of each item are kept as soon as the page arrive. Defaults to None (every field).
+        pace (boolean, optional): spread the remaining rate limit of each token until its reset time. Defaults to False.
+        record_history (boolean, optional): record the number of page of every url in output_dir for the schedule of the next crawl in 'process' mode. Defaults to False.
+
+    Raises:
+        LengthNotMatchError: Raised when the length of savename and url is not the same
+        InputNotStringError: Raised when not all of member in savename or url are string
+        NoTokenError: Raised when input list of github token is empty
+        OutputFormatNotSupportedError: Raised when output_format is not supported or is not supported by incremental crawl
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        FieldPathError: Raised when a field path of projection cannot be parsed
+
+    """
+    _check_input(savename, url, GHtoken, output_format, incremental)
+    codec = get_codec(json_codec)
+    projection = compile_projection(projection)
+    # if savename and url length is 0 do nothing
+    if len(savename) == 0 and len(url) == 0:
+        return
+    checkpoint_manifest = CheckpointManifest(output_dir) if checkpoint else None
+    output_store = open_store(output_dir, output_format, shard_size)
+    list_to_crawl = _prepare_crawl_list(savename, url, output_dir, output_format, pretty_json, checkpoint_manifest, output_store, incremental)
+    aliases = {}
+    order = None
+    if dedup:
+        order = [input_tuple[0] for input_tuple in list_to_crawl]
+        list_to_crawl, aliases = dedup_crawl_list(list_to_crawl)
+    high_water_mark = HighWaterMark(output_dir) if incremental else None
+    if high_water_mark is not None:
+        high_water_mark.load()
+    token_scheduler = TokenScheduler(GHtoken, pace=pace)
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retry=retry)
+    hooks = _prepare_hooks(hooks, metrics, token_scheduler, concurrency_controller, concurrency)
+    mock = None
+    if for_test:
+        from ._testing import _start_test_mock
+        mock = _start_test_mock()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    session_pool = SessionPool(pool_size=pool_size or concurrency, keep_alive=keep_alive, stats=connection_stats)
+    history = PageCountHistory(output_dir) if record_history else None
+    if history is not None:
+        history.load()
+    try:
+        fetcher = _PageFetcher(executor, session_pool, token_scheduler, retry_policy, concurrency, http_cache, metrics, hooks, concurrency_controller, codec, projection)
+        result = await _crawl_batch(list_to_crawl, concurrency, fetcher, checkpoint_manifest, output_store, high_water_mark)
+        if history is not None:
+            history.update(list_to_crawl, result)
+        result = _fan_out(list_to_crawl, result, aliases, output_store, checkpoint_manifest, metrics, order)
+    finally:
+        if checkpoint_manifest is not None:
+            checkpoint_manifest.close()
+        if high_water_mark is not None:
+            high_water_mark.close()
+        if http_cache is not None:
+            http_cache.prune()
+        executor.shutdown(wait=True)
+        session_pool.close()
+        if mock is not None:
+            mock.stop()
+            mock.reset()
+    _write_fail_log(log_file, result, pretty_json)
+
+
+_DONE = object()
+
+
+async def iter_github_pages_async(crawl_input, GHtoken, retry=3, concurrency=100, log_file=None, for_test=False, pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, http_cache=None, metrics=None, hooks=None, concurrency_controller=None, json_codec='auto', projection=None):
+    """ crawl the github api with asyncio and yield the item of every page as soon as it arrive instead of saving file
+
+    The input is read lazily (at most ``concurrency`` url are in progress) and at most ``concurrency`` page are waiting to be consumed,
+    so the memory does not grow with the number of url. The page of the same url are yielded in page order
+    but the page of different url are interleaved in the order they arrive.
+
+    Args:
+        crawl_input (iterable or async iterable): (savename, url) of every url to crawl, can be a generator
+        GHtoken (list): list of github token, each request use the token with the most remaining rate limit
+        retry (int, optional): number of time to retry a request that fail with transient error (connection error, 5xx, 429 or secondary rate limit). Defaults to 3.
+        concurrency (int, optional): maximum number of in-flight requests. Defaults to 100.
+        log_file (str, optional): name of the log file showing the url that cannot be crawled and its error message, written when the iteration stop. Defaults to None (no log file).
+        for_test (boolean, optional): used for testing or not. Defaults to False.
+        pool_size (int, optional): maximum number of keep-alive connection per host in the session of each token. Defaults to concurrency.
+        keep_alive (boolean, optional): reuse the connection of the session across request. Defaults to True.
+        connection_stats (ConnectionStats, optional): counter that will be updated with the number of connection opened and reused. Defaults to None.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry. Defaults to None (exponential backoff with jitter and ``retry`` maximum retry).
+        http_cache (HttpCache, optional): on-disk cache used to send conditional request (ETag / Last-Modified). Defaults to None.
+        metrics (CrawlMetrics, optional): metrics that will be updated with the request latency, byte downloaded, page per url, waiting time, retry and token quota. Defaults to None.
+        hooks (list, optional): list of CrawlHooks that is called before and after every request. Defaults to None.
+        concurrency_controller (AdaptiveConcurrency, optional): controller that adjust the number of in-flight requests (at most concurrency). Defaults to None.
+        json_codec (str, optional): 'orjson', 'json' or 'auto' to decode the page with orjson if it is installed otherwise json. Defaults to 'auto'.
+        projection (list, optional): list of field path, only these field of the item of the page are yielded. Defaults to None (every field).
+
+    Raises:
+        NoTokenError: Raised when input list of github token is empty
+        InputNotStringError: Raised when savename or url in crawl_input is not string
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        FieldPathError: Raised when a field path of projection cannot be parsed
+
+    Yields:
+        tuple: (savename, page, items) items is the json of the page
+    """
+    if len(GHtoken) == 0:
+        raise NoTokenError()
+    codec = get_codec(json_codec)
+    projection = compile_projection(projection)
+    token_scheduler = TokenScheduler(GHtoken)
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retry=retry)
+    hooks = _prepare_hooks(hooks, metrics, token_scheduler, concurrency_controller, concurrency)
+    mock = None
+    if for_test:
+        from ._testing import _start_test_mock
+        mock = _start_test_mock()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    session_pool = SessionPool(pool_size=pool_size or concurrency, keep_alive=keep_alive, stats=connection_stats)
+    fetcher = _PageFetcher(executor, session_pool, token_scheduler, retry_policy, concurrency, http_cache, metrics, hooks, concurrency_controller, codec, projection)
+    queue = asyncio.Queue(maxsize=concurrency)
+    input_lock = asyncio.Lock()
+    crawl_input = crawl_input.__aiter__() if hasattr(crawl_input, '__aiter__') else iter(crawl_input)
+    fail_list = []
+
+    async def worker():
+        while True:
+            async with input_lock:
+                pair = await _next_input(crawl_input)
+            if pair is None:
+                return
+            savename, url = pair
+            if type(savename) != str:
+                raise InputNotStringError('savename')
+            if type(url) != str:
+                raise InputNotStringError('url')
+            pages = 0
+            try:
+                async for page, r in _iter_pages_async(url, fetcher):
+                    json_r = fetcher.codec.loads(r.content)
+                    await queue.put((savename, page, json_r if projection is None else projection(json_r)))
+                    pages = pages+1
+            except Exception as e:
+                fail_list.append((url, str(e)))
+                if metrics is not None:
+                    metrics.add_url(pages, False)
+            else:
+                if metrics is not None:
+                    metrics.add_url(pages, True)
+
+    async def produce():
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            await queue.put(_DONE)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                # raise the error of the input
+                producer.result()
+                break
+            yield item
+    finally:
+        for task in workers + [producer]:
+            task.cancel()
+        await asyncio.gather(*workers, producer, return_exceptions=True)
+        if http_cache is not None:
+            http_cache.prune()
+        executor.shutdown(wait=True)
+        session_pool.close()
+        if mock is not None:
+            mock.stop()
+            mock.reset()
+        if log_file is not None:
+            _write_fail_log(log_file, fail_list, True)
+
+
+async def _next_input(crawl_input):
+    """ return the next (savename, url) of the iterator or async iterator or None if it is exhausted"""
+    try:
+        if hasattr(crawl_input, '__anext__'):
+            return await crawl_input.__anext__()
+        return next(crawl_input)
+    except (StopIteration, StopAsyncIteration):
+        return None
+
+
+class _PageFetcher:
+    """Fetch the page of the api in the executor with at most concurrency requests in-flight
+
+    Args:
+        executor (concurrent.futures.Executor): executor used to run the blocking request
+        session_pool (SessionPool): pool of the keep-alive session of each token
+        token_scheduler (TokenScheduler): scheduler that choose the token of each request
+        retry_policy (RetryPolicy): policy that decide the retry of the failed request
+        concurrency (int): maximum number of in-flight requests
+        http_cache (HttpCache, optional): cache used to send conditional request. Defaults to None.
+        metrics (CrawlMetrics, optional): metrics of the crawl. Defaults to None.
+        hooks (tuple, optional): CrawlHooks called before and after every request. Defaults to ().
+        concurrency_controller (AdaptiveConcurrency, optional): controller that adjust the number of in-flight requests. Defaults to None.
+        codec (JsonCodec, optional): codec used to decode the page and encode the item. Defaults to None (orjson if it is installed).
+        projection (FieldProjection, optional): projection applied to the item of every page. Defaults to None.
+    """
+
+    def __init__(self, executor, session_pool, token_scheduler, retry_policy, concurrency, http_cache=None, metrics=None, hooks=(), concurrency_controller=None, codec=None, projection=None):
+        self.executor = executor
+        self.session_pool = session_pool
+        self.token_scheduler = token_scheduler
+        self.retry_policy = retry_policy
+        self.concurrency = concurrency
+        self.http_cache = http_cache
+        self.metrics = metrics
+        self.hooks = hooks
+        self.concurrency_controller = concurrency_controller
+        self.codec = codec or get_codec()
+        self.projection = projection
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # page fetched ahead of the page being written, shared by every url so at most concurrency page are buffered
+        self.window = asyncio.Semaphore(concurrency)
+
+    def with_projection(self, projection):
+        """ return the fetcher that share the executor, session, token and in-flight limit of this fetcher but apply another projection"""
+        fetcher = copy.copy(self)
+        fetcher.projection = projection
+        return fetcher
+
+    async def get(self, url, page, params=None):
+        """ request the page of the url with the token that has the most remaining rate limit,
+        if the rate limit of the token is exhausted try again with another token (or wait until a token is reset),
+        if the request fail with transient error wait with backoff and try again
+
+        Raises:
+            requests.RequestException: Raised when the request still fail after retry
+
+        Returns:
+            requests.Response: response of the page
+        """
+        loop = asyncio.get_event_loop()
+        page_url = _page_url(url, page, params)
+        attempt = 0
+        http_cache = self.http_cache
+        while True:
+            start = time.perf_counter()
+            GHtoken = await self.token_scheduler.acquire_async()
+            if self.metrics is not None:
+                self.metrics.add_rate_limit_wait(time.perf_counter()-start)
+            r, error = None, None
+            async with self.semaphore:
+                for hook in self.hooks:
+                    hook.before_request(page_url, GHtoken)
+                if self.concurrency_controller is not None:
+                    await self.concurrency_controller.acquire_async()
+                start = time.perf_counter()
+                try:
+                    r = await loop.run_in_executor(self.executor, _send, self.session_pool.get(GHtoken), page_url, http_cache)
+                except requests.RequestException as e:
+                    error = e
+                finally:
+                    if self.concurrency_controller is not None:
+                        self.concurrency_controller.release(r, error, time.perf_counter()-start)
+                for hook in self.hooks:
+                    hook.after_request(page_url, r, error, time.perf_counter()-start)
+            if error is None:
+                self.token_scheduler.update(GHtoken, r.headers)
+                if _is_rate_limited(r):
+                    continue
+            delay = _retry_delay(self.retry_policy, attempt, r, error)
+            if delay is None:
+                if self.http_cache is not None:
+                    processed = await loop.run_in_executor(self.executor, self.http_cache.process, page_url, r)
+                    if processed is None and http_cache is not None:
+                        # the cached page is removed after the conditional request is sent, request the whole page again
+                        http_cache = None
+                        continue
+                    r = processed or r
+                return r
+            attempt = attempt+1
+            if self.metrics is not None:
+                self.metrics.add_retry(delay, r is not None and is_secondary_rate_limited(r))
+            await asyncio.sleep(delay)
+
+
+async def _crawl_batch(list_to_crawl, concurrency, fetcher, checkpoint_manifest, output_store, high_water_mark=None):
+    """ crawl all of the input tuple with at most concurrency url in progress at the same time
+
+    Returns:
+        list: (url, result, pages) of each input tuple in the same order as list_to_crawl
+    """
+    result = [None] * len(list_to_crawl)
+    queue = asyncio.Queue()
+    for i in range(len(list_to_crawl)):
+        queue.put_nowait(i)
+    progress = tqdm(total=len(list_to_crawl))
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            result[i] = await _collect_json_multipage_async(list_to_crawl[i], fetcher, checkpoint_manifest, output_store, high_water_mark)
+            progress.update(1)
+
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, len(list_to_crawl)))])
+    progress.close()
+    return result
+
+
+async def _collect_json_multipage_async(input_tuple, fetcher, checkpoint_manifest=None, output_store=None, high_water_mark=None, on_page=None):
+    """ save response from request as json file, same as collect_json_multipage but the request is awaited
+
+    Args:
+        input_tuple (tuple): (save_path, url, output_format, pretty_json, resume)
+        fetcher (_PageFetcher): fetcher used to request the page
+        checkpoint_manifest (CheckpointManifest, optional): checkpoint that record the progress of the url. Defaults to None.
+        output_store (ShardStore, optional): store that the output file is moved to when it is completely written. Defaults to None.
+        high_water_mark (HighWaterMark, optional): newest timestamp of the item of the url for the incremental crawl. Defaults to None.
+        on_page (callable, optional): function called with the json of every page (before the projection) after it is written. Defaults to None.
+
+    Returns:
+        tuple: (url, result, pages) showing status of the crawling
+        result will be 1 if sucess otherwise it will
+        be the exception message of the error that occur
+    """
+    save_path, url, output_format, pretty_json, resume = input_tuple
+    loop = asyncio.get_event_loop()
+    # if the file is exist proceed to next one (the file that is written but not moved to the output store is moved now)
+    if os.path.exists(save_path):
+        if high_water_mark is not None:
+            return await _collect_delta_async(save_path, url, output_format, pretty_json, fetcher, high_water_mark)
+        if output_store is not None:
+            await loop.run_in_executor(fetcher.executor, output_store.append, save_path)
+        return (url, 1, 0)
+    pages = 0
+    newest = None
+    try:
+        writer = open_writer(save_path, output_format, pretty_json, resume and resume[1:], fetcher.codec, fetcher.projection)
+        try:
+            # write each page to the file as soon as it arrive and commit it to the checkpoint
+            async for page, r in _iter_pages_async(url, fetcher, resume[0]+1 if writer.resumed else 1):
+                # the body is written without parsing unless the item is needed (pretty json, projection, the high water mark or on_page)
+                if high_water_mark is not None or on_page is not None or not writer.write_raw_page(r.content):
+                    json_r = fetcher.codec.loads(r.content)
+                    writer.write_page(json_r)
+                    if high_water_mark is not None:
+                        newest = newest_timestamp(json_r, newest)
+                    if on_page is not None:
+                        on_page(json_r)
+                pages = pages+1
+                if checkpoint_manifest is not None and writer.resumable:
+                    checkpoint_manifest.commit_page(save_path, page, writer.tell(), writer.count)
+        except BaseException:
+            writer.abort(keep_part=checkpoint_manifest is not None)
+            raise
+        writer.close()
+        if output_store is not None:
+            await loop.run_in_executor(fetcher.executor, output_store.append, save_path)
+        if checkpoint_manifest is not None:
+            checkpoint_manifest.commit_done(save_path)
+        if newest is not None:
+            high_water_mark.set(save_path, newest)
+    # return error
+    except Exception as e:
+        if fetcher.metrics is not None:
+            fetcher.metrics.add_url(pages, False)
+        return (url, str(e), pages)
+    if fetcher.metrics is not None:
+        fetcher.metrics.add_url(pages, True)
+    return (url, 1, pages)
+
+
+async def _collect_delta_async(save_path, url, output_format, pretty_json, fetcher, high_water_mark):
+    """ same as _collect_delta but the request is awaited and the file is read and merged in the executor"""
+    loop = asyncio.get_event_loop()
+    page = 0
+    try:
+        mark = high_water_mark.get(save_path)
+        if mark is None:
+            # the file is crawled before the incremental crawl is used, start from its newest item
+            mark = await loop.run_in_executor(fetcher.executor, newest_in_file, save_path, output_format)
+            if mark is None:
+                return (url, 1, 0)
+        delta = DeltaCollector(mark, fetcher.projection)
+        while not delta.done:
+            page = page+1
+            r = await fetcher.get(url, page, incremental_params(mark))
+            delta.add_page(fetcher.codec.loads(r.content))
+            if page >= _last_page(r.headers):
+                break
+        if delta.items:
+            await loop.run_in_executor(fetcher.executor, merge_output, save_path, output_format, pretty_json, delta.items, fetcher.codec)
+        high_water_mark.set(save_path, delta.newest)
+    except Exception as e:
+        if fetcher.metrics is not None:
+            fetcher.metrics.add_url(page, False)
+        return (url, str(e), page)
+    if fetcher.metrics is not None:
+        fetcher.metrics.add_url(page, True)
+    return (url, 1, page)
+
+
+async def _iter_pages_async(url, fetcher, start_page=1):
+    """ yield (page, response) of every page of the url from start_page in page order
+
+    The last page is read from the link header of the start page, then the remaining page are fetched concurrently.
+    Every page fetched ahead take a slot of fetcher.window which is shared by every url, the slot is given back when the page is written,
+    so at most fetcher.concurrency page are buffered in total (not per url). The url wait for a slot only when it has no page in-flight,
+    so the url that hold the slot can always write its next page.
+    """
+    r = await fetcher.get(url, start_page)
+    last_page = _last_page(r.headers)
+    yield start_page, r
+    window = collections.deque()
+    next_page = start_page+1
+    try:
+        while True:
+            while next_page <= last_page and len(window) < fetcher.concurrency and not (window and fetcher.window.locked()):
+                await fetcher.window.acquire()
+                window.append((next_page, asyncio.ensure_future(fetcher.get(url, next_page))))
+                next_page = next_page+1
+            if not window:
+                break
+            page, task = window[0]
+            r = await task
+            window.popleft()
+            try:
+                yield page, r
+            finally:
+                fetcher.window.release()
+    finally:
+        for _, task in window:
+            task.cancel()
+            fetcher.window.release()
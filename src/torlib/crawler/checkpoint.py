@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+
+
+class CheckpointManifest:
+    """Append-only log in output_dir that record the progress of every url of the crawler
+
+    Every line of the log is a json object, ``{"path": path, "page": page, "offset": offset, "count": count}``
+    is written after a page is written to ``save_path + '.part'`` and ``{"path": path, "done": true}``
+    is written when the url is completely crawled (path is save_path relative to output_dir).
+    The log is loaded (and compacted) once at the start of the crawl so the completed url are skipped in O(1) and the partially crawled url are resumed from the last committed page.
+
+    Args:
+        output_dir (string): output directory of the crawler
+        file_name (string, optional): name of the log file. Defaults to '.github_crawler_checkpoint'.
+    """
+
+    def __init__(self, output_dir, file_name='.github_crawler_checkpoint'):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, file_name)
+        self.state = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # only the path is sent to the worker process, the worker only append to the log
+        return {'output_dir': self.output_dir, 'path': self.path}
+
+    def __setstate__(self, state):
+        self.output_dir = state['output_dir']
+        self.path = state['path']
+        self.state = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """ read the progress of every url from the log and rewrite the log with only the latest progress
+
+        Returns:
+            dict: {save_path: progress} progress is {'done': True} or {'page': page, 'offset': offset, 'count': count}
+        """
+        self.state = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as infile:
+                for line in infile:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line can be incomplete if the crawler is killed while writing
+                        continue
+                    self.state[record.pop('path')] = record
+            with open(self.path + '.tmp', 'w') as outfile:
+                for path, record in self.state.items():
+                    outfile.write(json.dumps(dict(path=path, **record)) + '\n')
+            os.replace(self.path + '.tmp', self.path)
+        return self.state
+
+    def _key(self, save_path):
+        return os.path.relpath(save_path, self.output_dir or '.')
+
+    def is_done(self, save_path):
+        """ return True if the url of save_path is completely crawled"""
+        return self.state.get(self._key(save_path), {}).get('done', False)
+
+    def resume_state(self, save_path):
+        """ return (page, offset, count) of the last committed page of save_path or None if there is no committed page"""
+        record = self.state.get(self._key(save_path))
+        if record is None or record.get('done'):
+            return None
+        return (record['page'], record['offset'], record['count'])
+
+    def commit_page(self, save_path, page, offset, count):
+        """ record that the page is written and the part file has offset byte and count item"""
+        self._append({'path': self._key(save_path), 'page': page, 'offset': offset, 'count': count})
+
+    def commit_done(self, save_path):
+        """ record that the url of save_path is completely crawled"""
+        self._append({'path': self._key(save_path), 'done': True})
+
+    def _append(self, record):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
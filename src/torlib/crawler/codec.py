@@ -0,0 +1,103 @@
+import json
+import re
+
+JSON_CODEC = ('auto', 'json', 'orjson')
+
+
+class JsonCodecNotSupportedError(Exception):
+    """Raised when the json codec is not 'auto', 'json' or 'orjson'
+
+    Attributes:
+        json_codec (string): input json codec that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, json_codec, message="json_codec must be 'auto', 'json' or 'orjson'"):
+        self.json_codec = json_codec
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'json_codec={self.json_codec} -> {self.message}'
+
+
+class JsonCodec:
+    """Decode the response body and encode the compact item with the json module of the standard library
+
+    The pretty json output is always encoded with the json module (``indent=4``) so the file is the same with every codec.
+    """
+
+    name = 'json'
+
+    def loads(self, data):
+        """ decode the json bytes or string"""
+        return json.loads(data)
+
+    def dumps(self, obj):
+        """ encode obj as compact json string"""
+        return json.dumps(obj)
+
+
+class OrjsonCodec(JsonCodec):
+    """Decode and encode with orjson which is several times faster than the json module
+
+    The compact item is written without space after ``,`` and ``:`` and the non-ascii character is not escaped.
+    The value that orjson does not support (e.g. integer larger than 64 bit) fall back to the json module.
+    """
+
+    # orjson decode the integer larger than 64 bit as float, so the body with such a long number is decoded by the json module
+    _LONG_NUMBER = re.compile(rb'\d{19}')
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def __getstate__(self):
+        # the module cannot be pickled, it is imported again in the worker process
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def loads(self, data):
+        if self._LONG_NUMBER.search(data.encode() if isinstance(data, str) else data):
+            return json.loads(data)
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            return json.loads(data)
+
+    def dumps(self, obj):
+        try:
+            return self._orjson.dumps(obj).decode()
+        except TypeError:
+            return json.dumps(obj)
+
+
+def get_codec(json_codec='auto'):
+    """ return the codec of the name
+
+    Args:
+        json_codec (string or JsonCodec, optional): 'orjson', 'json' or 'auto' to use orjson if it is installed otherwise json. Defaults to 'auto'.
+
+    Raises:
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        ImportError: Raised when json_codec is 'orjson' but orjson package is not installed
+
+    Returns:
+        JsonCodec: codec
+    """
+    if isinstance(json_codec, JsonCodec):
+        return json_codec
+    if json_codec not in JSON_CODEC:
+        raise JsonCodecNotSupportedError(json_codec)
+    if json_codec == 'json':
+        return JsonCodec()
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        if json_codec == 'orjson':
+            raise ImportError("orjson package is required for json_codec='orjson', please install it with 'pip install orjson'")
+        return JsonCodec()
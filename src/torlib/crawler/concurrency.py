@@ -0,0 +1,159 @@
+import asyncio
+import collections
+import multiprocessing as mp
+import time
+from .retry import is_secondary_rate_limited
+
+# status of the response that show github is overloaded or the crawler is too fast
+CONGESTION_STATUS = (429, 500, 502, 503, 504)
+
+
+class AdaptiveConcurrency:
+    """AIMD controller of the number of in-flight requests shared by every worker process of the crawler
+
+    Every request take one slot before it is sent and return it with the response, the number of slot (the limit)
+    is increased by ``increase`` per limit successful response (about one per round trip, like the congestion window of TCP)
+    and multiplied by ``decrease`` when the request fail with connection error, 429, 5xx or the secondary rate limit,
+    or when the smoothed latency is more than ``latency_tolerance`` times the lowest latency.
+    The limit is decreased at most once per smoothed latency so a burst of error only decrease it once.
+    The limit is not increased while the remaining rate limit of the token is lower than the limit.
+    The state is stored in shared memory so the same controller can be passed to every worker process.
+
+    Args:
+        initial (int, optional): limit at the start. Defaults to 10.
+        min_limit (int, optional): lowest limit. Defaults to 1.
+        max_limit (int, optional): highest limit. Defaults to None (the concurrency of the crawler).
+        increase (float, optional): additive increase per limit successful response. Defaults to 1.
+        decrease (float, optional): multiplicative decrease on congestion. Defaults to 0.5.
+        latency_tolerance (float, optional): smoothed latency / lowest latency that is treated as congestion (None to ignore the latency). Defaults to 3.
+        smoothing (float, optional): weight of the latest latency in the smoothed latency. Defaults to 0.2.
+    """
+
+    def __init__(self, initial=10, min_limit=1, max_limit=None, increase=1.0, decrease=0.5, latency_tolerance=3.0, smoothing=0.2):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._limit = mp.Value('d', float(max(initial, min_limit)), lock=False)
+        self._in_flight = mp.Value('L', 0, lock=False)
+        self._latency = mp.Value('d', 0.0, lock=False)
+        self._min_latency = mp.Value('d', 0.0, lock=False)
+        self._last_decrease = mp.Value('d', 0.0, lock=False)
+        self._condition = mp.Condition(mp.Lock())
+        # (loop, future) of the coroutine waiting in acquire_async of this process
+        self._waiters = collections.deque()
+
+    def __getstate__(self):
+        # the future of the waiting coroutine stay in its own process
+        state = self.__dict__.copy()
+        state['_waiters'] = collections.deque()
+        return state
+
+    @property
+    def limit(self):
+        """ current number of slot"""
+        return max(int(self._limit.value), self.min_limit)
+
+    @property
+    def in_flight(self):
+        """ number of slot that is taken"""
+        return self._in_flight.value
+
+    def try_acquire(self):
+        """ take one slot if the number of in-flight requests is lower than the limit
+
+        Returns:
+            boolean: True if the slot is taken
+        """
+        with self._condition:
+            return self._try_acquire()
+
+    def _try_acquire(self):
+        if self._in_flight.value < self.limit:
+            self._in_flight.value += 1
+            return True
+        return False
+
+    def acquire(self):
+        """ take one slot, block until a slot is returned if every slot is taken"""
+        with self._condition:
+            while not self._try_acquire():
+                # the timeout make sure the slot returned by a dead process does not block forever
+                self._condition.wait(0.1)
+
+    async def acquire_async(self):
+        """ same as acquire but wait without blocking the event loop until release wake the coroutine up"""
+        loop = asyncio.get_event_loop()
+        while True:
+            with self._condition:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                # the timeout make sure the slot returned by another process is taken
+                await asyncio.wait([waiter], timeout=0.1)
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+
+    def release(self, response=None, error=None, elapsed=None):
+        """ return the slot and update the limit from the result of the request
+
+        Args:
+            response (requests.Response, optional): response of the request. Defaults to None.
+            error (Exception, optional): exception raised by the request. Defaults to None.
+            elapsed (float, optional): seconds from sending the request until the response arrive. Defaults to None.
+        """
+        with self._condition:
+            self._in_flight.value = max(self._in_flight.value - 1, 0)
+            self._update(response, error, elapsed)
+            self._condition.notify_all()
+            self._wake()
+
+    def _wake(self):
+        # wake up one waiting coroutine per free slot, the release can come from another thread of the loop
+        free = self.limit - self._in_flight.value
+        while free > 0 and self._waiters:
+            loop, waiter = self._waiters.popleft()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_set_waiter, waiter)
+                free -= 1
+
+    def _update(self, response, error, elapsed):
+        now = time.time()
+        if error is not None or (response is not None and (response.status_code in CONGESTION_STATUS or is_secondary_rate_limited(response))):
+            self._decrease(now)
+            return
+        if response is None:
+            return
+        if elapsed is not None:
+            self._latency.value = elapsed if self._latency.value == 0 else (1 - self.smoothing) * self._latency.value + self.smoothing * elapsed
+            if self._min_latency.value == 0 or elapsed < self._min_latency.value:
+                self._min_latency.value = elapsed
+            if self.latency_tolerance is not None and self._latency.value > self._min_latency.value * self.latency_tolerance:
+                self._decrease(now)
+                return
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is not None and float(remaining) < self._limit.value:
+            return
+        limit = self._limit.value + self.increase / self._limit.value
+        self._limit.value = min(limit, self.max_limit) if self.max_limit is not None else limit
+
+    def _decrease(self, now):
+        if now - self._last_decrease.value < self._latency.value:
+            return
+        self._limit.value = max(self._limit.value * self.decrease, self.min_limit)
+        self._last_decrease.value = now
+
+    def stats(self):
+        """ return the limit, in_flight and the smoothed latency as dict"""
+        return {'limit': self.limit, 'in_flight': self.in_flight, 'latency': self._latency.value}
+
+
+def _set_waiter(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
@@ -0,0 +1,328 @@
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import re
+from tqdm import tqdm
+from .session import SessionPool
+from .token_scheduler import TokenScheduler
+from .retry import RetryPolicy
+from .writer import OUTPUT_FORMAT
+from .codec import get_codec
+from .projection import compile_projection
+from .output_store import iter_output_file
+from .github_crawler import _check_input, _prepare_crawl_list, _write_fail_log, _prepare_hooks, OutputFormatNotSupportedError
+from .async_crawler import _PageFetcher, _collect_json_multipage_async, run_coroutine
+
+# uri template at the end of the hypermedia url of github (e.g. "commits_url": ".../commits{/sha}")
+_URI_TEMPLATE = re.compile(r'\{[^}]*\}')
+# suffix of the file next to the output of the projected url that keep its child url for the next run
+CHILDREN_SUFFIX = '.children'
+
+
+class PlanNotValidError(Exception):
+    """Raised when the level of the crawl plan is not valid
+
+    Attributes:
+        level (string): name of the level that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, level, message="plan must be a list of CrawlLevel"):
+        self.level = level
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'level={self.level} -> {self.message}'
+
+
+class CrawlLevel:
+    """Level of the crawl plan that derive the child url from every item of the parent url
+
+    The child url of an item is crawled as soon as the page of the parent that contain the item is written,
+    so every level of the plan is crawled at the same time in one run.
+
+    Args:
+        name (string): name of the level, the output of the level is saved in the ``name`` sub directory of output_dir
+        url (string or callable): template of the child url formatted with the field of the parent item (e.g. ``'{url}/commits'`` or ``'{comments_url}'``)
+            or function that take the parent item and return the child url. The item without the field or for which the function return None has no child.
+            The uri template of github hypermedia url (e.g. ``{/sha}``) is removed from the url.
+        savename (string or callable, optional): template of the savename formatted with ``parent`` (savename of the parent url) and the field of the parent item
+            or function that take the savename of the parent and the item and return the savename.
+            Defaults to None (``parent`` and the sha, id or node_id of the item e.g. ``'octocat_hello_1296269'``).
+        children (list, optional): CrawlLevel derived from the item of this level. Defaults to ().
+        projection (list, optional): list of field path kept in the output of this level, the child url is derived from the item before the projection
+            and kept in a ``.children`` file next to the output so the next run does not need the dropped field. Defaults to None (every field).
+
+    Raises:
+        PlanNotValidError: Raised when name is empty, url is not a string or function or a child is not a CrawlLevel
+        FieldPathError: Raised when a field path of projection cannot be parsed
+    """
+
+    def __init__(self, name, url, savename=None, children=(), projection=None):
+        if type(name) != str or not name:
+            raise PlanNotValidError(name, 'name must be a non empty string')
+        if not (isinstance(url, str) or callable(url)):
+            raise PlanNotValidError(name, 'url must be a template string or a function')
+        self.name = name
+        self.url = url
+        self.savename = savename
+        self.children = _check_plan(children)
+        self.projection = compile_projection(projection)
+
+    def child(self, parent, item, index=0):
+        """ return (savename, url) of the child of the item or None if the item has no child
+
+        Args:
+            parent (string): savename of the parent url
+            item (object): item of the page of the parent url
+            index (int, optional): position of the item in the parent url, used as savename when the item has no sha, id or node_id. Defaults to 0.
+        """
+        if type(item) != dict:
+            return None
+        url = self.url(item) if callable(self.url) else _format(self.url, item)
+        if url is None:
+            return None
+        if callable(self.savename):
+            savename = self.savename(parent, item)
+        elif self.savename is None:
+            key = next((item[key] for key in ('sha', 'id', 'node_id') if item.get(key) is not None), index)
+            savename = f'{parent}_{key}'
+        else:
+            savename = _format(self.savename, item, parent=parent)
+        if savename is None:
+            return None
+        return savename, _URI_TEMPLATE.sub('', url)
+
+
+def _format(template, item, **fields):
+    """ return the template formatted with the field of the item or None if the item does not have the field"""
+    try:
+        return template.format_map({**item, **fields})
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _check_plan(plan):
+    """ return the plan as list
+
+    Raises:
+        PlanNotValidError: Raised when a level is not a CrawlLevel
+    """
+    plan = list(plan)
+    for level in plan:
+        if not isinstance(level, CrawlLevel):
+            raise PlanNotValidError(level)
+    return plan
+
+
+def github_crawler_plan(savename, url, GHtoken, plan, retry=3, concurrency=100, log_file='github_crawler_log.txt', output_dir='', pretty_json=True, pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, output_format='json', http_cache=None, metrics=None, hooks=None, concurrency_controller=None, json_codec='auto', projection=None):
+    """ crawl the url and the child url that the plan derive from their item (e.g. the pull request of the repository, then the commit and review of every pull request)
+    this function will also generate the log file that show the url of every level that cannot be crawled
+
+    The url of every level is crawled by the asyncio engine in one run (see :func:`github_crawler_plan_async`).
+    The child url is scheduled as soon as the page of its parent arrive and the deeper level is crawled first,
+    so no level wait for the upper level to finish and only the url that is not started yet are kept in memory.
+    The output of the url is saved to output_dir like :func:`torlib.crawler.github_crawler.github_crawler_multipage`,
+    the output of the child level is saved to the sub directory of the name of the level.
+    When the crawler is run again, the output file that exist is not requested again and the child url are derived from the file,
+    or read from the ``.children`` file written next to the output of the url whose item is projected.
+
+    Args:
+        savename (list): contain string of the save file name of the top level url (need to be same length as url)
+        url (list): contain string of url of the top level api (need to be same length as savename)
+        GHtoken (list): list of github token, each request use the token with the most remaining rate limit
+        plan (list): CrawlLevel derived from the item of the top level url
+        retry (int, optional): number of time to retry a request that fail with transient error (connection error, 5xx, 429 or secondary rate limit). Defaults to 3.
+        concurrency (int, optional): maximum number of in-flight requests and of url in progress. Defaults to 100.
+        log_file (str, optional): name of the log file showing the detail of fail case. Defaults to 'github_crawler_log.txt'.
+        output_dir (str, optional): output directory. Defaults to ''.
+        pretty_json (boolean, optional): make to output json file easier to read. Defaults to True.
+        pool_size (int, optional): maximum number of keep-alive connection per host in the session of each token. Defaults to concurrency.
+        keep_alive (boolean, optional): reuse the connection of the session across request. Defaults to True.
+        connection_stats (ConnectionStats, optional): counter that will be updated with the number of connection opened and reused. Defaults to None.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry. Defaults to None (exponential backoff with jitter and ``retry`` maximum retry).
+        output_format (str, optional): output format that save one file per url (see github_crawler_multipage). Defaults to 'json'.
+        http_cache (HttpCache, optional): on-disk cache used to send conditional request (ETag / Last-Modified). Defaults to None.
+        metrics (CrawlMetrics, optional): metrics that will be updated with the url of every level. Defaults to None.
+        hooks (list, optional): list of CrawlHooks that is called before and after every request. Defaults to None.
+        concurrency_controller (AdaptiveConcurrency, optional): controller that adjust the number of in-flight requests (at most concurrency). Defaults to None.
+        json_codec (str, optional): 'orjson', 'json' or 'auto' to decode the page and encode the compact item with orjson if it is installed otherwise json. Defaults to 'auto'.
+        projection (list, optional): list of field path kept in the output of the top level url (the child url is derived before the projection). Defaults to None (every field).
+
+    Raises:
+        LengthNotMatchError: Raised when the length of savename and url is not the same
+        InputNotStringError: Raised when not all of member in savename or url are string
+        NoTokenError: Raised when input list of github token is empty
+        OutputFormatNotSupportedError: Raised when output_format is not supported or save every url in a shared store
+        PlanNotValidError: Raised when a level of the plan is not a CrawlLevel
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        FieldPathError: Raised when a field path of projection cannot be parsed
+    """
+    return run_coroutine(github_crawler_plan_async(savename, url, GHtoken, plan, retry=retry, concurrency=concurrency, log_file=log_file,
+                                                   output_dir=output_dir, pretty_json=pretty_json, pool_size=pool_size, keep_alive=keep_alive,
+                                                   connection_stats=connection_stats, retry_policy=retry_policy, output_format=output_format,
+                                                   http_cache=http_cache, metrics=metrics, hooks=hooks, concurrency_controller=concurrency_controller,
+                                                   json_codec=json_codec, projection=projection))
+
+
+async def github_crawler_plan_async(savename, url, GHtoken, plan, retry=3, concurrency=100, log_file='github_crawler_log.txt', output_dir='', pretty_json=True, pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, output_format='json', http_cache=None, metrics=None, hooks=None, concurrency_controller=None, json_codec='auto', projection=None):
+    """ same as :func:`github_crawler_plan` but awaited in the running event loop, the argument are the same"""
+    _check_input(savename, url, GHtoken, output_format)
+    if OUTPUT_FORMAT[output_format][3] is not None:
+        # the child url is derived from the output file of the parent when the crawler is run again
+        raise OutputFormatNotSupportedError(output_format, 'crawl plan require the output_format that save one file per url')
+    plan = _check_plan(plan)
+    codec = get_codec(json_codec)
+    projection = compile_projection(projection)
+    # if savename and url length is 0 do nothing
+    if len(savename) == 0 and len(url) == 0:
+        return
+    list_to_crawl = _prepare_crawl_list(savename, url, output_dir, output_format, pretty_json)
+    token_scheduler = TokenScheduler(GHtoken)
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retry=retry)
+    hooks = _prepare_hooks(hooks, metrics, token_scheduler, concurrency_controller, concurrency)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    session_pool = SessionPool(pool_size=pool_size or concurrency, keep_alive=keep_alive, stats=connection_stats)
+    try:
+        fetcher = _PageFetcher(executor, session_pool, token_scheduler, retry_policy, concurrency, http_cache, metrics, hooks, concurrency_controller, codec, projection)
+        result = await _crawl_plan(list(zip(savename, list_to_crawl)), plan, concurrency, fetcher, output_dir)
+    finally:
+        if http_cache is not None:
+            http_cache.prune()
+        executor.shutdown(wait=True)
+        session_pool.close()
+    _write_fail_log(log_file, result, pretty_json)
+
+
+async def _crawl_plan(roots, plan, concurrency, fetcher, output_dir):
+    """ crawl the top level input tuple and the child url derived from them with at most concurrency url in progress at the same time
+
+    Args:
+        roots (list): (savename, input tuple) of the top level url
+        plan (list): CrawlLevel of the child of the top level url
+        concurrency (int): maximum number of url in progress
+        fetcher (_PageFetcher): fetcher of the top level url, the fetcher of each level share it with the projection of the level
+        output_dir (string): output directory
+
+    Returns:
+        list: (url, result) of the url of every level in the order they finish
+    """
+    loop = asyncio.get_event_loop()
+    # the deeper level come first so the child url does not pile up behind the top level url
+    queue = asyncio.PriorityQueue()
+    order = itertools.count()
+    scheduled = set()
+    directories = set()
+    fetchers = {}
+    result = []
+    progress = tqdm(total=0)
+
+    def schedule(depth, savename, input_tuple, level):
+        if input_tuple[0] in scheduled:
+            return
+        scheduled.add(input_tuple[0])
+        queue.put_nowait((depth, next(order), savename, input_tuple, level))
+        progress.total = progress.total+1
+        progress.refresh()
+
+    def schedule_child(depth, input_tuple, level, child):
+        """ schedule the (savename, url) child of the level in the same output format as its parent"""
+        _, _, output_format, pretty_json, _ = input_tuple
+        child_path = os.path.join(output_dir, level.name, f'{child[0]}{OUTPUT_FORMAT[output_format][0]}')
+        directory = os.path.dirname(child_path)
+        if directory not in directories:
+            os.makedirs(directory, exist_ok=True)
+            directories.add(directory)
+        schedule(depth-1, child[0], (child_path, child[1], output_format, pretty_json, None), level)
+
+    def expander(depth, savename, input_tuple, levels, children=None):
+        """ return the function that schedule the child url of the item of every page of the url (and add it to children)"""
+        index = itertools.count()
+
+        def on_page(json_r):
+            for item in (json_r if type(json_r) == list else [json_r]):
+                i = next(index)
+                for level in levels:
+                    child = level.child(savename, item, i)
+                    if child is None:
+                        continue
+                    if children is not None:
+                        children[level.name].append(child)
+                    schedule_child(depth, input_tuple, level, child)
+        return on_page
+
+    def level_fetcher(level):
+        if level is None:
+            return fetcher
+        if id(level) not in fetchers:
+            fetchers[id(level)] = fetcher.with_projection(level.projection)
+        return fetchers[id(level)]
+
+    async def worker():
+        while True:
+            depth, _, savename, input_tuple, level = await queue.get()
+            try:
+                levels = plan if level is None else level.children
+                if levels and os.path.exists(input_tuple[0]):
+                    # the url is crawled by the previous run, the child url is read from its children file or derived from its output file
+                    try:
+                        children = await loop.run_in_executor(fetcher.executor, _read_children, input_tuple[0])
+                        if children is not None and all(child_level.name in children for child_level in levels):
+                            for child_level in levels:
+                                for child in children[child_level.name]:
+                                    schedule_child(depth, input_tuple, child_level, tuple(child))
+                        else:
+                            on_page = expander(depth, savename, input_tuple, levels)
+                            on_page(await loop.run_in_executor(fetcher.executor, _read_items, input_tuple[0], input_tuple[2]))
+                        result.append((input_tuple[1], 1))
+                    except Exception as e:
+                        result.append((input_tuple[1], str(e)))
+                else:
+                    url_fetcher = level_fetcher(level)
+                    # the projected output may not have the field of the child url, so the child url is kept for the next run
+                    children = {child_level.name: [] for child_level in levels} if levels and url_fetcher.projection is not None else None
+                    on_page = expander(depth, savename, input_tuple, levels, children) if levels else None
+                    url, is_success, _ = await _collect_json_multipage_async(input_tuple, url_fetcher, on_page=on_page)
+                    if children is not None and is_success == 1:
+                        await loop.run_in_executor(fetcher.executor, _write_children, input_tuple[0], children)
+                    result.append((url, is_success))
+                progress.update(1)
+            finally:
+                queue.task_done()
+
+    for savename, input_tuple in roots:
+        schedule(0, savename, input_tuple, None)
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        progress.close()
+    return result
+
+
+def _read_items(save_path, output_format):
+    """ return the item of the output file"""
+    return list(iter_output_file(save_path, output_format))
+
+
+def _read_children(save_path):
+    """ return {level name: list of (savename, url)} of the children file of the output file or None if there is no children file"""
+    try:
+        with open(save_path + CHILDREN_SUFFIX, 'r') as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return None
+
+
+def _write_children(save_path, children):
+    """ write {level name: list of (savename, url)} to the children file of the output file"""
+    with open(save_path + CHILDREN_SUFFIX + '.tmp', 'w') as outfile:
+        json.dump(children, outfile)
+    os.replace(save_path + CHILDREN_SUFFIX + '.tmp', save_path + CHILDREN_SUFFIX)
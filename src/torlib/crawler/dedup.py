@@ -0,0 +1,119 @@
+import os
+import shutil
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORT = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """ return the url in a canonical form so the same api written differently is crawled once
+
+    The scheme and host are lowercased, the default port, the fragment and the trailing slash of the path are removed
+    and the query parameter are sorted. The path is kept as it is since it can be case sensitive.
+
+    Args:
+        url (string): url of the api
+
+    Returns:
+        string: normalized url
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port is not None and parts.port != DEFAULT_PORT.get(scheme):
+        netloc = f'{netloc}:{parts.port}'
+    if parts.username is not None:
+        netloc = f'{parts.username}{":" + parts.password if parts.password is not None else ""}@{netloc}'
+    path = parts.path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def dedup_crawl_list(list_to_crawl):
+    """ keep the first input tuple of every normalized url, the other input tuple of the same url become its alias
+
+    The input tuple whose output file already exist (moved to the output store later or merged by the incremental crawl)
+    is never grouped since it has to be processed by itself.
+
+    Args:
+        list_to_crawl (list): input tuple (save_path, url, output_format, pretty_json, resume)
+
+    Returns:
+        tuple: (list of input tuple to crawl, {save_path of the crawled input tuple: list of alias input tuple})
+    """
+    unique = []
+    aliases = {}
+    first = {}
+    for input_tuple in list_to_crawl:
+        save_path, url = input_tuple[:2]
+        if os.path.exists(save_path):
+            unique.append(input_tuple)
+            continue
+        key = normalize_url(url)
+        if key in first:
+            aliases.setdefault(first[key], []).append(input_tuple)
+            continue
+        first[key] = save_path
+        unique.append(input_tuple)
+    return unique, aliases
+
+
+def fan_out(list_to_crawl, result, aliases, output_store=None, checkpoint_manifest=None, order=None):
+    """ give the output of every crawled url to its alias and return the result of every input tuple
+
+    The output file of the alias is a hardlink of the output file of the crawled url (copied if hardlink is not supported),
+    so the file of the url and its alias is the same file until one of them is replaced
+    (the incremental crawl write the merged file to ``.part`` and rename it, which break the link of that file only).
+    With the output store the alias is another index record that point to the same block.
+    The alias of the url that cannot be crawled get the same error.
+
+    Args:
+        list_to_crawl (list): input tuple that is crawled
+        result (list): (url, result, pages) of every input tuple in list_to_crawl
+        aliases (dict): alias input tuple of the save path (from dedup_crawl_list)
+        output_store (ShardStore, optional): store of the output. Defaults to None.
+        checkpoint_manifest (CheckpointManifest, optional): checkpoint that the alias is committed as done. Defaults to None.
+        order (list, optional): save_path of every input tuple before dedup, the result is returned in this order. Defaults to None (every alias after its url).
+
+    Returns:
+        tuple: (list of (url, result) of every input tuple and its alias, number of request saved)
+    """
+    fan_out_result = []
+    by_path = {}
+    saved = 0
+    links = []
+    for input_tuple, (url, is_success, pages) in zip(list_to_crawl, result):
+        fan_out_result.append((url, is_success))
+        by_path.setdefault(input_tuple[0], []).append((url, is_success))
+        for alias in aliases.get(input_tuple[0], []):
+            fan_out_result.append((alias[1], is_success))
+            by_path.setdefault(alias[0], []).append((alias[1], is_success))
+            if is_success != 1:
+                continue
+            saved += pages
+            links.append((input_tuple[0], alias[0]))
+    if order is not None:
+        # the same save_path can be given more than once, each of them take the next result of the path
+        fan_out_result = [by_path[save_path].pop(0) for save_path in order]
+    if output_store is not None:
+        output_store.add_alias(links)
+    else:
+        for source, alias in links:
+            _link(source, alias)
+    if checkpoint_manifest is not None:
+        for _, alias in links:
+            checkpoint_manifest.commit_done(alias)
+    return fan_out_result, saved
+
+
+def _link(source, alias):
+    """ replace alias with a hardlink of source (copy if hardlink is not supported)"""
+    os.makedirs(os.path.dirname(alias) or '.', exist_ok=True)
+    tmp_path = alias + '.link'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, alias)
@@ -1,11 +1,36 @@
-import multiprocessing as mp
-from tqdm import tqdm
 import os
+import re
 import time
-import requests
 import json
+import collections
 from pathlib import Path
-import responses
+from urllib.parse import urlparse, parse_qs, urlencode
+# requests, tqdm, multiprocessing, asyncio and the thread pool are imported in the function that use them
+# so importing the module (e.g. in every worker process) stay fast
+from .writer import OUTPUT_FORMAT, open_writer
+from .codec import get_codec, JsonCodecNotSupportedError
+from .projection import compile_projection, FieldPathError
+from .checkpoint import CheckpointManifest
+from .output_store import open_store
+from .dedup import dedup_crawl_list, fan_out
+from .schedule import SCHEDULE, ScheduleNotSupportedError, PageCountHistory, estimate_pages, plan_chunks
+from .incremental import HighWaterMark, DeltaCollector, newest_timestamp, newest_in_file, incremental_params, merge_output
+
+# session pool, token scheduler, retry policy and page thread pool of the current worker process, created by _init_worker
+_session_pool = None
+_token_scheduler = None
+_retry_policy = None
+_page_executor = None
+_page_window = 1
+_checkpoint = None
+_http_cache = None
+_output_store = None
+_metrics = None
+_hooks = ()
+_high_water_mark = None
+_concurrency_controller = None
+_codec = None
+_projection = None
 
 
 class NoTokenError(Exception):
@@ -59,26 +84,332 @@ class InputNotStringError(Exception):
         return f'{self.error_list_name} -> {self.message}'
 
 
-def github_crawler_multipage(savename, url, GHtoken, retry=3, pc=1, log_file='github_crawler_log.txt', output_dir='', for_test=False, pretty_json=True):
+class OutputFormatNotSupportedError(Exception):
+    """Raised when the output format is not supported
+
+    Attributes:
+        output_format (string): input output format that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, output_format, message=f"output_format must be one of {list(OUTPUT_FORMAT)}"):
+        self.output_format = output_format
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'output_format={self.output_format} -> {self.message}'
+
+
+class ModeNotSupportedError(Exception):
+    """Raised when the crawl mode is not supported
+
+    Attributes:
+        mode (string): input mode that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, mode, message="mode must be 'process', 'async' or 'graphql'"):
+        self.mode = mode
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'mode={self.mode} -> {self.message}'
+
+
+def github_crawler_multipage(savename, url, GHtoken, retry=3, pc=1, log_file='github_crawler_log.txt', output_dir='', for_test=False, pretty_json=True, mode='process', concurrency=None, pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, output_format='json', checkpoint=False, http_cache=None, shard_size=256*1024**2, metrics=None, hooks=None, incremental=False, concurrency_controller=None, dedup=False, json_codec='auto', projection=None, schedule='input', pace=False, dry_run=False, rate_limit_url=None, record_history=False):
     """ crawl the github api and save file to json this function will also generate the log file that show the url of api that cannot be crawled
 
     Args:
         savename (list): contain string of the save file name (need to be same length as url)
         url (list): contain string of url of the target api (need to be same length as savename)
-        GHtoken (list): list of github token
-        retry (int, optional): number of time to retry crawling the fail case. Defaults to 3.
-        pc (int, optional): number of process for multiprocessing. Defaults to 1.
+        GHtoken (list): list of github token, each request use the token with the most remaining rate limit
+        retry (int, optional): number of time to retry a request that fail with transient error (connection error, 5xx, 429 or secondary rate limit), only the failed page is requested again. Defaults to 3.
+        pc (int, optional): number of process for multiprocessing (only used when mode is 'process'). Defaults to 1.
         log_file (str, optional): name of the log file showing the detail of fail case. Defaults to 'github_crawler_log.txt'.
         output_dir (str, optional): output directory. Defaults to ''.
         for_test (boolean, optional): used for testing or not. Defaults to False.
         pretty_json (boolean, optional): make to output json file easier to read. Defaults to True.
+        mode (str, optional): 'process' to crawl with a multiprocessing pool, 'async' to crawl with the asyncio engine in a single process
+            or 'graphql' to look up the repository, issue or pull request url in batched graphql query (see :func:`torlib.crawler.graphql_crawler.github_crawler_graphql`),
+            for_test, concurrency, http_cache, incremental, concurrency_controller, dedup, schedule, pace, dry_run, rate_limit_url and record_history cannot be used in 'graphql' mode. Defaults to 'process'.
+        concurrency (int, optional): maximum number of in-flight requests, the page of the same url are fetched concurrently within this limit (in 'process' mode each process can have concurrency/pc requests in-flight).
+            Many in-flight requests on few token can trigger the secondary rate limit of github. Defaults to None (one request per process in 'process' mode like the crawler before the page are fetched concurrently, 100 in 'async' mode).
+        pool_size (int, optional): maximum number of keep-alive connection per host in the session of each token. Defaults to the number of in-flight requests of each worker.
+        keep_alive (boolean, optional): reuse the connection of the session across request. Defaults to True.
+        connection_stats (ConnectionStats, optional): counter that will be updated with the number of connection opened and reused. Defaults to None.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry. Defaults to None (exponential backoff with jitter and ``retry`` maximum retry).
+        output_format (str, optional): 'json' to save each url as json array (savename.json), 'jsonl' to save each url as JSON Lines (savename.jsonl),
+            'json.gz', 'jsonl.gz', 'json.zst' or 'jsonl.zst' to save each url as compressed file (zstd require zstandard package),
+            'jsonl_shard' to save every url as JSON Lines shard files with an index or 'archive' to save every url in a single indexed archive.
+            The item of each page is written to the file as soon as the page arrive. The output can be read with :func:`torlib.crawler.output_store.read_output`. Defaults to 'json'.
+        checkpoint (boolean, optional): record the progress of every url in a checkpoint log in output_dir, when the crawler is run again the completed url are skipped and the partially crawled url continue from the last written page. Defaults to False.
+        http_cache (HttpCache, optional): on-disk cache used to send conditional request (ETag / Last-Modified) and reuse the cached page when github return 304. Defaults to None.
+        shard_size (int, optional): size in byte of each shard before rolling over to a new shard (only used when output_format is 'jsonl_shard'). Defaults to 256 MB.
+        metrics (CrawlMetrics, optional): metrics that will be updated with the request latency, byte downloaded, page per url, waiting time, retry and token quota. Defaults to None.
+        hooks (list, optional): list of CrawlHooks that is called before and after every request (must be picklable in 'process' mode). Defaults to None.
+        incremental (boolean, optional): record the newest ``updated_at`` (or commit date or ``created_at``) of the item of every url in output_dir,
+            when the output file of the url exist only the item updated since then are requested (with ``since``, ``sort=updated`` and ``direction=desc``)
+            and merged into the output file. Only for the output format that save one file per url. Defaults to False.
+        concurrency_controller (AdaptiveConcurrency, optional): controller that adjust the number of in-flight requests of every process (at most concurrency)
+            from the latency, error and rate limit of the response. Defaults to None (always concurrency).
+        dedup (boolean, optional): request the url that is the same after normalization (see :func:`torlib.crawler.dedup.normalize_url`) only once
+            and give its output to every savename of the url (as hardlink or as another index record of the output store).
+            The hardlinked file is the same file until the incremental crawl replace one of them with its merged file. Defaults to False.
+        json_codec (str, optional): 'orjson', 'json' or 'auto' to decode the page and encode the compact item with orjson if it is installed otherwise json.
+            Without pretty_json the body of the page is written to the json array file without parsing when nothing need the item (see :mod:`torlib.crawler.codec`). Defaults to 'auto'.
+        projection (list, optional): list of field path such as ``['number', 'title', 'user.login', 'labels[*].name']``, only these field of each item
+            are kept as soon as the page arrive (see :class:`torlib.crawler.projection.FieldProjection`). The incremental crawl need the timestamp and the id of the item in the projection. Defaults to None (every field).
+        schedule (str, optional): order of the url sent to the process pool (only used when mode is 'process'). 'input' to send the url one by one in input order,
+            'history' to send the url from the largest number of page recorded by the previous crawl in output_dir (``.github_crawler_pages``) and group the small url into larger task,
+            'probe' same as 'history' but the url without history is estimated from the link header of a HEAD request of its first page first. Defaults to 'input'.
+        pace (boolean, optional): spread the remaining rate limit of each token until its reset time instead of using it up and sleeping until the reset
+            (see :class:`torlib.crawler.token_scheduler.TokenScheduler`), used when the crawl is larger than the rate limit of the token. Defaults to False.
+        dry_run (boolean, optional): do not crawl, return the estimated number of request, wall-clock time and the time each token run dry (print it to see the summary)
+            from the page count history in output_dir and a HEAD request of the first page of the other url (see :func:`torlib.crawler.quota.plan_crawl`). Defaults to False.
+        record_history (boolean, optional): record the number of page of every url in ``.github_crawler_pages`` in output_dir for schedule and dry_run of the next crawl,
+            the history is always recorded when schedule is not 'input'. Defaults to False.
+        rate_limit_url (str, optional): url of the rate limit endpoint read by dry_run. Defaults to None (``/rate_limit`` of the host of the first url, ``/api/v3/rate_limit`` for github enterprise).
 
     Raises:
         LengthNotMatchError: Raised when the length of savename and url is not the same
         InputNotStringError: Raised when not all of member in savename or url are string
         NoTokenError: Raised when input list of github token is empty
+        ModeNotSupportedError: Raised when mode is not 'process', 'async' or 'graphql' or an argument that 'graphql' mode does not support is given
+        OutputFormatNotSupportedError: Raised when output_format is not supported or is not supported by incremental crawl
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        FieldPathError: Raised when a field path of projection cannot be parsed
+        ScheduleNotSupportedError: Raised when schedule is not 'input', 'history' or 'probe'
+        RateLimitNotAvailableError: Raised when the rate limit of a token cannot be read in dry_run
+
+    Returns:
+        QuotaPlan: estimated cost of the crawl when dry_run is True otherwise None
+
+    """
+    import multiprocessing as mp
+    from tqdm import tqdm
+    from .token_scheduler import TokenScheduler
+    from .retry import RetryPolicy
+    if mode not in ('process', 'async', 'graphql'):
+        raise ModeNotSupportedError(mode)
+    if schedule not in SCHEDULE:
+        raise ScheduleNotSupportedError(schedule)
+    if mode == 'graphql':
+        # the graphql crawl send one query per process and does not request the rest api page
+        unsupported = {'for_test': for_test, 'concurrency': concurrency is not None, 'http_cache': http_cache is not None, 'incremental': incremental,
+                       'concurrency_controller': concurrency_controller is not None, 'dedup': dedup, 'schedule': schedule != 'input', 'pace': pace,
+                       'dry_run': dry_run, 'rate_limit_url': rate_limit_url is not None, 'record_history': record_history}
+        for name, is_set in unsupported.items():
+            if is_set:
+                raise ModeNotSupportedError(mode, f"{name} is not supported in 'graphql' mode")
+    if concurrency is None:
+        concurrency = 100 if mode == 'async' else pc
+    if dry_run:
+        from .quota import plan_crawl
+        return plan_crawl(savename, url, GHtoken, output_dir=output_dir, pc=pc, concurrency=concurrency, rate_limit_url=rate_limit_url, output_format=output_format,
+                          dedup=dedup, incremental=incremental, retry=retry, pool_size=pool_size, keep_alive=keep_alive, retry_policy=retry_policy)
+    if mode == 'graphql':
+        from .graphql_crawler import github_crawler_graphql
+        return github_crawler_graphql(savename, url, GHtoken, retry=retry, pc=pc, log_file=log_file, output_dir=output_dir, pretty_json=pretty_json,
+                                      pool_size=pool_size, keep_alive=keep_alive, connection_stats=connection_stats, retry_policy=retry_policy,
+                                      output_format=output_format, checkpoint=checkpoint, shard_size=shard_size, metrics=metrics, hooks=hooks,
+                                      json_codec=json_codec, projection=projection)
+    if mode == 'async':
+        from .async_crawler import github_crawler_multipage_async, run_coroutine
+        return run_coroutine(github_crawler_multipage_async(savename, url, GHtoken, retry=retry, concurrency=concurrency, log_file=log_file,
+                                                            output_dir=output_dir, for_test=for_test, pretty_json=pretty_json,
+                                                            pool_size=pool_size, keep_alive=keep_alive, connection_stats=connection_stats,
+                                                            retry_policy=retry_policy, output_format=output_format, checkpoint=checkpoint,
+                                                            http_cache=http_cache, shard_size=shard_size, metrics=metrics, hooks=hooks,
+                                                            incremental=incremental, concurrency_controller=concurrency_controller, dedup=dedup,
+                                                            json_codec=json_codec, projection=projection, pace=pace, record_history=record_history))
+    _check_input(savename, url, GHtoken, output_format, incremental)
+    codec = get_codec(json_codec)
+    projection = compile_projection(projection)
+    # if savename and url length is 0 do nothing
+    if len(savename) == 0 and len(url) == 0:
+        return
+    checkpoint_manifest = CheckpointManifest(output_dir) if checkpoint else None
+    output_store = open_store(output_dir, output_format, shard_size)
+    list_to_crawl = _prepare_crawl_list(savename, url, output_dir, output_format, pretty_json, checkpoint_manifest, output_store, incremental)
+    aliases = {}
+    order = None
+    if dedup:
+        order = [input_tuple[0] for input_tuple in list_to_crawl]
+        list_to_crawl, aliases = dedup_crawl_list(list_to_crawl)
+    high_water_mark = HighWaterMark(output_dir) if incremental else None
+    if high_water_mark is not None:
+        high_water_mark.load()
+    # the token scheduler is shared by every worker process
+    token_scheduler = TokenScheduler(GHtoken, pace=pace)
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retry=retry)
+    hooks = _prepare_hooks(hooks, metrics, token_scheduler, concurrency_controller, concurrency)
+    print(f'crawl {len(list_to_crawl)} url')
+    # create pool for multiprocessing, each failed request is retried inside the worker
+    page_workers = max(concurrency // pc, 1)
+    with mp.Pool(pc, initializer=_init_worker, initargs=(token_scheduler, retry_policy, pool_size or page_workers, keep_alive, connection_stats,
+                                                         page_workers, checkpoint_manifest, http_cache, output_store, metrics, hooks,
+                                                         high_water_mark, concurrency_controller, codec, projection)) as p:
+        if for_test:
+            from ._testing import _collect_json_multipage_for_testing as collect
+        else:
+            collect = _collect_pages
+        history = None
+        if record_history or schedule != 'input':
+            history = PageCountHistory(output_dir)
+            history.load()
+        if schedule == 'input':
+            multi_out = tqdm(p.imap(collect, list_to_crawl, chunksize=1), total=len(list_to_crawl))
+            result = [i for i in multi_out]
+        else:
+            result = _collect_by_size(p, collect, list_to_crawl, history, pc, page_workers, schedule == 'probe', incremental)
+    if history is not None:
+        history.update(list_to_crawl, result)
+    result = _fan_out(list_to_crawl, result, aliases, output_store, checkpoint_manifest, metrics, order)
+    if checkpoint_manifest is not None:
+        checkpoint_manifest.close()
+    if http_cache is not None:
+        http_cache.prune()
+    _write_fail_log(log_file, result, pretty_json)
+
+
+def iter_github_pages(crawl_input, GHtoken, retry=3, concurrency=100, log_file=None, for_test=False, pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, http_cache=None, metrics=None, hooks=None, concurrency_controller=None, json_codec='auto', projection=None):
+    """ crawl the github api and yield the item of every page as soon as it arrive instead of saving file
+
+    The page are fetched by the asyncio engine (see :func:`torlib.crawler.async_crawler.iter_github_pages_async`)
+    which only run while the generator is being consumed. The input is read lazily so it can be a generator of million of url.
+
+    Args:
+        crawl_input (iterable): (savename, url) of every url to crawl, can be a generator
+        GHtoken (list): list of github token, each request use the token with the most remaining rate limit
+        retry (int, optional): number of time to retry a request that fail with transient error (connection error, 5xx, 429 or secondary rate limit). Defaults to 3.
+        concurrency (int, optional): maximum number of in-flight requests. Defaults to 100.
+        log_file (str, optional): name of the log file showing the url that cannot be crawled and its error message, written when the iteration stop. Defaults to None (no log file).
+        for_test (boolean, optional): used for testing or not. Defaults to False.
+        pool_size (int, optional): maximum number of keep-alive connection per host in the session of each token. Defaults to concurrency.
+        keep_alive (boolean, optional): reuse the connection of the session across request. Defaults to True.
+        connection_stats (ConnectionStats, optional): counter that will be updated with the number of connection opened and reused. Defaults to None.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry. Defaults to None (exponential backoff with jitter and ``retry`` maximum retry).
+        http_cache (HttpCache, optional): on-disk cache used to send conditional request (ETag / Last-Modified). Defaults to None.
+        metrics (CrawlMetrics, optional): metrics that will be updated with the request latency, byte downloaded, page per url, waiting time, retry and token quota. Defaults to None.
+        hooks (list, optional): list of CrawlHooks that is called before and after every request. Defaults to None.
+        concurrency_controller (AdaptiveConcurrency, optional): controller that adjust the number of in-flight requests (at most concurrency). Defaults to None.
+        json_codec (str, optional): 'orjson', 'json' or 'auto' to decode the page with orjson if it is installed otherwise json. Defaults to 'auto'.
+        projection (list, optional): list of field path, only these field of the item of the page are yielded. Defaults to None (every field).
+
+    Raises:
+        NoTokenError: Raised when input list of github token is empty
+        InputNotStringError: Raised when savename or url in crawl_input is not string
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        FieldPathError: Raised when a field path of projection cannot be parsed
+
+    Yields:
+        tuple: (savename, page, items) items is the json of the page, the page of the same url are yielded in page order
+    """
+    import asyncio
+    from .async_crawler import iter_github_pages_async
+    pages = iter_github_pages_async(crawl_input, GHtoken, retry=retry, concurrency=concurrency, log_file=log_file, for_test=for_test,
+                                    pool_size=pool_size, keep_alive=keep_alive, connection_stats=connection_stats, retry_policy=retry_policy,
+                                    http_cache=http_cache, metrics=metrics, hooks=hooks, concurrency_controller=concurrency_controller,
+                                    json_codec=json_codec, projection=projection)
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(pages.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(pages.aclose())
+        loop.close()
+
+
+def _init_worker(token_scheduler, retry_policy, pool_size, keep_alive, connection_stats, page_workers, checkpoint_manifest=None, http_cache=None, output_store=None, metrics=None, hooks=(), high_water_mark=None, concurrency_controller=None, codec=None, projection=None):
+    """ set the token scheduler, retry policy, checkpoint, http cache, output store, metrics, hooks, high water mark, concurrency controller, json codec and projection and create the session pool and the thread pool used to fetch the page of the worker process"""
+    import concurrent.futures
+    from .session import SessionPool
+    global _session_pool, _token_scheduler, _retry_policy, _page_executor, _page_window, _checkpoint, _http_cache, _output_store, _metrics, _hooks, _high_water_mark, _concurrency_controller, _codec, _projection
+    _codec = codec
+    _projection = projection
+    _concurrency_controller = concurrency_controller
+    _high_water_mark = high_water_mark
+    _metrics = metrics
+    _hooks = hooks
+    _checkpoint = checkpoint_manifest
+    _http_cache = http_cache
+    _output_store = output_store
+    _token_scheduler = token_scheduler
+    _retry_policy = retry_policy
+    _session_pool = SessionPool(pool_size=pool_size, keep_alive=keep_alive, stats=connection_stats)
+    _page_executor = concurrent.futures.ThreadPoolExecutor(max_workers=page_workers)
+    _page_window = page_workers
+
+
+def _prepare_hooks(hooks, metrics, token_scheduler, concurrency_controller=None, concurrency=None):
+    """ return the tuple of hook called before and after every request (metrics is the last hook),
+    let metrics read the token quota and the limit of the concurrency controller and cap the limit to concurrency"""
+    hooks = list(hooks or [])
+    if concurrency_controller is not None and concurrency_controller.max_limit is None:
+        concurrency_controller.max_limit = concurrency
+    if metrics is not None:
+        metrics.token_scheduler = token_scheduler
+        metrics.concurrency_controller = concurrency_controller
+        hooks.append(metrics)
+    return tuple(hooks)
 
+
+def _get_session_pool():
+    """ return the session pool of the current process (create with default setting if not exist)"""
+    global _session_pool
+    if _session_pool is None:
+        from .session import SessionPool
+        _session_pool = SessionPool()
+    return _session_pool
+
+
+def _get_token_scheduler():
+    """ return the token scheduler of the current process
+
+    Raises:
+        NoTokenError: Raised when the worker process is not initialized with the token scheduler
     """
+    if _token_scheduler is None:
+        raise NoTokenError()
+    return _token_scheduler
+
+
+def _get_codec():
+    """ return the json codec of the current process (orjson if it is installed if not set)"""
+    global _codec
+    if _codec is None:
+        _codec = get_codec()
+    return _codec
+
+
+def _get_page_executor():
+    """ return the thread pool used to fetch the page of the current process (create with one thread if not exist)"""
+    global _page_executor
+    if _page_executor is None:
+        import concurrent.futures
+        _page_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    return _page_executor
+
+
+def _check_input(savename, url, GHtoken, output_format='json', incremental=False):
+    """ validate the input of the crawler
+
+    Raises:
+        LengthNotMatchError: Raised when the length of savename and url is not the same
+        InputNotStringError: Raised when not all of member in savename or url are string
+        NoTokenError: Raised when input list of github token is empty
+        OutputFormatNotSupportedError: Raised when output_format is not supported or is not supported by incremental crawl
+    """
+    if output_format not in OUTPUT_FORMAT:
+        raise OutputFormatNotSupportedError(output_format)
+    if incremental and OUTPUT_FORMAT[output_format][3] is not None:
+        raise OutputFormatNotSupportedError(output_format, 'incremental crawl require the output_format that save one file per url')
     # check the size of savename and url
     if len(savename) != len(url):
         raise LengthNotMatchError(savename, url)
@@ -92,37 +423,107 @@ def github_crawler_multipage(savename, url, GHtoken, retry=3, pc=1, log_file='gi
     # check if github token is empty
     if len(GHtoken) == 0:
         raise NoTokenError()
-    # if savename and url length is 0 do nothing
-    if len(savename) == 0 and len(url) == 0:
-        return
+
+
+def _prepare_crawl_list(savename, url, output_dir, output_format, pretty_json, checkpoint_manifest=None, output_store=None, incremental=False):
+    """ create output_dir and build the input tuple of each url for collect_json_multipage,
+    the url that is completed in the checkpoint or in the output store is skipped and the partially crawled url get its resume state
+    (with incremental the completed url whose output file exist is kept so its new item is merged)
+
+    Returns:
+        list: list of tuple (save_path, url, output_format, pretty_json, resume)
+    """
     # create path to output_dir if not exist
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     # prepared parameter for collect_json_multipage
-    save_path = [os.path.join(output_dir, f'{sn}.json') for sn in savename]
-    list_to_crawl = list(zip(save_path, url))
-    for i in range(len(list_to_crawl)):
-        list_to_crawl[i] = list_to_crawl[i] + \
-            (GHtoken[i % len(GHtoken)], pretty_json,)
-    count_try = 0
-    complete = False
-    while count_try < retry and not complete:
-        print(f'{count_try+1} attempt to crawl {len(list_to_crawl)} url')
-        count_try = count_try+1
-        # create pool for multiprocessing
-        with mp.Pool(pc) as p:
-            multi_out = tqdm(p.imap(__collect_json_multipage if not for_test else __collect_json_multipage_for_testing,
-                                    list_to_crawl, chunksize=1), total=len(list_to_crawl))
-            result = [i for i in multi_out]
-        # check if all of url is complete and list only fail url
-        complete = True
-        remain_list_to_crawl = []
-        for i in range(len(result)):
-            url, is_success = result[i]
-            if is_success != 1:
-                complete = False
-                remain_list_to_crawl.append(list_to_crawl[i])
-        list_to_crawl = remain_list_to_crawl
-        print(list_to_crawl)
+    extension = OUTPUT_FORMAT[output_format][0]
+    save_path = [os.path.join(output_dir, f'{sn}{extension}') for sn in savename]
+    list_to_crawl = zip(save_path, url)
+    if output_store is not None:
+        output_store.load()
+        list_to_crawl = [(sp, u) for sp, u in list_to_crawl if not output_store.is_done(sp)]
+    if checkpoint_manifest is None:
+        return [(sp, u, output_format, pretty_json, None) for sp, u in list_to_crawl]
+    checkpoint_manifest.load()
+    return [(sp, u, output_format, pretty_json, None if checkpoint_manifest.is_done(sp) else checkpoint_manifest.resume_state(sp))
+            for sp, u in list_to_crawl if not checkpoint_manifest.is_done(sp) or (incremental and os.path.exists(sp))]
+
+
+def _collect_by_size(p, collect, list_to_crawl, history, pc, page_workers, probe=False, incremental=False):
+    """ send the url to the pool from the largest estimated number of page and the small url in group (see :func:`torlib.crawler.schedule.plan_chunks`)
+
+    Returns:
+        list: (url, result, pages) of every input tuple in list_to_crawl
+    """
+    import functools
+    from tqdm import tqdm
+    estimate = estimate_pages(list_to_crawl, history, incremental)
+    if probe:
+        estimate = _probe_estimate(p, list_to_crawl, estimate, page_workers)
+    chunks = plan_chunks(estimate, pc)
+    result = [None]*len(list_to_crawl)
+    with tqdm(total=len(list_to_crawl)) as progress:
+        for chunk_result in p.imap_unordered(functools.partial(_collect_chunk, collect), [[(i, list_to_crawl[i]) for i in chunk] for chunk in chunks]):
+            for i, r in chunk_result:
+                result[i] = r
+            progress.update(len(chunk_result))
+    return result
+
+
+def _probe_estimate(p, list_to_crawl, estimate, page_workers):
+    """ probe the url whose estimate is None with the pool and return the estimate with its last page (None if the probe fail)"""
+    estimate = list(estimate)
+    unknown = [i for i, pages in enumerate(estimate) if pages is None]
+    urls = [list_to_crawl[i][1] for i in unknown]
+    probed = p.map(_probe_chunk, [urls[i:i+page_workers] for i in range(0, len(urls), page_workers)])
+    for i, pages in zip(unknown, (pages for chunk in probed for pages in chunk)):
+        estimate[i] = pages
+    return estimate
+
+
+def _probe(list_to_crawl, estimate, GHtoken, pc, concurrency, retry=3, pool_size=None, keep_alive=True, retry_policy=None):
+    """ same as _probe_estimate but with a new process pool (used by the dry run)"""
+    import multiprocessing as mp
+    from .token_scheduler import TokenScheduler
+    from .retry import RetryPolicy
+    page_workers = max(concurrency // pc, 1)
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retry=retry)
+    with mp.Pool(pc, initializer=_init_worker, initargs=(TokenScheduler(GHtoken), retry_policy, pool_size or page_workers, keep_alive, None, page_workers)) as p:
+        return _probe_estimate(p, list_to_crawl, estimate, page_workers)
+
+
+def _collect_chunk(collect, chunk):
+    """ collect every (index, input_tuple) of the task one by one and return the list of (index, (url, result, pages))"""
+    return [(i, collect(input_tuple)) for i, input_tuple in chunk]
+
+
+def _probe_chunk(urls):
+    """ probe the url of the task concurrently with the page thread pool and return the last page of every url"""
+    return list(_get_page_executor().map(_probe_pages, urls))
+
+
+def _probe_pages(url):
+    """ send HEAD request of the first page of the url and return the last page from its link header (None if the request fail)"""
+    page_url = _page_url(url, 1)
+    try:
+        r = _request(page_url, lambda session: session.head(page_url))
+        return _last_page(r.headers) if r.status_code == 200 else None
+    except Exception:
+        return None
+
+
+def _fan_out(list_to_crawl, result, aliases, output_store, checkpoint_manifest, metrics, order=None):
+    """ give the output of the crawled url to its duplicate, count the request saved and return (url, result) of every input tuple and its duplicate in input order"""
+    result, saved = fan_out(list_to_crawl, result, aliases, output_store, checkpoint_manifest, order)
+    deduplicated = sum(len(duplicate) for duplicate in aliases.values())
+    if metrics is not None:
+        metrics.add_deduplicated(deduplicated, saved)
+    return result
+
+
+def _write_fail_log(log_file, result, pretty_json):
+    """ write the url that cannot be crawled and its error message to log_file"""
     # list url that cannot be crawled
     fail_list = [(url, is_success)
                  for url, is_success in result if is_success != 1]
@@ -133,85 +534,272 @@ def github_crawler_multipage(savename, url, GHtoken, retry=3, pc=1, log_file='gi
             json.dump(fail_list, outfile)
 
 
+def _page_url(url, page, params=None):
+    """ return the url of the given page of the api with the additional query parameter"""
+    return url+'?per_page=100&page='+str(page)+('&'+urlencode(params) if params else '')
+
+
+def _is_rate_limited(r):
+    """ return True if the request is rejected because the rate limit of its token is exhausted"""
+    return r.status_code in (403, 429) and int(r.headers.get('X-RateLimit-Remaining', 1)) <= 0
+
+
+def _last_page(headers):
+    """ return the last page number from the link header of the first page
+
+    Args:
+        headers (dict): header of the response of the first page
+
+    Raises:
+        ValueError: Raised when the link header has rel="last" but its url does not contain page number
+
+    Returns:
+        int: last page number (1 if there is no rel="last" in the link header)
+    """
+    if 'link' not in headers or 'rel="last"' not in headers['link']:
+        return 1
+    match = re.search(r'<([^>]*)>\s*;\s*rel="last"', headers['link'])
+    page = parse_qs(urlparse(match.group(1)).query).get('page') if match else None
+    if not page:
+        raise ValueError(f'cannot find last page in link header: {headers["link"]}')
+    return int(page[0])
+
+
 def __collect_json_multipage(input_tuple):
     """ save response from request as json file
 
     Args:
         input_tuple (tuple): tuple contain three variables: 
 
-        - save_path (string) save file name with path url (string) 
+        - save_path (string) save file name with path
+
+        - url (string) url of the api
 
-        - url of the api GHtoken (string) - Github Token
+        - output_format (string) 'json' or 'jsonl'
 
         - pretty_json (boolean) - make to output json file easier to read
 
+        - resume (tuple) - (page, offset, count) of the last committed page in the checkpoint or None
+
     Returns:
         tuple: (url, result) showing status of the crawling
         result will be 1 if sucess otherwise it will
         be the exception message of the error that occur
     """
-    save_path, url, GHtoken, pretty_json = input_tuple
-    # if the file is exist proceed to next one
+    return _collect_pages(input_tuple)[:2]
+
+
+def _collect_pages(input_tuple):
+    """ same as collect_json_multipage but also return the number of page requested
+
+    Returns:
+        tuple: (url, result, pages)
+    """
+    save_path, url, output_format, pretty_json, resume = input_tuple
+    # if the file is exist proceed to next one (the file that is written but not moved to the output store is moved now)
     if os.path.exists(save_path):
-        return (url, 1)
-    page = 1
-    stop_flag = False  # track last page
-    result_json = []
+        if _high_water_mark is not None:
+            return _collect_delta(save_path, url, output_format, pretty_json)
+        if _output_store is not None:
+            _output_store.append(save_path)
+        return (url, 1, 0)
+    pages = 0
+    newest = None
     try:
-        while not stop_flag:
-            r = requests.get(url+'?per_page=100&page='+str(page),
-                             headers={'Authorization': 'token '+GHtoken})
-            # if ratelimit is not remain wait until rate limit reset and try again
-            if int(r.headers['X-RateLimit-Remaining']) <= 0:
-                current_time = time.time()
-                left_time = current_time - int(r.headers['X-RateLimit-Reset'])
-                while(left_time < 0):
-                    time.sleep(10)
-                    current_time = time.time()
-                    left_time = current_time - \
-                        int(r.headers['X-RateLimit-Reset'])
-                r = requests.get(url+'?per_page=100&page='+str(page),
-                                 headers={'Authorization': 'token '+GHtoken})
-            json_r = r.json()
-            if type(json_r) == dict:
-                result_json.append(json_r)
-            else:
-                result_json.extend(json_r)
-            page = page+1
-            # stop if last page
-            if 'link' not in r.headers or 'rel="last"' not in r.headers['link']:
-                stop_flag = True
-        # save json file
-        with open(save_path, 'w') as outfile:
-            if pretty_json:
-                json.dump(result_json, outfile, indent=4)
-            else:
-                json.dump(result_json, outfile)
+        writer = open_writer(save_path, output_format, pretty_json, resume and resume[1:], _get_codec(), _projection)
+        try:
+            # write each page to the file as soon as it arrive and commit it to the checkpoint
+            for page, r in _iter_pages(url, resume[0]+1 if writer.resumed else 1):
+                # the body is written without parsing unless the item is needed (pretty json, projection or the high water mark)
+                if _high_water_mark is not None or not writer.write_raw_page(r.content):
+                    json_r = _get_codec().loads(r.content)
+                    writer.write_page(json_r)
+                    if _high_water_mark is not None:
+                        newest = newest_timestamp(json_r, newest)
+                pages = pages+1
+                if _checkpoint is not None and writer.resumable:
+                    _checkpoint.commit_page(save_path, page, writer.tell(), writer.count)
+        except BaseException:
+            writer.abort(keep_part=_checkpoint is not None)
+            raise
+        writer.close()
+        if _output_store is not None:
+            _output_store.append(save_path)
+        if _checkpoint is not None:
+            _checkpoint.commit_done(save_path)
+        if newest is not None:
+            _high_water_mark.set(save_path, newest)
     # return error
     except Exception as e:
-        return (url, str(e))
-    return (url, 1)
-
-
-@responses.activate
-def __collect_json_multipage_for_testing(input_tuple):
-    """ function used for testing only"""
-    responses.add(responses.GET,
-                  'http://test_github/api/1?per_page=100&page=1',
-                  status=200,
-                  content_type='application/json',
-                  headers={'X-RateLimit-Remaining': '100000'},
-                  body='{"test": "test1"}')
-    responses.add(responses.GET,
-                  'http://test_github/api/2?per_page=100&page=1',
-                  status=200,
-                  content_type='application/json',
-                  headers={'X-RateLimit-Remaining': '100000'},
-                  body='{"test": "test2"}')
-    responses.add(responses.GET,
-                  'http://test_github/api/3?per_page=100&page=1',
-                  status=200,
-                  content_type='application/json',
-                  headers={'X-RateLimit-Remaining': '100000'},
-                  body='{"test": "test3"}')
-    return __collect_json_multipage(input_tuple)
+        if _metrics is not None:
+            _metrics.add_url(pages, False)
+        return (url, str(e), pages)
+    if _metrics is not None:
+        _metrics.add_url(pages, True)
+    return (url, 1, pages)
+
+
+def _collect_delta(save_path, url, output_format, pretty_json):
+    """ request the item updated since the high water mark of the url (newest first, stop at the item older than the mark)
+    and merge them into the existing output file
+
+    Returns:
+        tuple: (url, result, pages) showing status of the crawling
+    """
+    page = 0
+    try:
+        mark = _high_water_mark.get(save_path)
+        if mark is None:
+            # the file is crawled before the incremental crawl is used, start from its newest item
+            mark = newest_in_file(save_path, output_format)
+            if mark is None:
+                return (url, 1, 0)
+        delta = DeltaCollector(mark, _projection)
+        while not delta.done:
+            page = page+1
+            r = _get_page(url, page, incremental_params(mark))
+            delta.add_page(_get_codec().loads(r.content))
+            if page >= _last_page(r.headers):
+                break
+        if delta.items:
+            merge_output(save_path, output_format, pretty_json, delta.items, _get_codec())
+        _high_water_mark.set(save_path, delta.newest)
+    except Exception as e:
+        if _metrics is not None:
+            _metrics.add_url(page, False)
+        return (url, str(e), page)
+    if _metrics is not None:
+        _metrics.add_url(page, True)
+    return (url, 1, page)
+
+
+def _iter_pages(url, start_page=1):
+    """ yield (page, response) of every page of the url from start_page in page order
+
+    The last page is read from the link header of the start page, then the remaining page are fetched
+    concurrently by the page thread pool, at most _page_window page are fetched ahead of the page being yielded.
+    """
+    r = _get_page(url, start_page)
+    last_page = _last_page(r.headers)
+    yield start_page, r
+    pages = iter(range(start_page+1, last_page+1))
+    window = collections.deque()
+    try:
+        for page in pages:
+            window.append((page, _get_page_executor().submit(_get_page, url, page)))
+            if len(window) >= _page_window:
+                break
+        while window:
+            page, future = window.popleft()
+            r = future.result()
+            for next_page in pages:
+                window.append((next_page, _get_page_executor().submit(_get_page, url, next_page)))
+                break
+            yield page, r
+    finally:
+        for _, future in window:
+            future.cancel()
+
+
+def _get_page(url, page, params=None):
+    """ request the page of the url with the token that has the most remaining rate limit,
+    if the rate limit of the token is exhausted try again with another token (or wait until a token is reset),
+    if the request fail with transient error wait with backoff and try again
+
+    Raises:
+        requests.RequestException: Raised when the request still fail after retry
+
+    Returns:
+        requests.Response: response of the page
+    """
+    page_url = _page_url(url, page, params)
+    r = _request(page_url, lambda session: _send(session, page_url, _http_cache))
+    if _http_cache is None:
+        return r
+    processed = _http_cache.process(page_url, r)
+    if processed is None:
+        # the cached page is removed after the conditional request is sent, request the whole page again
+        r = _request(page_url, lambda session: _send(session, page_url, None))
+        processed = _http_cache.process(page_url, r) or r
+    return processed
+
+
+def _request(request_url, send, retry_policy=None):
+    """ send the request with the token that has the most remaining rate limit and retry it like _get_page
+
+    Args:
+        request_url (string): url of the request (passed to the hooks)
+        send (function): function that send the request with the session of the token and return the response
+        retry_policy (RetryPolicy, optional): retry policy of this request. Defaults to None (retry policy of the worker).
+
+    Raises:
+        requests.RequestException: Raised when the request still fail after retry
+
+    Returns:
+        requests.Response: response of the request
+    """
+    import requests
+    from .retry import is_secondary_rate_limited
+    token_scheduler = _get_token_scheduler()
+    retry_policy = retry_policy or _retry_policy
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        GHtoken = token_scheduler.acquire()
+        if _metrics is not None:
+            _metrics.add_rate_limit_wait(time.perf_counter()-start)
+        r, error = None, None
+        for hook in _hooks:
+            hook.before_request(request_url, GHtoken)
+        if _concurrency_controller is not None:
+            _concurrency_controller.acquire()
+        start = time.perf_counter()
+        try:
+            r = send(_get_session_pool().get(GHtoken))
+        except requests.RequestException as e:
+            error = e
+        finally:
+            if _concurrency_controller is not None:
+                _concurrency_controller.release(r, error, time.perf_counter()-start)
+        for hook in _hooks:
+            hook.after_request(request_url, r, error, time.perf_counter()-start)
+        if error is None:
+            token_scheduler.update(GHtoken, r.headers)
+            if _is_rate_limited(r):
+                continue
+        delay = _retry_delay(retry_policy, attempt, r, error)
+        if delay is None:
+            return r
+        attempt = attempt+1
+        if _metrics is not None:
+            _metrics.add_retry(delay, r is not None and is_secondary_rate_limited(r))
+        time.sleep(delay)
+
+
+def _send(session, page_url, http_cache):
+    """ send the request of the page, the request is conditional if the page is in http_cache
+
+    Returns:
+        requests.Response: response of the page (304 if the cached page is not modified)
+    """
+    headers = http_cache.conditional_headers(page_url) if http_cache is not None else None
+    return session.get(page_url, headers=headers)
+
+
+def _retry_delay(retry_policy, attempt, r, error):
+    """ return the wait time before retry the request or None if the request succeed
+
+    Raises:
+        Exception: Raised when the request fail and cannot be retried anymore
+    """
+    import requests
+    if not retry_policy.should_retry(r, error):
+        if error is not None:
+            raise error
+        return None
+    if attempt >= retry_policy.max_retry:
+        if error is not None:
+            raise error
+        r.raise_for_status()
+        raise requests.HTTPError(f'{r.status_code} secondary rate limit: {r.url}', response=r)
+    return retry_policy.delay(attempt, r)
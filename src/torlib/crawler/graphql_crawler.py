@@ -0,0 +1,268 @@
+import json
+import multiprocessing as mp
+import os
+import re
+from urllib.parse import urlparse
+import requests
+from tqdm import tqdm
+from . import github_crawler
+from .github_crawler import _check_input, _prepare_crawl_list, _write_fail_log, _init_worker, _prepare_hooks, _request
+from .token_scheduler import TokenScheduler
+from .retry import RetryPolicy
+from .writer import open_writer
+from .checkpoint import CheckpointManifest
+from .output_store import open_store
+from .codec import get_codec
+from .projection import compile_projection
+
+# field of each kind of lookup that is requested when fields is not given
+DEFAULT_FIELDS = {
+    'repository': 'id nameWithOwner description url stargazerCount forkCount isFork isArchived createdAt updatedAt pushedAt primaryLanguage { name }',
+    'issue': 'id number title state url createdAt updatedAt closedAt author { login } comments { totalCount }',
+    'pullRequest': 'id number title state url merged createdAt updatedAt closedAt mergedAt author { login } comments { totalCount }',
+}
+# error of the query that is too large, the batch is split in half and requested again
+SPLIT_ERRORS = ('MAX_NODE_LIMIT_EXCEEDED', 'RESOURCE_LIMITS_EXCEEDED')
+_URL_PATTERN = re.compile(r'/repos/([^/]+)/([^/]+?)(?:/(issues|pulls)/(\d+))?/?$')
+_KIND = {None: 'repository', 'issues': 'issue', 'pulls': 'pullRequest'}
+
+
+class UrlNotSupportedError(Exception):
+    """Raised when the url cannot be requested with graphql
+
+    Attributes:
+        url (string): input url that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, url, message="url must be a repository, issue or pull request of the rest api (/repos/owner/name, /repos/owner/name/issues/1 or /repos/owner/name/pulls/1)"):
+        self.url = url
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'url={self.url} -> {self.message}'
+
+
+def github_crawler_graphql(savename, url, GHtoken, retry=3, pc=1, log_file='github_crawler_log.txt', output_dir='', pretty_json=True, batch_size=50, fields=None, endpoint=None, pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, output_format='json', checkpoint=False, shard_size=256*1024**2, metrics=None, hooks=None, json_codec='auto', projection=None):
+    """ crawl the repository, issue or pull request of the rest api url with batched graphql query and save file to json
+    this function will also generate the log file that show the url of api that cannot be crawled
+
+    Up to ``batch_size`` url are looked up in a single graphql query (one alias per url) instead of one rest request per url.
+    When github reject the query because it is too large (node or resource limit) or the query take too long (502, 504 or timeout)
+    the batch is split in half and requested again without retrying the large query.
+    The result of each url is saved to its own file in the same output format as :func:`github_crawler.github_crawler_multipage`
+    (the file contain the graphql object of the url, so the field name follow the graphql schema).
+
+    Args:
+        savename (list): contain string of the save file name (need to be same length as url)
+        url (list): contain string of rest api url of repository (``https://api.github.com/repos/owner/name``),
+            issue (``.../repos/owner/name/issues/1``) or pull request (``.../repos/owner/name/pulls/1``) (need to be same length as savename)
+        GHtoken (list): list of github token, each request use the token with the most remaining rate limit
+        retry (int, optional): number of time to retry a request that fail with transient error (connection error, 5xx, 429 or secondary rate limit). Defaults to 3.
+        pc (int, optional): number of process for multiprocessing, each process send one query at a time. Defaults to 1.
+        log_file (str, optional): name of the log file showing the detail of fail case. Defaults to 'github_crawler_log.txt'.
+        output_dir (str, optional): output directory. Defaults to ''.
+        pretty_json (boolean, optional): make to output json file easier to read. Defaults to True.
+        batch_size (int, optional): maximum number of url in one query. Defaults to 50.
+        fields (dict, optional): {'repository' | 'issue' | 'pullRequest': graphql selection of the field to request}. Defaults to None (DEFAULT_FIELDS).
+        endpoint (str, optional): url of the graphql api. Defaults to None (``/graphql`` of the host of the first url, ``/api/graphql`` for github enterprise).
+        pool_size (int, optional): maximum number of keep-alive connection per host in the session of each token. Defaults to 1.
+        keep_alive (boolean, optional): reuse the connection of the session across request. Defaults to True.
+        connection_stats (ConnectionStats, optional): counter that will be updated with the number of connection opened and reused. Defaults to None.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry. Defaults to None (exponential backoff with jitter and ``retry`` maximum retry).
+        output_format (str, optional): same as github_crawler_multipage. Defaults to 'json'.
+        checkpoint (boolean, optional): record the completed url in a checkpoint log in output_dir and skip them when the crawler is run again. Defaults to False.
+        shard_size (int, optional): size in byte of each shard before rolling over to a new shard (only used when output_format is 'jsonl_shard'). Defaults to 256 MB.
+        metrics (CrawlMetrics, optional): metrics that will be updated with the request latency, byte downloaded, waiting time, retry and token quota. Defaults to None.
+        hooks (list, optional): list of CrawlHooks that is called before and after every query (must be picklable). Defaults to None.
+        json_codec (str, optional): 'orjson', 'json' or 'auto' to decode the response and encode the compact item with orjson if it is installed otherwise json. Defaults to 'auto'.
+        projection (list, optional): list of field path of the graphql object that is saved, the field that is not needed is better removed from ``fields``
+            so github does not send it. Defaults to None (every field).
+
+    Raises:
+        LengthNotMatchError: Raised when the length of savename and url is not the same
+        InputNotStringError: Raised when not all of member in savename or url are string
+        NoTokenError: Raised when input list of github token is empty
+        OutputFormatNotSupportedError: Raised when output_format is not supported
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        FieldPathError: Raised when a field path of projection cannot be parsed
+
+    """
+    _check_input(savename, url, GHtoken, output_format)
+    codec = get_codec(json_codec)
+    projection = compile_projection(projection)
+    # if savename and url length is 0 do nothing
+    if len(savename) == 0 and len(url) == 0:
+        return
+    checkpoint_manifest = CheckpointManifest(output_dir) if checkpoint else None
+    output_store = open_store(output_dir, output_format, shard_size)
+    list_to_crawl = _prepare_crawl_list(savename, url, output_dir, output_format, pretty_json, checkpoint_manifest, output_store)
+    token_scheduler = TokenScheduler(GHtoken)
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retry=retry)
+    hooks = _prepare_hooks(hooks, metrics, token_scheduler)
+    endpoint = endpoint or _graphql_endpoint(url[0])
+    fields = {**DEFAULT_FIELDS, **(fields or {})}
+    result = []
+    lookups = []
+    for input_tuple in list_to_crawl:
+        # if the file is exist proceed to next one (the file that is written but not moved to the output store is moved now)
+        if os.path.exists(input_tuple[0]):
+            if output_store is not None:
+                output_store.append(input_tuple[0])
+            result.append((input_tuple[1], 1))
+            continue
+        try:
+            lookups.append((input_tuple, _parse_url(input_tuple[1])))
+        except UrlNotSupportedError as e:
+            result.append((input_tuple[1], str(e)))
+    batches = [(endpoint, fields, lookups[i:i+batch_size]) for i in range(0, len(lookups), batch_size)]
+    with mp.Pool(pc, initializer=_init_worker, initargs=(token_scheduler, retry_policy, pool_size or 1, keep_alive, connection_stats,
+                                                         1, checkpoint_manifest, None, output_store, metrics, hooks, None, None, codec, projection)) as p:
+        for batch_result in tqdm(p.imap(_collect_graphql_batch, batches, chunksize=1), total=len(batches)):
+            result.extend(batch_result)
+    _write_fail_log(log_file, result, pretty_json)
+
+
+def _graphql_endpoint(url):
+    """ return the graphql endpoint of the host of the rest api url"""
+    parsed = urlparse(url)
+    path = '/api/graphql' if parsed.path.startswith('/api/v3/') else '/graphql'
+    return f'{parsed.scheme}://{parsed.netloc}{path}'
+
+
+def _parse_url(url):
+    """ return (kind, owner, name, number) of the rest api url
+
+    Raises:
+        UrlNotSupportedError: Raised when the url is not a repository, issue or pull request
+    """
+    match = _URL_PATTERN.search(urlparse(url).path)
+    if match is None:
+        raise UrlNotSupportedError(url)
+    owner, name, kind, number = match.groups()
+    return _KIND[kind], owner, name, int(number) if number else None
+
+
+def _build_query(lookups, fields):
+    """ return the graphql query that look up every url with alias u0, u1, ..."""
+    selections = []
+    for i, (_, (kind, owner, name, number)) in enumerate(lookups):
+        repository = f'repository(owner: {json.dumps(owner)}, name: {json.dumps(name)})'
+        if kind == 'repository':
+            selections.append(f'u{i}: {repository} {{ {fields[kind]} }}')
+        else:
+            selections.append(f'u{i}: {repository} {{ {kind}(number: {number}) {{ {fields[kind]} }} }}')
+    return 'query {\n' + '\n'.join(selections) + '\n}'
+
+
+def _collect_graphql_batch(batch):
+    """ look up every url of the batch in one graphql query and save the object of each url
+
+    Args:
+        batch (tuple): (endpoint, fields, lookups) lookups is the list of (input_tuple, (kind, owner, name, number))
+
+    Returns:
+        list: (url, result) of each url in the batch
+    """
+    endpoint, fields, lookups = batch
+    query = _build_query(lookups, fields)
+    # the batch that take too long is split at once instead of being retried
+    retry_policy = _BatchRetryPolicy(github_crawler._retry_policy) if len(lookups) > 1 else None
+    try:
+        r = _request(endpoint, lambda session: session.post(endpoint, json={'query': query}), retry_policy)
+        r.raise_for_status()
+        body = github_crawler._get_codec().loads(r.content)
+    except requests.HTTPError as e:
+        if len(lookups) > 1 and _is_slow_query(e.response, None):
+            return _split_batch(batch)
+        return [(input_tuple[1], str(e)) for input_tuple, _ in lookups]
+    except requests.Timeout as e:
+        if len(lookups) > 1:
+            return _split_batch(batch)
+        return [(input_tuple[1], str(e)) for input_tuple, _ in lookups]
+    except Exception as e:
+        return [(input_tuple[1], str(e)) for input_tuple, _ in lookups]
+    errors = body.get('errors') or []
+    if body.get('data') is None:
+        if len(lookups) > 1 and any(error.get('type') in SPLIT_ERRORS for error in errors):
+            return _split_batch(batch)
+        message = '; '.join(error.get('message', '') for error in errors) or 'graphql response has no data'
+        return [(input_tuple[1], message) for input_tuple, _ in lookups]
+    # the error of each alias (e.g. NOT_FOUND)
+    alias_error = {}
+    for error in errors:
+        if error.get('path'):
+            alias_error.setdefault(error['path'][0], error.get('message', ''))
+    result = []
+    for i, (input_tuple, (kind, _, _, _)) in enumerate(lookups):
+        node = body['data'].get(f'u{i}')
+        if node is not None and kind != 'repository':
+            node = node.get(kind)
+        if node is None:
+            result.append((input_tuple[1], alias_error.get(f'u{i}', 'not found')))
+        else:
+            result.append(_save_node(input_tuple, node))
+    return result
+
+
+def _is_slow_query(response, error):
+    """ return True if the query fail because it take too long (github return 502 or 504 or the request time out)"""
+    if error is not None:
+        return isinstance(error, requests.Timeout)
+    return response is not None and response.status_code in (502, 504)
+
+
+class _BatchRetryPolicy:
+    """Retry policy of the query with more than one url, the query that take too long is not retried since the batch is split instead
+
+    Args:
+        retry_policy (RetryPolicy): retry policy of the other error
+    """
+
+    def __init__(self, retry_policy):
+        self.retry_policy = retry_policy
+        self.max_retry = retry_policy.max_retry
+
+    def should_retry(self, response=None, error=None):
+        if _is_slow_query(response, error):
+            return False
+        return self.retry_policy.should_retry(response, error)
+
+    def delay(self, attempt, response=None):
+        return self.retry_policy.delay(attempt, response)
+
+
+def _split_batch(batch):
+    endpoint, fields, lookups = batch
+    half = len(lookups) // 2
+    return _collect_graphql_batch((endpoint, fields, lookups[:half])) + _collect_graphql_batch((endpoint, fields, lookups[half:]))
+
+
+def _save_node(input_tuple, node):
+    """ save the graphql object of the url as a file with one item
+
+    Returns:
+        tuple: (url, result) result will be 1 if sucess otherwise it will be the exception message of the error that occur
+    """
+    save_path, url, output_format, pretty_json, _ = input_tuple
+    try:
+        writer = open_writer(save_path, output_format, pretty_json, None, github_crawler._get_codec(), github_crawler._projection)
+        try:
+            writer.write_page(node)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        if github_crawler._output_store is not None:
+            github_crawler._output_store.append(save_path)
+        if github_crawler._checkpoint is not None:
+            github_crawler._checkpoint.commit_done(save_path)
+    except Exception as e:
+        if github_crawler._metrics is not None:
+            github_crawler._metrics.add_url(1, False)
+        return (url, str(e))
+    if github_crawler._metrics is not None:
+        github_crawler._metrics.add_url(1, True)
+    return (url, 1)
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import threading
+from pathlib import Path
+
+
+class HttpCache:
+    """On-disk cache of the page of the api for conditional request (ETag / Last-Modified)
+
+    The body, ``ETag``, ``Last-Modified`` and ``Link`` header of every page that has ``ETag`` or ``Last-Modified``
+    are stored in cache_dir. The next request of the same page send ``If-None-Match`` / ``If-Modified-Since``
+    and if github return 304 (which does not count against the rate limit) the cached body is used.
+    The size of the cache is tracked while the page are written and the least recently used entry are removed
+    as soon as the cache is larger than max_size.
+    The hit and miss counter and the size are stored in shared memory so the same cache can be passed to every worker process.
+
+    Args:
+        cache_dir (string): directory of the cache
+        max_size (int, optional): maximum size of the cache in byte. Defaults to 1 GB.
+
+    Attributes:
+        hits (int): number of request that is answered with 304 and use the cached body
+        misses (int): number of request that download the body
+    """
+
+    CACHED_HEADERS = ('ETag', 'Last-Modified', 'Link', 'Content-Type')
+
+    def __init__(self, cache_dir, max_size=1024**3):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._hits = mp.Value('L', 0)
+        self._misses = mp.Value('L', 0)
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        self._size = mp.Value('Q', sum(size for _, size, _ in self._entries()))
+
+    @property
+    def hits(self):
+        return self._hits.value
+
+    @property
+    def misses(self):
+        return self._misses.value
+
+    def stats(self):
+        """ return the hit and miss counter as dict with key hits, misses and hit_rate"""
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
+
+    def _path(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _read(self, url):
+        """ return (header, body) of the cached page or None if the page is not cached"""
+        try:
+            with open(self._path(url), 'rb') as infile:
+                header = json.loads(infile.readline())
+                body = infile.read()
+        except (OSError, ValueError):
+            return None
+        if header.get('url') != url:
+            return None
+        return header, body
+
+    def conditional_headers(self, url):
+        """ return the request header that make the request of the page conditional
+
+        Args:
+            url (string): url of the page
+
+        Returns:
+            dict: ``If-None-Match`` and/or ``If-Modified-Since`` header (empty dict if the page is not cached)
+        """
+        cached = self._read(url)
+        if cached is None:
+            return {}
+        header = cached[0]['headers']
+        conditional = {}
+        if 'ETag' in header:
+            conditional['If-None-Match'] = header['ETag']
+        if 'Last-Modified' in header:
+            conditional['If-Modified-Since'] = header['Last-Modified']
+        return conditional
+
+    def process(self, url, r):
+        """ replace the body of the 304 response with the cached body or store the body of the 200 response
+
+        Args:
+            url (string): url of the page
+            r (requests.Response): response of the conditional request
+
+        Returns:
+            requests.Response: response with the body of the page or None if the response is 304 but the page is not in the cache anymore
+            (removed by prune of another process after the conditional request is sent), the page should be requested again without the conditional header
+        """
+        if r.status_code == 304:
+            cached = self._read(url)
+            if cached is None:
+                return None
+            header, body = cached
+            r.status_code = 200
+            r._content = body
+            r.headers.update(header['headers'])
+            try:
+                os.utime(self._path(url))
+            except FileNotFoundError:
+                pass
+            with self._hits.get_lock():
+                self._hits.value += 1
+            return r
+        if r.status_code == 200:
+            with self._misses.get_lock():
+                self._misses.value += 1
+            if 'ETag' in r.headers or 'Last-Modified' in r.headers:
+                self._write(url, r)
+        return r
+
+    def _write(self, url, r):
+        path = self._path(url)
+        Path(os.path.dirname(path)).mkdir(exist_ok=True)
+        header = {'url': url, 'headers': {h: r.headers[h] for h in self.CACHED_HEADERS if h in r.headers}}
+        # the thread id keep the temporary file of the thread of the same process apart
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as outfile:
+            outfile.write(json.dumps(header).encode() + b'\n')
+            outfile.write(r.content)
+        size = os.path.getsize(tmp_path)
+        with self._size.get_lock():
+            try:
+                size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self._size.value = max(self._size.value + size, 0)
+            if self._size.value > self.max_size:
+                self.prune()
+
+    def _entries(self):
+        """ return (mtime, size, path) of every cached page, the temporary file of the page being written are skipped"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def prune(self):
+        """ remove the least recently used entry until the size of the cache is not larger than max_size
+
+        Returns:
+            int: number of removed entry
+        """
+        with self._size.get_lock():
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._size.value = total
+        return removed
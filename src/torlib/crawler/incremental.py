@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+from .output_store import iter_output_file
+from .writer import open_writer
+
+
+class HighWaterMark:
+    """Append-only log in output_dir that record the newest timestamp of the item of every url for the incremental crawl
+
+    Every line of the log is ``{"path": path, "mark": timestamp}`` (path is save_path relative to output_dir),
+    the timestamp is the newest ``updated_at`` (or commit date or ``created_at``) of the item that is saved.
+    The log is loaded (and compacted) once at the start of the crawl, the worker process load it again when it is first used.
+
+    Args:
+        output_dir (string): output directory of the crawler
+        file_name (string, optional): name of the log file. Defaults to '.github_crawler_hwm'.
+    """
+
+    def __init__(self, output_dir, file_name='.github_crawler_hwm'):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, file_name)
+        self.state = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'output_dir': self.output_dir, 'path': self.path}
+
+    def __setstate__(self, state):
+        self.output_dir = state['output_dir']
+        self.path = state['path']
+        self.state = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """ read the mark of every url from the log and rewrite the log with only the latest mark
+
+        Returns:
+            dict: {path: mark}
+        """
+        self._read()
+        if os.path.exists(self.path):
+            with open(self.path + '.tmp', 'w') as outfile:
+                for path, mark in self.state.items():
+                    outfile.write(json.dumps({'path': path, 'mark': mark}) + '\n')
+            os.replace(self.path + '.tmp', self.path)
+        return self.state
+
+    def _read(self):
+        self.state = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as infile:
+            for line in infile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last line can be incomplete if the crawler is killed while writing
+                    continue
+                self.state[record['path']] = record['mark']
+
+    def _key(self, save_path):
+        return os.path.relpath(save_path, self.output_dir or '.')
+
+    def get(self, save_path):
+        """ return the mark of save_path or None if the url has not been crawled"""
+        with self._lock:
+            if self.state is None:
+                self._read()
+            return self.state.get(self._key(save_path))
+
+    def set(self, save_path, mark):
+        """ record the newest timestamp of the item of save_path"""
+        with self._lock:
+            if self.state is not None:
+                self.state[self._key(save_path)] = mark
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            self._file.write(json.dumps({'path': self._key(save_path), 'mark': mark}) + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def item_timestamp(item):
+    """ return the timestamp used as high water mark of the item (updated_at, commit date or created_at) or None"""
+    if type(item) != dict:
+        return None
+    commit = item.get('commit')
+    if type(commit) == dict and type(commit.get('committer')) == dict and commit['committer'].get('date'):
+        return commit['committer']['date']
+    return item.get('updated_at') or item.get('created_at')
+
+
+def item_key(item):
+    """ return the identity of the item (sha, id or node_id) used to replace the old version of the updated item or None"""
+    if type(item) != dict:
+        return None
+    for key in ('sha', 'id', 'node_id'):
+        if item.get(key) is not None:
+            return f'{key}:{item[key]}'
+    return None
+
+
+def newest_timestamp(json_r, mark=None):
+    """ return the newest timestamp of the item of the page and mark"""
+    for item in (json_r if type(json_r) == list else [json_r]):
+        timestamp = item_timestamp(item)
+        if timestamp is not None and (mark is None or timestamp > mark):
+            mark = timestamp
+    return mark
+
+
+def newest_in_file(save_path, output_format):
+    """ return the newest timestamp of the item in the output file or None"""
+    mark = None
+    for item in iter_output_file(save_path, output_format):
+        mark = newest_timestamp(item, mark)
+    return mark
+
+
+def incremental_params(mark):
+    """ return the query parameter that ask for the item updated since mark, newest first
+
+    The list endpoint ignore the parameter it does not support (e.g. commits only support since,
+    pulls only support sort and direction), the item older than mark is filtered by DeltaCollector.
+    """
+    return {'since': mark, 'sort': 'updated', 'direction': 'desc'}
+
+
+class DeltaCollector:
+    """Collect the item of the page that is newer than the high water mark, the page are given newest first
+
+    Args:
+        mark (string): timestamp of the newest item of the previous crawl
+        projection (FieldProjection, optional): projection applied to the item after its timestamp is read, so only the kept field is held until the merge. Defaults to None.
+
+    Attributes:
+        items (list): item that is new or updated since mark
+        newest (string): newest timestamp of the collected item (the next mark)
+        done (boolean): True when an item older than mark is seen, so the next page does not need to be requested
+    """
+
+    def __init__(self, mark, projection=None):
+        self.mark = mark
+        self.projection = projection
+        self.items = []
+        self.newest = mark
+        self.done = False
+
+    def add_page(self, json_r):
+        for item in (json_r if type(json_r) == list else [json_r]):
+            timestamp = item_timestamp(item)
+            if timestamp is not None and timestamp < self.mark:
+                self.done = True
+                continue
+            self.items.append(item if self.projection is None else self.projection(item))
+            if timestamp is not None and timestamp > self.newest:
+                self.newest = timestamp
+
+
+def merge_output(save_path, output_format, pretty_json, delta, codec=None):
+    """ write the delta followed by the item of the existing output file that is not replaced by the delta
+
+    The existing file is read as a stream and the merged file is written to ``save_path + '.part'``
+    and renamed, so the existing file is kept if the merge fail.
+
+    Args:
+        save_path (string): existing output file of the url
+        output_format (string): output_format of the file (one file per url)
+        pretty_json (boolean): make to output json file easier to read
+        delta (list): new and updated item, newest first (already projected)
+        codec (JsonCodec, optional): codec used to encode the compact item. Defaults to None (json module).
+
+    Returns:
+        int: number of item in the merged file
+    """
+    replaced = {item_key(item) for item in delta} - {None}
+    writer = open_writer(save_path, output_format, pretty_json, codec=codec)
+    try:
+        for item in delta:
+            writer.write_item(item)
+        for item in iter_output_file(save_path, output_format):
+            if item_key(item) not in replaced:
+                writer.write_item(item)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.count
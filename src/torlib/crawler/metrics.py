@@ -0,0 +1,222 @@
+import json
+import multiprocessing as mp
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class CrawlHooks:
+    """Base class of the hook that is called before and after every request of the crawler
+
+    Subclass it and override the method that is needed. In 'process' mode the hook is copied to every worker process
+    so it must be picklable and the state that should be read from the parent process must be in shared memory.
+
+    Example:
+        >>> class PrintHook(CrawlHooks):
+        ...     def after_request(self, page_url, response, error, elapsed):
+        ...         print(page_url, elapsed)
+    """
+
+    def before_request(self, page_url, GHtoken):
+        """ called before the request is sent
+
+        Args:
+            page_url (string): url of the page
+            GHtoken (string): token used to send the request
+        """
+
+    def after_request(self, page_url, response, error, elapsed):
+        """ called after the response arrive or the request fail
+
+        Args:
+            page_url (string): url of the page
+            response (requests.Response): response of the request (None if the request fail with exception)
+            error (Exception): exception raised by the request (None if the response arrive)
+            elapsed (float): seconds from sending the request until the response arrive
+        """
+
+
+class _Histogram:
+    """Cumulative histogram in shared memory, the caller hold the lock of the metrics"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._counts = mp.Array('L', len(buckets) + 1, lock=False)
+        self._sum = mp.Value('d', 0.0, lock=False)
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self._counts[i] += 1
+        self._sum.value += value
+
+    def snapshot(self):
+        """ return {'buckets': {upper bound: cumulative count}, 'sum': sum, 'count': count}"""
+        buckets = {}
+        count = 0
+        for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], self._counts):
+            count += bucket_count
+            buckets[str(bound)] = count
+        return {'buckets': buckets, 'sum': self._sum.value, 'count': count}
+
+
+def _quantile(histogram, q):
+    """ return the upper bound of the bucket that contain the q quantile of the histogram snapshot"""
+    target = q * histogram['count']
+    for bound, count in histogram['buckets'].items():
+        if count >= target and count > 0:
+            return float(bound)
+    return 0.0
+
+
+class CrawlMetrics(CrawlHooks):
+    """Counter and histogram of the crawl (request latency, byte downloaded, page per url, time waiting for rate limit, retry and token quota)
+
+    The value is stored in shared memory so the same object can be passed to every worker process of the crawler
+    and read from the parent process while the crawler is running or after it finish.
+
+    Attributes:
+        requests (int): number of request sent
+        errors (int): number of request that fail with exception or return status >= 400
+        retries (int): number of request that is retried
+        bytes (int): number of byte of the response body downloaded
+        urls (int): number of url that is crawled
+        failed_urls (int): number of url that cannot be crawled
+        rate_limit_wait_seconds (float): seconds spent waiting for the rate limit of the token (including the secondary rate limit)
+        retry_wait_seconds (float): seconds spent waiting in backoff before retrying a request
+        deduplicated_urls (int): number of input url that is the same as another input url and is not requested
+        saved_requests (int): number of request that is not sent because of the deduplicated url
+    """
+
+    COUNTERS = ('requests', 'errors', 'retries', 'bytes', 'urls', 'failed_urls', 'rate_limit_wait_seconds', 'retry_wait_seconds', 'deduplicated_urls', 'saved_requests')
+
+    def __init__(self):
+        self._counters = mp.Array('d', len(self.COUNTERS), lock=False)
+        self._index = {name: i for i, name in enumerate(self.COUNTERS)}
+        self._latency = _Histogram(LATENCY_BUCKETS)
+        self._pages = _Histogram(PAGE_BUCKETS)
+        self._lock = mp.Lock()
+        self._start = time.time()
+        self.token_scheduler = None
+        self.concurrency_controller = None
+
+    def __getattr__(self, name):
+        if name in self.COUNTERS:
+            value = self._counters[self._index[name]]
+            return value if name.endswith('seconds') else int(value)
+        raise AttributeError(name)
+
+    def _add(self, name, value=1):
+        self._counters[self._index[name]] += value
+
+    def after_request(self, page_url, response, error, elapsed):
+        with self._lock:
+            self._add('requests')
+            self._latency.observe(elapsed)
+            if response is None or response.status_code >= 400:
+                self._add('errors')
+            if response is not None:
+                self._add('bytes', len(response.content))
+
+    def add_rate_limit_wait(self, seconds):
+        """ record the time spent waiting for a token that has remaining rate limit
+
+        Args:
+            seconds (float): waiting time
+        """
+        with self._lock:
+            self._add('rate_limit_wait_seconds', seconds)
+
+    def add_retry(self, delay, rate_limited=False):
+        """ record a retry and the time spent waiting before it
+
+        Args:
+            delay (float): waiting time before the retry
+            rate_limited (boolean, optional): the request is rejected by the secondary rate limit. Defaults to False.
+        """
+        with self._lock:
+            self._add('retries')
+            self._add('rate_limit_wait_seconds' if rate_limited else 'retry_wait_seconds', delay)
+
+    def add_url(self, pages, success):
+        """ record the number of page of the crawled url
+
+        Args:
+            pages (int): number of page fetched
+            success (boolean): the url is completely crawled or not
+        """
+        with self._lock:
+            self._add('urls')
+            if not success:
+                self._add('failed_urls')
+            self._pages.observe(pages)
+
+    def add_deduplicated(self, urls, requests):
+        """ record the duplicate url that get the output of the same url instead of being requested
+
+        Args:
+            urls (int): number of duplicate url
+            requests (int): number of request saved
+        """
+        with self._lock:
+            self._add('deduplicated_urls', urls)
+            self._add('saved_requests', requests)
+
+    def snapshot(self):
+        """ return every metric as dict
+
+        Returns:
+            dict: the counter, ``request_latency`` and ``pages_per_url`` histogram ({'buckets', 'sum', 'count', 'p50', 'p99'}),
+            ``token_quota`` ({token index: {'remaining', 'reset'}}), ``concurrency`` ({'limit', 'in_flight', 'latency'} of the concurrency controller or None)
+            and ``elapsed_seconds`` since the metrics is created
+        """
+        with self._lock:
+            snapshot = {name: getattr(self, name) for name in self.COUNTERS}
+            snapshot['request_latency'] = self._latency.snapshot()
+            snapshot['pages_per_url'] = self._pages.snapshot()
+        snapshot['pages'] = int(snapshot['pages_per_url']['sum'])
+        for histogram in (snapshot['request_latency'], snapshot['pages_per_url']):
+            histogram['p50'] = _quantile(histogram, 0.5)
+            histogram['p99'] = _quantile(histogram, 0.99)
+        # the token is not exported, only its position in GHtoken
+        quota = self.token_scheduler.quota() if self.token_scheduler is not None else {}
+        snapshot['token_quota'] = {str(i): {'remaining': remaining, 'reset': reset} for i, (remaining, reset) in enumerate(quota.values())}
+        snapshot['concurrency'] = self.concurrency_controller.stats() if self.concurrency_controller is not None else None
+        snapshot['elapsed_seconds'] = time.time() - self._start
+        return snapshot
+
+    def to_json(self):
+        """ return the snapshot as json string"""
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self, prefix='github_crawler'):
+        """ return the snapshot in prometheus text exposition format
+
+        Args:
+            prefix (string, optional): prefix of the metric name. Defaults to 'github_crawler'.
+
+        Returns:
+            string: prometheus text
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name in self.COUNTERS:
+            metric = f'{prefix}_{name}_total' if not name.endswith('seconds') else f'{prefix}_{name}'
+            lines += [f'# TYPE {metric} counter', f'{metric} {snapshot[name]}']
+        for name, unit in (('request_latency', '_seconds'), ('pages_per_url', '')):
+            metric = f'{prefix}_{name}{unit}'
+            lines.append(f'# TYPE {metric} histogram')
+            for bound, count in snapshot[name]['buckets'].items():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines += [f'{metric}_sum {snapshot[name]["sum"]}', f'{metric}_count {snapshot[name]["count"]}']
+        lines.append(f'# TYPE {prefix}_token_remaining gauge')
+        for token, quota in snapshot['token_quota'].items():
+            lines.append(f'{prefix}_token_remaining{{token="{token}"}} {quota["remaining"]}')
+        if snapshot['concurrency'] is not None:
+            lines += [f'# TYPE {prefix}_concurrency_limit gauge', f'{prefix}_concurrency_limit {snapshot["concurrency"]["limit"]}',
+                      f'# TYPE {prefix}_in_flight_requests gauge', f'{prefix}_in_flight_requests {snapshot["concurrency"]["in_flight"]}']
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,216 @@
+import gzip
+import json
+import os
+import shutil
+from .writer import OUTPUT_FORMAT, open_text
+
+
+class ShardStore:
+    """Store the output of every url as one block of a shard file with an index, instead of one file per savename
+
+    When the output of a url is completely written, its file is appended to the current shard and
+    ``{"savename": savename, "shard": shard, "offset": offset, "length": length}`` is appended to the index,
+    so the output of one savename can be read without scanning the shard.
+    The shard and the index are shared by every worker process (append is done while holding a lock).
+
+    Args:
+        output_dir (string): output directory of the crawler
+        kind (string, optional): 'shard' to roll over to a new JSON Lines shard when the shard is larger than shard_size
+            or 'archive' to store gzip json array of every url in a single archive file. Defaults to 'shard'.
+        shard_size (int, optional): maximum size of a shard in byte (only used when kind is 'shard'). Defaults to 256 MB.
+        name (string, optional): file name prefix of the shard and the index. Defaults to 'github_crawler'.
+    """
+
+    def __init__(self, output_dir, kind='shard', shard_size=256*1024**2, name='github_crawler'):
+        self.output_dir = output_dir
+        self.kind = kind
+        self.shard_size = shard_size if kind == 'shard' else None
+        self.name = name
+        self.index_path = os.path.join(output_dir, f'{name}.idx')
+        self.index = {}
+        import multiprocessing as mp
+        self._shard = mp.Value('L', 0)
+        self._lock = mp.Lock()
+
+    def __getstate__(self):
+        # the index is only used by the parent process and the reader
+        state = self.__dict__.copy()
+        state['index'] = {}
+        return state
+
+    def shard_path(self, shard):
+        """ return the path of the shard file"""
+        if self.kind == 'archive':
+            return os.path.join(self.output_dir, f'{self.name}.archive')
+        return os.path.join(self.output_dir, f'{self.name}-{shard:05d}.jsonl')
+
+    def key(self, save_path):
+        """ return the savename of the save path"""
+        extension = OUTPUT_FORMAT['jsonl_shard' if self.kind == 'shard' else 'archive'][0]
+        return os.path.relpath(save_path, self.output_dir or '.')[:-len(extension)]
+
+    def load(self):
+        """ read the index and continue appending to the last shard
+
+        Returns:
+            dict: {savename: (shard, offset, length)} the latest block of each savename
+        """
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as infile:
+                for line in infile:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line can be incomplete if the crawler is killed while writing
+                        continue
+                    self.index[record['savename']] = (record['shard'], record['offset'], record['length'])
+        self._shard.value = max([shard for shard, _, _ in self.index.values()], default=0)
+        return self.index
+
+    def is_done(self, save_path):
+        """ return True if the output of save_path is in the store"""
+        return self.key(save_path) in self.index
+
+    def append(self, save_path):
+        """ move the completely written file of save_path to the end of the current shard and record it in the index
+
+        Args:
+            save_path (string): file of the url written by the writer
+        """
+        length = os.path.getsize(save_path)
+        with self._lock:
+            path = self.shard_path(self._shard.value)
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            if self.shard_size is not None and offset > 0 and offset + length > self.shard_size:
+                self._shard.value += 1
+                path = self.shard_path(self._shard.value)
+                offset = 0
+            with open(path, 'ab') as outfile, open(save_path, 'rb') as infile:
+                shutil.copyfileobj(infile, outfile)
+            with open(self.index_path, 'a') as outfile:
+                outfile.write(json.dumps({'savename': self.key(save_path), 'shard': self._shard.value, 'offset': offset, 'length': length}) + '\n')
+        os.remove(save_path)
+
+    def add_alias(self, links):
+        """ record the block of the source save path in the index as the block of the alias save path too
+
+        Args:
+            links (list): (source save_path, alias save_path) the source is already appended to the store
+        """
+        if not links:
+            return
+        with self._lock:
+            self.load()
+            with open(self.index_path, 'a') as outfile:
+                for source, alias in links:
+                    shard, offset, length = self.index[self.key(source)]
+                    self.index[self.key(alias)] = (shard, offset, length)
+                    outfile.write(json.dumps({'savename': self.key(alias), 'shard': shard, 'offset': offset, 'length': length}) + '\n')
+
+    def read(self, savename):
+        """ return the item of the savename
+
+        Args:
+            savename (string): savename of the url
+
+        Raises:
+            KeyError: Raised when the savename is not in the store
+
+        Returns:
+            list: item of the url
+        """
+        if not self.index:
+            self.load()
+        shard, offset, length = self.index[savename]
+        with open(self.shard_path(shard), 'rb') as infile:
+            infile.seek(offset)
+            block = infile.read(length)
+        if self.kind == 'archive':
+            return json.loads(gzip.decompress(block))
+        return [json.loads(line) for line in block.decode().splitlines()]
+
+
+def open_store(output_dir, output_format, shard_size=256*1024**2):
+    """ return the ShardStore of the output format or None if the output format save one file per savename"""
+    kind = OUTPUT_FORMAT[output_format][3]
+    if kind is None:
+        return None
+    return ShardStore(output_dir, kind, shard_size)
+
+
+def read_output(output_dir, savename, output_format='json'):
+    """ read the output of one savename written by github_crawler_multipage
+
+    Args:
+        output_dir (string): output directory of the crawler
+        savename (string): savename of the url
+        output_format (string, optional): output_format used to crawl. Defaults to 'json'.
+
+    Raises:
+        KeyError: Raised when the savename is not in the shard store
+        FileNotFoundError: Raised when the output file of the savename does not exist
+
+    Returns:
+        list: item of the url
+    """
+    extension, _, _, kind = OUTPUT_FORMAT[output_format]
+    if kind is not None:
+        return ShardStore(output_dir, kind).read(savename)
+    return list(iter_output_file(os.path.join(output_dir, f'{savename}{extension}'), output_format))
+
+
+def iter_output_file(save_path, output_format='json'):
+    """ yield the item of the output file of one url without loading the whole file
+
+    Args:
+        save_path (string): output file of the url (only for the output format that save one file per url)
+        output_format (string, optional): output_format used to crawl. Defaults to 'json'.
+
+    Raises:
+        FileNotFoundError: Raised when the output file does not exist
+        ValueError: Raised when the output file is not valid json
+
+    Yields:
+        object: item of the url
+    """
+    extension, _, compression, _ = OUTPUT_FORMAT[output_format]
+    with open_text(save_path, 'r', compression) as infile:
+        if extension.startswith('.jsonl'):
+            for line in infile:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(infile)
+
+
+def _iter_json_array(infile, chunk_size=64*1024):
+    """ yield the item of the json array in the file, only the current item is kept in memory"""
+    decoder = json.JSONDecoder()
+    buffer = infile.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('output file is not a json array')
+    position = 1
+    eof = False
+    while True:
+        # skip the separator between item
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position = position+1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+            # the item can be cut at the end of the buffer (e.g. 1.5 is decoded as 1 if the buffer end with "1.")
+            complete = eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]')
+        except ValueError:
+            if eof:
+                raise
+            complete = False
+        if complete:
+            yield item
+            position = end
+            continue
+        chunk = infile.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
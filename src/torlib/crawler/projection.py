@@ -0,0 +1,120 @@
+import re
+
+# one segment of the field path, a key optionally followed by [*]
+_SEGMENT = re.compile(r'^([^.\[\]]+)(\[\*\])?$')
+
+
+class FieldPathError(Exception):
+    """Raised when the field path of the projection cannot be parsed
+
+    Attributes:
+        field (string): input field path that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, field, message="field must be a dot separated path of key such as 'user.login' or 'labels[*].name'"):
+        self.field = field
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'field={self.field} -> {self.message}'
+
+
+class FieldProjection:
+    """Keep only the field in the path of the item of every page, the rest of the item is dropped as soon as the page arrive
+
+    Each path is a dot separated list of key (``$.`` at the start is optional). A list in the middle of the path is
+    projected item by item, ``labels[*].name`` and ``labels.name`` are the same. The whole value of the last key is kept,
+    the missing key is not added to the item and the value that is not an object (e.g. ``null``) is kept as it is.
+    The paths are compiled into nested function once, so projecting an item only touch the field that is kept.
+
+    Args:
+        fields (list): list of field path e.g. ``['number', 'title', 'user.login', 'labels[*].name']``
+
+    Raises:
+        FieldPathError: Raised when a field path cannot be parsed
+
+    Example:
+        >>> FieldProjection(['id', 'user.login'])({'id': 1, 'title': 'a', 'user': {'login': 'octocat', 'id': 2}})
+        {'id': 1, 'user': {'login': 'octocat'}}
+    """
+
+    def __init__(self, fields):
+        if isinstance(fields, str):
+            fields = [fields]
+        self.fields = list(fields)
+        if not self.fields:
+            raise FieldPathError(self.fields, 'projection must have at least one field')
+        tree = {}
+        for field in self.fields:
+            node = tree
+            keys = _parse_field(field)
+            for key in keys[:-1]:
+                child = node.setdefault(key, {})
+                if child is True:
+                    # the parent field is already kept as a whole
+                    break
+                node = child
+            else:
+                node[keys[-1]] = True
+        self._project = _compile(tree)
+
+    def __getstate__(self):
+        # the compiled function cannot be pickled, it is compiled again in the worker process
+        return {'fields': self.fields}
+
+    def __setstate__(self, state):
+        self.__init__(state['fields'])
+
+    def __call__(self, json_r):
+        """ return the projection of the item (or of every item of the list)"""
+        return self._project(json_r)
+
+
+def _parse_field(field):
+    """ return the list of key of the field path"""
+    if not isinstance(field, str):
+        raise FieldPathError(field, 'field must be string')
+    path = field[2:] if field.startswith('$.') else field
+    keys = []
+    for segment in path.split('.'):
+        match = _SEGMENT.match(segment)
+        if match is None:
+            raise FieldPathError(field)
+        keys.append(match.group(1))
+    return keys
+
+
+def _compile(tree):
+    """ return the function that keep the key of the tree ({key: True or subtree}) of a dict or of every dict of a list"""
+    fields = [(key, None if subtree is True else _compile(subtree)) for key, subtree in tree.items()]
+
+    def project(value):
+        if type(value) == dict:
+            projected = {}
+            for key, sub in fields:
+                if key in value:
+                    projected[key] = value[key] if sub is None else sub(value[key])
+            return projected
+        if type(value) == list:
+            return [project(item) for item in value]
+        return value
+    return project
+
+
+def compile_projection(projection):
+    """ return the FieldProjection of the list of field path, or None when every field is kept
+
+    Args:
+        projection (list or FieldProjection): list of field path or compiled projection, None to keep every field
+
+    Raises:
+        FieldPathError: Raised when a field path cannot be parsed
+
+    Returns:
+        FieldProjection: compiled projection or None
+    """
+    if projection is None or isinstance(projection, FieldProjection):
+        return projection
+    return FieldProjection(projection)
@@ -0,0 +1,268 @@
+import os
+import time
+from urllib.parse import urlparse
+from .dedup import dedup_crawl_list
+from .schedule import PageCountHistory, estimate_pages
+from .writer import OUTPUT_FORMAT
+
+RATE_LIMIT_URL = 'https://api.github.com/rate_limit'
+
+
+class RateLimitNotAvailableError(Exception):
+    """Raised when the rate limit of the token cannot be read from the rate limit endpoint
+
+    Attributes:
+        token (string): masked github token that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, token, message='cannot read the rate limit of the token'):
+        self.token = token
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'token={self.token} -> {self.message}'
+
+
+def rate_limit_url_of(url):
+    """ return the rate limit endpoint of the host of the rest api url (``/api/v3/rate_limit`` for github enterprise)
+
+    Args:
+        url (string): url of the rest api
+
+    Returns:
+        string: url of the rate limit endpoint
+    """
+    parsed = urlparse(url)
+    path = '/api/v3/rate_limit' if parsed.path.startswith('/api/v3/') else '/rate_limit'
+    return f'{parsed.scheme}://{parsed.netloc}{path}'
+
+
+def _mask(token):
+    """ return the token with only its first 4 character so it can be printed"""
+    return token[:4] + '...'
+
+
+def fetch_quota(GHtoken, rate_limit_url=RATE_LIMIT_URL, session_pool=None):
+    """ read the current core rate limit of every token from the rate limit endpoint (the request does not use the rate limit)
+
+    Args:
+        GHtoken (list): list of github token
+        rate_limit_url (string, optional): url of the rate limit endpoint. Defaults to 'https://api.github.com/rate_limit'.
+        session_pool (SessionPool, optional): session of the token. Defaults to None (new session pool).
+
+    Raises:
+        RateLimitNotAvailableError: Raised when the request fail or the response does not contain the core rate limit
+
+    Returns:
+        tuple: ({token: (limit, remaining, reset)}, average latency of the request in second)
+    """
+    import requests
+    from .session import SessionPool
+    session_pool = session_pool or SessionPool(pool_size=1)
+    quota = {}
+    elapsed = 0
+    for token in dict.fromkeys(GHtoken):
+        start = time.perf_counter()
+        try:
+            r = session_pool.get(token).get(rate_limit_url)
+            r.raise_for_status()
+            core = r.json()['resources']['core']
+            quota[token] = (int(core['limit']), int(core['remaining']), float(core['reset']))
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            raise RateLimitNotAvailableError(_mask(token), f'cannot read the rate limit of the token: {e}')
+        elapsed += time.perf_counter() - start
+    return quota, elapsed / max(len(quota), 1)
+
+
+def _drain(remaining, amount):
+    """ take amount of request from the token with the most remaining first (like TokenScheduler) and return the remaining of every token"""
+    if amount >= sum(remaining):
+        return [0] * len(remaining)
+    # find the level that every token above it is lowered to
+    low, high = 0.0, float(max(remaining))
+    for _ in range(60):
+        level = (low + high) / 2
+        if sum(max(r - level, 0) for r in remaining) > amount:
+            low = level
+        else:
+            high = level
+    return [min(r, high) for r in remaining]
+
+
+def simulate_quota(requests, quota, rate, now=None, window=3600):
+    """ estimate when the crawl finish and when each token run out of rate limit
+
+    The request are sent at rate request per second from the token with the most remaining rate limit,
+    when every token is exhausted the crawl stall until the first token is reset and the token get its whole limit back every window second.
+
+    Args:
+        requests (int): number of request of the crawl
+        quota (dict): {token: (limit, remaining, reset)} (reset is unix time)
+        rate (float): number of request per second that the crawler can send
+        now (float, optional): start time of the crawl (unix time). Defaults to None (current time).
+        window (int, optional): length of the rate limit window in second. Defaults to 3600.
+
+    Returns:
+        tuple: (second to finish the crawl, second spent waiting for the reset, {token: unix time the token run dry or None})
+    """
+    now = time.time() if now is None else now
+    tokens = list(quota)
+    limit = [quota[token][0] for token in tokens]
+    remaining = [quota[token][1] for token in tokens]
+    # the token that is not used yet is reset one window after its first request
+    reset = [quota[token][2] if quota[token][2] > now else now + window for token in tokens]
+    dry = [now if r <= 0 else None for r in remaining]
+    t, left, stall = now, requests, 0.0
+    while left > 0:
+        if not tokens or max(limit) <= 0:
+            return float('inf'), float('inf'), dict(zip(tokens, dry))
+        next_reset = min(reset)
+        if next_reset <= t:
+            for i in range(len(tokens)):
+                if reset[i] <= t:
+                    remaining[i] = limit[i]
+                    reset[i] += window
+            continue
+        available = sum(remaining)
+        if available <= 0:
+            stall += next_reset - t
+            t = next_reset
+            continue
+        sent = min(available, left, rate * (next_reset - t))
+        remaining = _drain(remaining, sent)
+        t += sent / rate
+        left -= sent
+        for i in range(len(tokens)):
+            if remaining[i] <= 0 and dry[i] is None:
+                dry[i] = t
+    return t - now, stall, dict(zip(tokens, dry))
+
+
+class QuotaPlan:
+    """Estimated cost of a crawl and the rate limit of every token, returned by :func:`plan_crawl`
+
+    Attributes:
+        urls (int): number of url to request (after dedup)
+        done_urls (int): number of url whose output file already exist
+        known_urls (int): number of url whose page count is in the history of output_dir
+        probed_urls (int): number of url whose page count is read from the link header of its first page
+        unknown_urls (int): number of url whose page count cannot be estimated (counted as one page)
+        requests (int): estimated number of page request of the crawl
+        probe_requests (int): number of request used by the probe
+        quota (dict): {token: (limit, remaining, reset)}
+        rate (float): number of request per second the crawler can send at the concurrency
+        seconds (float): estimated wall-clock time of the crawl including the wait for the rate limit reset
+        stall_seconds (float): estimated time spent waiting for the rate limit reset
+        dry_at (dict): {token: unix time the token run out of rate limit during the crawl or None}
+    """
+
+    def __init__(self, urls, done_urls, known_urls, probed_urls, unknown_urls, requests, probe_requests, quota, rate, now=None):
+        self.urls = urls
+        self.done_urls = done_urls
+        self.known_urls = known_urls
+        self.probed_urls = probed_urls
+        self.unknown_urls = unknown_urls
+        self.requests = requests
+        self.probe_requests = probe_requests
+        self.quota = quota
+        self.rate = rate
+        self.now = time.time() if now is None else now
+        self.seconds, self.stall_seconds, self.dry_at = simulate_quota(requests, quota, rate, self.now)
+
+    @property
+    def remaining(self):
+        """ total remaining rate limit of every token"""
+        return sum(remaining for _, remaining, _ in self.quota.values())
+
+    @property
+    def fits_quota(self):
+        """ True if the crawl can finish with the current remaining rate limit without waiting for the reset"""
+        return self.requests <= self.remaining
+
+    def as_dict(self):
+        """ return the plan as dict (the token is masked)"""
+        return {'urls': self.urls, 'done_urls': self.done_urls, 'known_urls': self.known_urls, 'probed_urls': self.probed_urls,
+                'unknown_urls': self.unknown_urls, 'requests': self.requests, 'probe_requests': self.probe_requests,
+                'remaining': self.remaining, 'fits_quota': self.fits_quota, 'rate': self.rate, 'seconds': self.seconds,
+                'stall_seconds': self.stall_seconds,
+                'tokens': [{'token': _mask(token), 'limit': limit, 'remaining': remaining, 'reset': reset, 'dry_at': self.dry_at[token]}
+                           for token, (limit, remaining, reset) in self.quota.items()]}
+
+    def __str__(self):
+        lines = [f'{self.urls} url ({self.done_urls} done, {self.known_urls} from history, {self.probed_urls} probed, {self.unknown_urls} unknown)',
+                 f'{self.requests} request, {self.remaining} remaining rate limit of {len(self.quota)} token ({self.probe_requests} used by the probe)',
+                 f'about {self.seconds:.0f} second at {self.rate:.1f} request per second'
+                 + (f', {self.stall_seconds:.0f} second waiting for the rate limit reset (use pace=True to spread the request)' if self.stall_seconds else '')]
+        for token, (limit, remaining, reset) in self.quota.items():
+            dry_at = self.dry_at[token]
+            lines.append(f'{_mask(token)} {remaining}/{limit} reset at {time.strftime("%H:%M:%S", time.localtime(reset))}, '
+                         + (f'run dry at {time.strftime("%H:%M:%S", time.localtime(dry_at))}' if dry_at is not None else 'does not run dry'))
+        return '\n'.join(lines)
+
+
+def plan_crawl(savename, url, GHtoken, output_dir='', pc=1, concurrency=100, probe=True, latency=None, rate_limit_url=None,
+               output_format='json', dedup=False, incremental=False, retry=3, pool_size=None, keep_alive=True, retry_policy=None):
+    """ estimate the number of request and the wall-clock time of github_crawler_multipage without crawling
+
+    The page count of each url is read from the history of the previous crawl in output_dir (see :class:`torlib.crawler.schedule.PageCountHistory`),
+    the url without history is probed with a HEAD request of its first page (its ``link`` header has the last page) unless probe is False.
+    The remaining rate limit of every token is read from the rate limit endpoint and the crawl is simulated at
+    concurrency / latency request per second to find when each token run dry and how long the crawl wait for the reset.
+
+    Args:
+        savename (list): contain string of the save file name (need to be same length as url)
+        url (list): contain string of url of the target api (need to be same length as savename)
+        GHtoken (list): list of github token
+        output_dir (str, optional): output directory of the crawl. Defaults to ''.
+        pc (int, optional): number of process used to probe the url. Defaults to 1.
+        concurrency (int, optional): maximum number of in-flight requests of the crawl (and of the probe). Defaults to 100.
+        probe (boolean, optional): probe the url without history (one request per url). Defaults to True.
+        latency (float, optional): latency of a request in second. Defaults to None (latency of the rate limit request).
+        rate_limit_url (str, optional): url of the rate limit endpoint. Defaults to None (``/rate_limit`` of the host of the first url, ``/api/v3/rate_limit`` for github enterprise).
+        output_format (str, optional): output_format of the crawl. Defaults to 'json'.
+        dedup (boolean, optional): dedup of the crawl. Defaults to False.
+        incremental (boolean, optional): incremental of the crawl, the existing output file is requested again. Defaults to False.
+        retry (int, optional): number of time to retry the probe. Defaults to 3.
+        pool_size (int, optional): maximum number of keep-alive connection per host of the probe. Defaults to None.
+        keep_alive (boolean, optional): reuse the connection of the probe. Defaults to True.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry of the probe. Defaults to None.
+
+    Raises:
+        LengthNotMatchError: Raised when the length of savename and url is not the same
+        InputNotStringError: Raised when not all of member in savename or url are string
+        NoTokenError: Raised when input list of github token is empty
+        OutputFormatNotSupportedError: Raised when output_format is not supported
+        RateLimitNotAvailableError: Raised when the rate limit of a token cannot be read
+
+    Returns:
+        QuotaPlan: estimated cost of the crawl
+    """
+    from . import github_crawler
+    github_crawler._check_input(savename, url, GHtoken, output_format, incremental)
+    if rate_limit_url is None:
+        rate_limit_url = rate_limit_url_of(url[0]) if url else RATE_LIMIT_URL
+    # read the rate limit first so the invalid token fail before the probe
+    quota, rate_limit_latency = fetch_quota(GHtoken, rate_limit_url)
+    extension = OUTPUT_FORMAT[output_format][0]
+    list_to_crawl = [(os.path.join(output_dir, f'{sn}{extension}'), u, output_format, False, None) for sn, u in zip(savename, url)]
+    if dedup:
+        list_to_crawl, _ = dedup_crawl_list(list_to_crawl)
+    history = PageCountHistory(output_dir)
+    history.load()
+    estimate = estimate_pages(list_to_crawl, history, incremental)
+    done_urls = sum(1 for pages in estimate if pages == 0)
+    unknown = [i for i, pages in enumerate(estimate) if pages is None]
+    known_urls = len(estimate) - len(unknown) - done_urls
+    probed_urls = 0
+    if probe and unknown:
+        estimate = github_crawler._probe(list_to_crawl, estimate, GHtoken, pc, concurrency, retry, pool_size, keep_alive, retry_policy)
+        probed_urls = sum(1 for i in unknown if estimate[i] is not None)
+        # the probe use the rate limit of the token
+        quota, _ = fetch_quota(GHtoken, rate_limit_url)
+    # the url that cannot be estimated request at least its first page
+    requests = sum(1 if pages is None else pages for pages in estimate)
+    rate = concurrency / (latency or rate_limit_latency or 1)
+    return QuotaPlan(len(list_to_crawl), done_urls, known_urls, probed_urls, len(estimate) - done_urls - known_urls - probed_urls,
+                     requests, len(unknown) if probe else 0, quota, rate)
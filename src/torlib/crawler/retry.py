@@ -0,0 +1,70 @@
+import random
+import requests
+
+
+class RetryPolicy:
+    """Decide whether a failed request should be sent again and how long to wait before that
+
+    A request is retried when the connection fail, when the server return 5xx or 429,
+    or when the request hit the secondary rate limit (403 with ``Retry-After`` or the secondary rate limit message).
+    The wait time is ``Retry-After`` if the server send it, otherwise it is an exponential backoff with full jitter.
+
+    Args:
+        max_retry (int, optional): maximum number of time to retry one request. Defaults to 3.
+        backoff_base (float, optional): wait time in second of the first retry. Defaults to 1.
+        backoff_max (float, optional): maximum wait time in second of one retry. Defaults to 60.
+        secondary_rate_limit_wait (float, optional): wait time in second when the secondary rate limit is hit without ``Retry-After``. Defaults to 60.
+        jitter (boolean, optional): randomize the backoff between 0 and the exponential backoff. Defaults to True.
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    RETRY_EXCEPTION = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+    def __init__(self, max_retry=3, backoff_base=1.0, backoff_max=60.0, secondary_rate_limit_wait=60.0, jitter=True):
+        self.max_retry = max_retry
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.secondary_rate_limit_wait = secondary_rate_limit_wait
+        self.jitter = jitter
+
+    def should_retry(self, response=None, error=None):
+        """ return True if the request fail with transient error
+
+        Args:
+            response (requests.Response, optional): response of the request. Defaults to None.
+            error (Exception, optional): exception raised by the request. Defaults to None.
+        """
+        if error is not None:
+            return isinstance(error, self.RETRY_EXCEPTION)
+        if response.status_code in self.RETRY_STATUS:
+            return True
+        return is_secondary_rate_limited(response)
+
+    def delay(self, attempt, response=None):
+        """ return the number of second to wait before sending the request again
+
+        Args:
+            attempt (int): number of retry that has been done (0 for the first retry)
+            response (requests.Response, optional): response of the failed request. Defaults to None.
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None and retry_after.isdigit():
+                return float(retry_after)
+            if is_secondary_rate_limited(response):
+                return self.secondary_rate_limit_wait
+        backoff = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+
+def is_secondary_rate_limited(response):
+    """ return True if the response is rejected by the secondary rate limit of github
+
+    Args:
+        response (requests.Response): response of the request
+    """
+    if response.status_code not in (403, 429):
+        return False
+    if 'Retry-After' in response.headers:
+        return True
+    return 'secondary rate limit' in response.text.lower()
@@ -0,0 +1,132 @@
+import json
+import os
+from .dedup import normalize_url
+
+SCHEDULE = ('input', 'history', 'probe')
+
+
+class ScheduleNotSupportedError(Exception):
+    """Raised when the schedule is not 'input', 'history' or 'probe'
+
+    Attributes:
+        schedule (string): input schedule that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, schedule, message="schedule must be 'input', 'history' or 'probe'"):
+        self.schedule = schedule
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'schedule={self.schedule} -> {self.message}'
+
+
+class PageCountHistory:
+    """Number of page of every url recorded in output_dir by the previous crawl, used to estimate the cost of the url before it is crawled
+
+    The file is a json object ``{url: pages}`` (the url is normalized with :func:`torlib.crawler.dedup.normalize_url`),
+    it is read once at the start of the crawl and rewritten with the page count of the crawled url at the end of the crawl.
+    Only the main process read and write the file.
+
+    Args:
+        output_dir (string): output directory of the crawler
+        file_name (string, optional): name of the file. Defaults to '.github_crawler_pages'.
+    """
+
+    def __init__(self, output_dir, file_name='.github_crawler_pages'):
+        self.path = os.path.join(output_dir, file_name)
+        self.state = {}
+
+    def load(self):
+        """ read the page count of every url from the file
+
+        Returns:
+            dict: {url: pages}
+        """
+        self.state = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as infile:
+                    self.state = json.load(infile)
+            except ValueError:
+                # the file is only an estimate, a broken file is crawled again from scratch
+                self.state = {}
+        return self.state
+
+    def get(self, url):
+        """ return the page count of the url or None if the url has not been crawled"""
+        return self.state.get(normalize_url(url))
+
+    def update(self, list_to_crawl, result):
+        """ record the page count of every url that is crawled successfully from the first page and rewrite the file if a page count changed
+
+        Args:
+            list_to_crawl (list): input tuple that is crawled
+            result (list): (url, result, pages) of every input tuple in list_to_crawl
+        """
+        changed = False
+        for input_tuple, (url, is_success, pages) in zip(list_to_crawl, result):
+            # the resumed url and the existing file does not request every page
+            if is_success == 1 and pages > 0 and input_tuple[4] is None and self.state.get(normalize_url(url)) != pages:
+                self.state[normalize_url(url)] = pages
+                changed = True
+        if not changed:
+            return
+        with open(self.path + '.tmp', 'w') as outfile:
+            json.dump(self.state, outfile)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def estimate_pages(list_to_crawl, history=None, incremental=False):
+    """ return the estimated number of page of every input tuple
+
+    The url whose output file exist cost nothing (unless the crawl is incremental),
+    the other url cost the page count in history or None if it is unknown.
+
+    Args:
+        list_to_crawl (list): input tuple (save_path, url, ...) of every url
+        history (PageCountHistory, optional): page count of the previous crawl. Defaults to None.
+        incremental (boolean, optional): the existing output file is requested again for the updated item. Defaults to False.
+
+    Returns:
+        list: estimated number of page (int or None) of every input tuple
+    """
+    estimate = []
+    for save_path, url, *_ in list_to_crawl:
+        if not incremental and os.path.exists(save_path):
+            estimate.append(0)
+        else:
+            estimate.append(history.get(url) if history is not None else None)
+    return estimate
+
+
+def plan_chunks(estimate, workers, tasks_per_worker=8, max_chunk=100):
+    """ group the index of the input tuple into task in the order they should be sent to the pool
+
+    The url with unknown cost is sent first alone (it can be the largest one), then the other url from the largest,
+    the consecutive small url are grouped until the task has about total pages / (workers * tasks_per_worker) page.
+    Since the pool give the next task to the first idle worker, the largest url start first and the small task fill the gap at the end.
+
+    Args:
+        estimate (list): estimated number of page (int or None) of every input tuple
+        workers (int): number of worker process
+        tasks_per_worker (int, optional): number of task of the known url per worker. Defaults to 8.
+        max_chunk (int, optional): maximum number of url in a task. Defaults to 100.
+
+    Returns:
+        list: list of task, each task is a list of index of the input tuple
+    """
+    chunks = [[i] for i, pages in enumerate(estimate) if pages is None]
+    known = sorted((i for i, pages in enumerate(estimate) if pages is not None), key=lambda i: -estimate[i])
+    target = max(sum(estimate[i] for i in known) / (max(workers, 1) * tasks_per_worker), 1)
+    chunk, chunk_pages = [], 0
+    for i in known:
+        chunk.append(i)
+        chunk_pages += estimate[i]
+        if chunk_pages >= target or len(chunk) >= max_chunk:
+            chunks.append(chunk)
+            chunk, chunk_pages = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
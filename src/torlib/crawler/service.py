@@ -0,0 +1,534 @@
+"""Resident crawler service that keep a warm worker pool and the token state between crawl job
+
+Run from the command line::
+
+    python -m torlib.crawler.service --token TOKEN1 TOKEN2 --pc 4 --output-dir data --port 8765
+
+and submit the job with :class:`CrawlerClient` or any http client::
+
+    curl -X POST localhost:8765/jobs -d '{"savename": ["cat"], "url": ["https://api.github.com/repos/octo/cat/issues"]}'
+    curl localhost:8765/jobs/<id>?wait=60
+"""
+import argparse
+import collections
+import http.client
+import http.server
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit, parse_qs
+from . import github_crawler
+from .github_crawler import _check_input, _prepare_crawl_list, _write_fail_log, _init_worker, _prepare_hooks, OutputFormatNotSupportedError
+from .writer import OUTPUT_FORMAT
+from .codec import get_codec
+from .projection import compile_projection
+from .dedup import dedup_crawl_list, fan_out
+
+
+class PathNotAllowedError(Exception):
+    """Raised when the output of the job is not inside the output_dir of the service
+
+    Attributes:
+        path (string): input path that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, path, message="the output of the job must be inside the output_dir of the service"):
+        self.path = path
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'path={self.path} -> {self.message}'
+
+
+class JobNotFoundError(Exception):
+    """Raised when the job id is not submitted to the service or its status is already dropped
+
+    Attributes:
+        job_id (string): input job id that cause error
+        message (string): explanation of the error
+    """
+
+    def __init__(self, job_id, message="job is not found"):
+        self.job_id = job_id
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'job_id={self.job_id} -> {self.message}'
+
+
+class _Job:
+    """State of one submitted job, updated by the result handler thread of the pool"""
+
+    def __init__(self, job_id, list_to_crawl, aliases, order, urls, log_file, pretty_json):
+        self.id = job_id
+        self.list_to_crawl = list_to_crawl
+        self.aliases = aliases
+        # save_path of every input tuple before dedup, the log file follow this order
+        self.order = order
+        self.urls = urls
+        self.log_file = log_file
+        self.pretty_json = pretty_json
+        self.pending = collections.deque(range(len(list_to_crawl)))
+        self.result = [None] * len(list_to_crawl)
+        # (url, result) of every finished url in the order they finish, read by the stream
+        self.finished = []
+        self.running = 0
+        self.submitted = time.time()
+        self.started = None
+        self.done = None
+
+    def status(self):
+        state = 'done' if self.done is not None else 'running' if self.started is not None else 'queued'
+        failed = [(url, error) for url, error in self.finished if error != 1]
+        return {'id': self.id, 'state': state, 'urls': self.urls, 'finished': len(self.finished), 'failed': failed,
+                'seconds': (self.done or time.time()) - self.submitted}
+
+
+class CrawlerService:
+    """Crawl the submitted job with a worker pool that is created once, so the token scheduler, the rate limit of every token,
+    the keep-alive session and the metrics are kept between job
+
+    The url of every job that is running are sent to the pool in round robin, so a small job submitted after a large job
+    start at once instead of waiting for the large job to finish. At most ``2 * pc`` url are sent to the pool at the same time.
+    The output of each url is saved like :func:`torlib.crawler.github_crawler.github_crawler_multipage` in output_dir
+    (or its sub directory given by the job).
+
+    Args:
+        GHtoken (list): list of github token, each request use the token with the most remaining rate limit
+        retry (int, optional): number of time to retry a request that fail with transient error. Defaults to 3.
+        pc (int, optional): number of process of the worker pool. Defaults to 1.
+        concurrency (int, optional): maximum number of in-flight requests of the pool. Defaults to None (one request per process).
+        output_dir (str, optional): output directory, the output of every job must be inside it. Defaults to ''.
+        pool_size (int, optional): maximum number of keep-alive connection per host in the session of each token. Defaults to the number of in-flight requests of each process.
+        keep_alive (boolean, optional): reuse the connection of the session across request and job. Defaults to True.
+        connection_stats (ConnectionStats, optional): counter that will be updated with the number of connection opened and reused. Defaults to None.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry. Defaults to None.
+        http_cache (HttpCache, optional): on-disk cache used to send conditional request. Defaults to None.
+        metrics (CrawlMetrics, optional): metrics of every job, served at ``/metrics``. Defaults to None.
+        hooks (list, optional): list of CrawlHooks that is called before and after every request (must be picklable). Defaults to None.
+        concurrency_controller (AdaptiveConcurrency, optional): controller that adjust the number of in-flight requests. Defaults to None.
+        json_codec (str, optional): 'orjson', 'json' or 'auto'. Defaults to 'auto'.
+        projection (list, optional): list of field path kept in the output of every job. Defaults to None (every field).
+        max_finished_jobs (int, optional): number of finished job whose status is kept. Defaults to 1000.
+
+    Raises:
+        NoTokenError: Raised when input list of github token is empty
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        FieldPathError: Raised when a field path of projection cannot be parsed
+    """
+
+    def __init__(self, GHtoken, retry=3, pc=1, concurrency=None, output_dir='', pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, http_cache=None, metrics=None, hooks=None, concurrency_controller=None, json_codec='auto', projection=None, max_finished_jobs=1000):
+        import multiprocessing as mp
+        from .token_scheduler import TokenScheduler
+        from .retry import RetryPolicy
+        _check_input([], [], GHtoken)
+        codec = get_codec(json_codec)
+        projection = compile_projection(projection)
+        self.GHtoken = GHtoken
+        self.output_dir = os.path.abspath(output_dir)
+        self.metrics = metrics
+        self.http_cache = http_cache
+        self.max_finished_jobs = max_finished_jobs
+        token_scheduler = TokenScheduler(GHtoken)
+        if retry_policy is None:
+            retry_policy = RetryPolicy(max_retry=retry)
+        if concurrency is None:
+            concurrency = pc
+        hooks = _prepare_hooks(hooks, metrics, token_scheduler, concurrency_controller, concurrency)
+        page_workers = max(concurrency // pc, 1)
+        self._pool = mp.Pool(pc, initializer=_init_worker, initargs=(token_scheduler, retry_policy, pool_size or page_workers, keep_alive, connection_stats,
+                                                                      page_workers, None, http_cache, None, metrics, hooks,
+                                                                      None, concurrency_controller, codec, projection))
+        self._slots = 2 * pc
+        self._jobs = collections.OrderedDict()
+        # job that has url not sent to the pool, in round robin order
+        self._active = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, savename, url, output_dir='', output_format='json', pretty_json=True, dedup=False, log_file=None):
+        """ add a job to the service
+
+        Args:
+            savename (list): contain string of the save file name (need to be same length as url)
+            url (list): contain string of url of the target api (need to be same length as savename)
+            output_dir (str, optional): sub directory of the output_dir of the service. Defaults to ''.
+            output_format (str, optional): output format that save one file per url (see github_crawler_multipage). Defaults to 'json'.
+            pretty_json (boolean, optional): make to output json file easier to read. Defaults to True.
+            dedup (boolean, optional): request the url that is the same after normalization only once (the output of the duplicate is a hardlink). Defaults to False.
+            log_file (str, optional): log file of the url that cannot be crawled written when the job is done (inside the output_dir of the service). Defaults to None.
+
+        Raises:
+            LengthNotMatchError: Raised when the length of savename and url is not the same
+            InputNotStringError: Raised when not all of member in savename or url are string
+            OutputFormatNotSupportedError: Raised when output_format is not supported or save every url in a shared store
+            PathNotAllowedError: Raised when the output file or the log file is not inside the output_dir of the service
+
+        Returns:
+            string: id of the job
+        """
+        _check_input(savename, url, self.GHtoken, output_format)
+        if OUTPUT_FORMAT[output_format][3] is not None:
+            # the output store of the pool is fixed when the pool is created
+            raise OutputFormatNotSupportedError(output_format, 'crawler service require the output_format that save one file per url')
+        job_dir = self._inside(os.path.join(self.output_dir, output_dir))
+        if log_file is not None:
+            log_file = self._inside(os.path.join(self.output_dir, log_file))
+        list_to_crawl = _prepare_crawl_list(savename, url, job_dir, output_format, pretty_json)
+        for input_tuple in list_to_crawl:
+            self._inside(input_tuple[0])
+        aliases = {}
+        order = None
+        if dedup:
+            order = [input_tuple[0] for input_tuple in list_to_crawl]
+            list_to_crawl, aliases = dedup_crawl_list(list_to_crawl)
+        job = _Job(uuid.uuid4().hex[:12], list_to_crawl, aliases, order, len(url), log_file, pretty_json)
+        with self._condition:
+            self._jobs[job.id] = job
+            if list_to_crawl:
+                self._active.append(job)
+            else:
+                self._finish(job)
+            self._condition.notify_all()
+        return job.id
+
+    def _inside(self, path):
+        """ return the absolute path, raise PathNotAllowedError if it is not inside the output_dir of the service"""
+        path = os.path.abspath(path)
+        if os.path.commonpath([self.output_dir, path]) != self.output_dir:
+            raise PathNotAllowedError(path)
+        return path
+
+    def status(self, job_id):
+        """ return the status of the job
+
+        Raises:
+            JobNotFoundError: Raised when the job is not found
+
+        Returns:
+            dict: id, state ('queued', 'running' or 'done'), urls, finished (number of url finished), failed (list of (url, error)) and seconds since the job is submitted
+        """
+        with self._condition:
+            return self._job(job_id).status()
+
+    def wait(self, job_id, timeout=None):
+        """ wait until the job is done or timeout and return its status
+
+        Raises:
+            JobNotFoundError: Raised when the job is not found
+        """
+        with self._condition:
+            job = self._job(job_id)
+            self._condition.wait_for(lambda: job.done is not None or self._closed, timeout)
+            return job.status()
+
+    def stream(self, job_id, timeout=None):
+        """ yield (url, result) of every url of the job as soon as it finish until the job is done
+
+        Args:
+            job_id (string): id of the job
+            timeout (float, optional): seconds to wait for the next url. Defaults to None (no limit).
+
+        Raises:
+            JobNotFoundError: Raised when the job is not found
+        """
+        position = 0
+        while True:
+            with self._condition:
+                job = self._job(job_id)
+                if not self._condition.wait_for(lambda: len(job.finished) > position or job.done is not None or self._closed, timeout):
+                    return
+                finished = job.finished[position:]
+                done = job.done is not None or self._closed
+            yield from finished
+            position = position+len(finished)
+            if done and position >= len(job.finished):
+                return
+
+    def jobs(self):
+        """ return the status of every job that is kept"""
+        with self._condition:
+            return [job.status() for job in self._jobs.values()]
+
+    def _job(self, job_id):
+        if job_id not in self._jobs:
+            raise JobNotFoundError(job_id)
+        return self._jobs[job_id]
+
+    def _dispatch(self):
+        """ send the url of the active job to the pool in round robin while there is a free slot"""
+        with self._condition:
+            while True:
+                self._condition.wait_for(lambda: self._closed or (self._active and self._slots > 0))
+                if self._closed:
+                    return
+                job = self._active.popleft()
+                i = job.pending.popleft()
+                if job.pending:
+                    self._active.append(job)
+                if job.started is None:
+                    job.started = time.time()
+                job.running = job.running+1
+                self._slots = self._slots-1
+                self._pool.apply_async(github_crawler._collect_pages, (job.list_to_crawl[i],),
+                                       callback=lambda result, job=job, i=i: self._collected(job, i, result),
+                                       error_callback=lambda e, job=job, i=i: self._collected(job, i, (job.list_to_crawl[i][1], str(e), 0)))
+
+    def _collected(self, job, i, result):
+        """ record the result of the url, called by the result handler thread of the pool"""
+        with self._condition:
+            self._slots = self._slots+1
+            job.running = job.running-1
+            job.result[i] = result
+            job.finished.append(result[:2])
+            if not job.pending and job.running == 0:
+                self._finish(job)
+            self._condition.notify_all()
+
+    def _finish(self, job):
+        """ give the output to the duplicate url, write the log file and drop the oldest finished job"""
+        result = job.result
+        if job.aliases:
+            result, saved = fan_out(job.list_to_crawl, job.result, job.aliases, order=job.order)
+            # the duplicate url get the result of its url when the job is done
+            crawled = {input_tuple[0]: r[1] for input_tuple, r in zip(job.list_to_crawl, job.result)}
+            for save_path, aliases in job.aliases.items():
+                job.finished.extend((alias[1], crawled[save_path]) for alias in aliases)
+            if self.metrics is not None:
+                self.metrics.add_deduplicated(sum(len(a) for a in job.aliases.values()), saved)
+        if job.log_file is not None:
+            _write_fail_log(job.log_file, [r[:2] for r in result], job.pretty_json)
+        job.done = time.time()
+        job.list_to_crawl = job.aliases = job.result = None
+        finished = [job_id for job_id, j in self._jobs.items() if j.done is not None]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job_id]
+
+    def close(self):
+        """ stop sending url to the pool, wait for the url in progress and close the pool"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._dispatcher.join()
+        self._pool.close()
+        self._pool.join()
+        if self.http_cache is not None:
+            self.http_cache.prune()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Json api of the service
+
+    * ``POST /jobs`` body ``{"savename": [...], "url": [...], ...}`` (the argument of :meth:`CrawlerService.submit`) -> ``{"id": id}``
+    * ``GET /jobs`` -> status of every job
+    * ``GET /jobs/<id>?wait=<seconds>`` -> status of the job (after the job is done or wait seconds)
+    * ``GET /jobs/<id>/stream`` -> one json line ``[url, result]`` per url as soon as it finish until the job is done
+    * ``GET /metrics`` -> prometheus text of the metrics
+    """
+
+    service = None
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip('/') != '/jobs':
+            return self._send(404, {'error': 'not found'})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            job_id = self.service.submit(**body)
+        except Exception as e:
+            return self._send(400, {'error': str(e)})
+        self._send(200, {'id': job_id})
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = parts.path.strip('/').split('/')
+        query = parse_qs(parts.query)
+        try:
+            if path == ['jobs']:
+                return self._send(200, self.service.jobs())
+            if path == ['metrics'] and self.service.metrics is not None:
+                return self._send(200, self.service.metrics.to_prometheus(), 'text/plain; version=0.0.4')
+            if len(path) == 2 and path[0] == 'jobs':
+                wait = float(query['wait'][0]) if 'wait' in query else None
+                return self._send(200, self.service.wait(path[1], wait) if wait else self.service.status(path[1]))
+            if len(path) == 3 and path[0] == 'jobs' and path[2] == 'stream':
+                self.service.status(path[1])
+                return self._stream(path[1])
+        except JobNotFoundError as e:
+            return self._send(404, {'error': str(e)})
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        self._send(404, {'error': 'not found'})
+
+    def _stream(self, job_id):
+        # the response end when the connection is closed (HTTP/1.0)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        for result in self.service.stream(job_id):
+            self.wfile.write(json.dumps(result).encode() + b'\n')
+            self.wfile.flush()
+
+    def _send(self, code, body, content_type='application/json'):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # the address of the unix socket client is empty
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    # http.server.ThreadingHTTPServer is only in python 3.7+
+    daemon_threads = True
+
+
+def serve(service, host='127.0.0.1', port=8765, unix_socket=None):
+    """ return the started http server of the service (the request is handled in a background thread)
+
+    Args:
+        service (CrawlerService): service that run the job
+        host (str, optional): address to listen on. Defaults to '127.0.0.1'.
+        port (int, optional): port to listen on, 0 to choose a free port (read it from ``server.server_address``). Defaults to 8765.
+        unix_socket (str, optional): path of the unix socket to listen on instead of host and port. Defaults to None.
+
+    Returns:
+        socketserver.BaseServer: the server, call ``shutdown`` to stop it
+    """
+    handler = type('Handler', (_Handler,), {'service': service})
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = _UnixHTTPServer(unix_socket, handler)
+    else:
+        server = _TCPHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_socket = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_socket)
+
+
+class CrawlerClient:
+    """Client of the http api of :class:`CrawlerService` (only use the standard library)
+
+    Args:
+        address (str): ``http://host:port`` of the service or the path of its unix socket
+        timeout (float, optional): socket timeout in seconds. Defaults to None (no limit).
+    """
+
+    def __init__(self, address, timeout=None):
+        self.address = address
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.address.startswith('http://'):
+            return http.client.HTTPConnection(urlsplit(self.address).netloc, timeout=self.timeout)
+        return _UnixHTTPConnection(self.address, timeout=self.timeout)
+
+    def _request(self, method, path, body=None):
+        connection = self._connection()
+        try:
+            connection.request(method, path, body=None if body is None else json.dumps(body), headers={'Content-Type': 'application/json'})
+            r = connection.getresponse()
+            data = json.loads(r.read())
+        finally:
+            connection.close()
+        if r.status == 404 and path.startswith('/jobs/'):
+            raise JobNotFoundError(path.split('/')[2], data.get('error', 'job is not found'))
+        if r.status != 200:
+            raise ValueError(data.get('error'))
+        return data
+
+    def submit(self, savename, url, **kwargs):
+        """ submit the job (the keyword argument are the same as :meth:`CrawlerService.submit`) and return its id
+
+        Raises:
+            ValueError: Raised when the service reject the job, the message is the error of the service
+        """
+        return self._request('POST', '/jobs', {'savename': savename, 'url': url, **kwargs})['id']
+
+    def status(self, job_id):
+        """ return the status of the job (see :meth:`CrawlerService.status`)"""
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def wait(self, job_id, timeout=60):
+        """ wait until the job is done or timeout and return its status"""
+        return self._request('GET', f'/jobs/{job_id}?wait={timeout}')
+
+    def stream(self, job_id):
+        """ yield (url, result) of every url of the job as soon as it finish until the job is done"""
+        connection = self._connection()
+        try:
+            connection.request('GET', f'/jobs/{job_id}/stream')
+            r = connection.getresponse()
+            if r.status != 200:
+                raise JobNotFoundError(job_id, json.loads(r.read()).get('error', 'job is not found'))
+            for line in r:
+                yield tuple(json.loads(line))
+        finally:
+            connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='resident github crawler service')
+    parser.add_argument('--token', nargs='+', default=[], help='github token (or GITHUB_TOKENS environment variable, comma separated)')
+    parser.add_argument('--pc', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=None)
+    parser.add_argument('--retry', type=int, default=3)
+    parser.add_argument('--output-dir', default='')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', default=None)
+    args = parser.parse_args(argv)
+    from .metrics import CrawlMetrics
+    tokens = args.token or [t for t in os.environ.get('GITHUB_TOKENS', '').split(',') if t]
+    with CrawlerService(tokens, retry=args.retry, pc=args.pc, concurrency=args.concurrency, output_dir=args.output_dir, metrics=CrawlMetrics()) as service:
+        server = serve(service, args.host, args.port, args.unix_socket)
+        print(f'crawler service listening on {args.unix_socket or "http://%s:%d" % server.server_address[:2]}')
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import multiprocessing as mp
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class ConnectionStats:
+    """Counter of the connection opened and the request sent by the session of the crawler
+
+    The counter is stored in shared memory so the same object can be passed to
+    every worker process of the crawler and read from the parent process.
+
+    Attributes:
+        opened (int): number of new connection that are opened
+        requests (int): number of request that are sent
+        reused (int): number of request that reuse an already opened connection
+    """
+
+    def __init__(self):
+        self._opened = mp.Value('L', 0)
+        self._requests = mp.Value('L', 0)
+
+    def add_opened(self):
+        with self._opened.get_lock():
+            self._opened.value += 1
+
+    def add_request(self):
+        with self._requests.get_lock():
+            self._requests.value += 1
+
+    @property
+    def opened(self):
+        return self._opened.value
+
+    @property
+    def requests(self):
+        return self._requests.value
+
+    @property
+    def reused(self):
+        return max(self.requests - self.opened, 0)
+
+    def as_dict(self):
+        """ return the counter as dict with key opened, reused and requests"""
+        return {'opened': self.opened, 'reused': self.reused, 'requests': self.requests}
+
+    def __str__(self):
+        return f'opened={self.opened} reused={self.reused} requests={self.requests}'
+
+
+def _counting_pool_class(base, stats):
+    """ create subclass of the urllib3 connection pool that count every connection opened (including reconnect) in stats"""
+    class CountingConnection(base.ConnectionCls):
+        def connect(self):
+            stats.add_opened()
+            return super().connect()
+
+    class CountingConnectionPool(base):
+        ConnectionCls = CountingConnection
+    return CountingConnectionPool
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that count the new connection opened by its connection pools"""
+
+    def __init__(self, stats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool_class(HTTPConnectionPool, self._stats),
+            'https': _counting_pool_class(HTTPSConnectionPool, self._stats),
+        }
+
+
+class SessionPool:
+    """Long-lived keep-alive ``requests.Session`` of the crawler, one session per github token
+
+    The session of a token is created on the first request and reused for every later request
+    (across url and across retry round), so the TCP connection and TLS handshake are reused.
+
+    Args:
+        pool_size (int, optional): maximum number of connection kept alive per host in each session. Defaults to 10.
+        keep_alive (boolean, optional): keep the connection open after each request. Defaults to True.
+        stats (ConnectionStats, optional): counter of the connection opened and reused. Defaults to None (new counter).
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True, stats=None):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.stats = stats if stats is not None else ConnectionStats()
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, GHtoken):
+        """ return the session of the github token
+
+        Args:
+            GHtoken (string): github token
+
+        Returns:
+            requests.Session: session that send the request with the token
+        """
+        session = self._sessions.get(GHtoken)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(GHtoken)
+                if session is None:
+                    session = self._new_session(GHtoken)
+                    self._sessions[GHtoken] = session
+        return session
+
+    def _new_session(self, GHtoken):
+        session = requests.Session()
+        adapter = _CountingHTTPAdapter(self.stats, pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Authorization'] = 'token '+GHtoken
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        session.hooks['response'].append(lambda r, *args, **kwargs: self.stats.add_request())
+        return session
+
+    def close(self):
+        """ close all of the session and its connection"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing as mp
+import time
+
+
+class TokenScheduler:
+    """Shared scheduler that hand each request the github token with the most remaining rate limit
+
+    The remaining rate limit and the reset time of each token are read from the
+    ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset`` header of every response.
+    The state is stored in shared memory so the same scheduler can be passed to every worker process of the crawler.
+    The scheduler only block when the rate limit of every token is exhausted.
+    With pace the remaining rate limit of each token is spread until its reset time
+    (one request per (reset - now) / remaining second), so a crawl larger than the quota run at the rate of the quota
+    instead of using up every token and then sleeping until the reset.
+
+    Args:
+        GHtoken (list): list of github token
+        default_limit (int, optional): rate limit assumed for the token that has not been used yet or whose rate limit has been reset. Defaults to 5000.
+        pace (boolean, optional): spread the remaining rate limit of each token until its reset time. Defaults to False.
+    """
+
+    def __init__(self, GHtoken, default_limit=5000, pace=False):
+        # remove duplicate token but keep the order
+        self.GHtoken = list(dict.fromkeys(GHtoken))
+        self.default_limit = default_limit
+        self.pace = pace
+        self._index = {token: i for i, token in enumerate(self.GHtoken)}
+        self._remaining = mp.Array('d', [float(default_limit)] * len(self.GHtoken), lock=False)
+        self._reset = mp.Array('d', [0.0] * len(self.GHtoken), lock=False)
+        # earliest time the next request of the token can be sent when pace is used
+        self._next = mp.Array('d', [0.0] * len(self.GHtoken), lock=False)
+        self._lock = mp.Lock()
+
+    def try_acquire(self):
+        """ take one request from the token with the most remaining rate limit
+
+        Returns:
+            tuple: (token, wait_time) token is None and wait_time is the number of second until
+            the first token is reset when the rate limit of every token is exhausted (or until the next paced request of a token)
+        """
+        now = time.time()
+        with self._lock:
+            best = None
+            paced = None
+            for i in range(len(self.GHtoken)):
+                # the rate limit of the token has been reset
+                if self._remaining[i] <= 0 and self._reset[i] <= now:
+                    self._remaining[i] = self.default_limit
+                if self._remaining[i] <= 0:
+                    continue
+                if self.pace and self._next[i] > now:
+                    paced = self._next[i] if paced is None else min(paced, self._next[i])
+                    continue
+                if best is None or self._remaining[i] > self._remaining[best]:
+                    best = i
+            if best is not None:
+                self._remaining[best] -= 1
+                if self.pace and self._reset[best] > now:
+                    self._next[best] = max(self._next[best], now) + (self._reset[best] - now) / max(self._remaining[best], 1)
+                return self.GHtoken[best], 0
+            if paced is not None:
+                return None, paced - now
+            return None, max(min(self._reset) - now, 0)
+
+    def acquire(self):
+        """ return the token with the most remaining rate limit, block until a token is reset if every token is exhausted
+
+        Returns:
+            string: github token
+        """
+        while True:
+            token, wait_time = self.try_acquire()
+            if token is not None:
+                return token
+            time.sleep(wait_time)
+
+    async def acquire_async(self):
+        """ same as acquire but wait with asyncio.sleep
+
+        Returns:
+            string: github token
+        """
+        while True:
+            token, wait_time = self.try_acquire()
+            if token is not None:
+                return token
+            await asyncio.sleep(wait_time)
+
+    def update(self, GHtoken, headers):
+        """ update the remaining rate limit and reset time of the token from the header of the response
+
+        Args:
+            GHtoken (string): token used to send the request
+            headers (dict): header of the response
+        """
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        reset = headers.get('X-RateLimit-Reset')
+        i = self._index[GHtoken]
+        with self._lock:
+            self._remaining[i] = float(remaining)
+            if reset is not None:
+                self._reset[i] = float(reset)
+
+    def quota(self):
+        """ return the known rate limit of each token
+
+        Returns:
+            dict: {token: (remaining, reset)}
+        """
+        with self._lock:
+            return {token: (self._remaining[i], self._reset[i]) for i, token in enumerate(self.GHtoken)}
@@ -0,0 +1,281 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+import multiprocessing as mp
+from tqdm import tqdm
+from . import github_crawler
+from .github_crawler import _check_input, _prepare_crawl_list, _write_fail_log, _init_worker, _prepare_hooks
+from .github_crawler import LengthNotMatchError, InputNotStringError, OutputFormatNotSupportedError
+from .token_scheduler import TokenScheduler
+from .retry import RetryPolicy
+from .writer import OUTPUT_FORMAT
+from .codec import get_codec
+from .projection import compile_projection
+
+
+class WorkQueue:
+    """Work queue of the url to crawl in a SQLite file that is shared by the worker of every process or node
+
+    The coordinator add the url with :meth:`enqueue` and every worker :meth:`claim` a batch of url with a lease.
+    The lease is extended by :meth:`heartbeat` while the worker is crawling,
+    the url whose lease is expired (the worker is dead) can be claimed again by another worker
+    and the url that is claimed max_attempts times without being completed (e.g. it kill every worker) is marked as failed.
+    Every operation open its own connection so the queue can be used from any thread and process,
+    the file can be on shared storage that support file lock (the rollback journal is used instead of WAL).
+
+    Args:
+        path (string): path of the SQLite file
+        lease_seconds (float, optional): seconds until the claimed url can be claimed by another worker if it is not heartbeat. Defaults to 300.
+        max_attempts (int, optional): number of time the url can be claimed before its expired lease mark it as failed. Defaults to 3.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as connection, connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS task (id INTEGER PRIMARY KEY, savename TEXT UNIQUE, url TEXT, '
+                               "state TEXT DEFAULT 'pending', worker TEXT, lease_until REAL DEFAULT 0, attempts INTEGER DEFAULT 0, error TEXT)")
+            connection.execute('CREATE INDEX IF NOT EXISTS task_state ON task (state, lease_until)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    def enqueue(self, savename, url):
+        """ add the url to the queue, the savename that is already in the queue is ignored
+
+        Args:
+            savename (list): contain string of the save file name (need to be same length as url)
+            url (list): contain string of url of the target api (need to be same length as savename)
+
+        Raises:
+            LengthNotMatchError: Raised when the length of savename and url is not the same
+            InputNotStringError: Raised when not all of member in savename or url are string
+
+        Returns:
+            int: number of url added
+        """
+        if len(savename) != len(url):
+            raise LengthNotMatchError(savename, url)
+        for name, values in (('savename', savename), ('url', url)):
+            if any(type(value) != str for value in values):
+                raise InputNotStringError(name)
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            before = connection.total_changes
+            connection.executemany('INSERT OR IGNORE INTO task (savename, url) VALUES (?, ?)', zip(savename, url))
+            connection.execute('COMMIT')
+            return connection.total_changes - before
+
+    def claim(self, worker, batch_size=100):
+        """ lease up to batch_size pending url (or url whose lease is expired) to the worker
+
+        Args:
+            worker (string): id of the worker
+            batch_size (int, optional): maximum number of url to claim. Defaults to 100.
+
+        Returns:
+            list: (id, savename, url) of the claimed url
+        """
+        now = time.time()
+        with closing(self._connect()) as connection:
+            # the write lock is taken before reading so two worker cannot claim the same url
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute("UPDATE task SET state = 'failed', error = ? WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                                   (f'lease expired after {self.max_attempts} attempts', now, self.max_attempts))
+                tasks = connection.execute("SELECT id, savename, url FROM task WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) "
+                                           'ORDER BY id LIMIT ?', (now, batch_size)).fetchall()
+                connection.executemany("UPDATE task SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                                       [(worker, now + self.lease_seconds, task[0]) for task in tasks])
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return tasks
+
+    def heartbeat(self, worker, ids):
+        """ extend the lease of the url that is still leased to the worker
+
+        Args:
+            worker (string): id of the worker
+            ids (list): id of the url
+        """
+        with closing(self._connect()) as connection, connection:
+            connection.executemany("UPDATE task SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                                   [(time.time() + self.lease_seconds, i, worker) for i in ids])
+
+    def complete(self, worker, task_id, result):
+        """ mark the url that is still leased to the worker as done if result is 1 otherwise failed with the error message
+
+        The url whose lease is expired and claimed by another worker is not changed, so the late worker cannot overwrite its result.
+
+        Args:
+            worker (string): id of the worker
+            task_id (int): id of the url
+            result (int or string): 1 if success otherwise the error message
+
+        Returns:
+            boolean: True if the result is recorded
+        """
+        with closing(self._connect()) as connection, connection:
+            if result == 1:
+                cursor = connection.execute("UPDATE task SET state = 'done', error = NULL WHERE id = ? AND worker = ? AND state = 'leased'", (task_id, worker))
+            else:
+                cursor = connection.execute("UPDATE task SET state = 'failed', error = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                                            (str(result), task_id, worker))
+            return cursor.rowcount == 1
+
+    def retry_failed(self):
+        """ put the failed url back to the queue with max_attempts new attempts
+
+        Returns:
+            int: number of url put back
+        """
+        with closing(self._connect()) as connection, connection:
+            return connection.execute("UPDATE task SET state = 'pending', error = NULL, attempts = 0 WHERE state = 'failed'").rowcount
+
+    def stats(self):
+        """ return the number of url of each state
+
+        Returns:
+            dict: {'pending', 'leased', 'done', 'failed'} (leased url whose lease is expired are counted as pending)
+        """
+        stats = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        now = time.time()
+        with closing(self._connect()) as connection:
+            for state, expired, count in connection.execute('SELECT state, lease_until < ?, COUNT(*) FROM task GROUP BY state, lease_until < ?', (now, now)):
+                stats['pending' if state == 'leased' and expired else state] += count
+        return stats
+
+    def failed(self):
+        """ return (url, error message) of the failed url"""
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT url, error FROM task WHERE state = 'failed' ORDER BY id").fetchall()
+
+
+class _Heartbeat(threading.Thread):
+    """Thread that extend the lease of the claimed url until it is stopped"""
+
+    def __init__(self, work_queue, worker):
+        super().__init__(daemon=True)
+        self.work_queue = work_queue
+        self.worker = worker
+        self.ids = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.work_queue.lease_seconds / 3):
+            with self._lock:
+                ids = list(self.ids)
+            if ids:
+                self.work_queue.heartbeat(self.worker, ids)
+
+    def add(self, ids):
+        with self._lock:
+            self.ids.update(ids)
+
+    def remove(self, task_id):
+        with self._lock:
+            self.ids.discard(task_id)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def github_crawler_worker(queue_path, GHtoken, retry=3, pc=1, log_file='github_crawler_log.txt', output_dir='', pretty_json=True, batch_size=100, lease_seconds=300, max_attempts=3, poll_interval=5, worker=None, concurrency=None, pool_size=None, keep_alive=True, connection_stats=None, retry_policy=None, output_format='json', http_cache=None, metrics=None, hooks=None, json_codec='auto', projection=None):
+    """ crawl the url in the work queue until every url is done, the same function can be run on many node that share the queue file and output_dir
+
+    The worker claim a batch of url, crawl it with a process pool like :func:`github_crawler.github_crawler_multipage`
+    and mark each url as done or failed as soon as it finish. The lease of the claimed url is extended in the background,
+    if the worker die its url are claimed by another worker after the lease expire.
+    The worker stop when there is no pending url and no url leased to another worker.
+    The output file already in output_dir is not requested again.
+
+    Args:
+        queue_path (string): path of the SQLite file of the :class:`WorkQueue`
+        GHtoken (list): list of github token of this worker
+        retry (int, optional): number of time to retry a request that fail with transient error. Defaults to 3.
+        pc (int, optional): number of process for multiprocessing. Defaults to 1.
+        log_file (str, optional): name of the log file showing the url that this worker cannot crawl. Defaults to 'github_crawler_log.txt'.
+        output_dir (str, optional): output directory shared by every worker. Defaults to ''.
+        pretty_json (boolean, optional): make to output json file easier to read. Defaults to True.
+        batch_size (int, optional): number of url claimed at a time. Defaults to 100.
+        lease_seconds (float, optional): seconds until the url claimed by a dead worker can be claimed again. Defaults to 300.
+        max_attempts (int, optional): number of time the url can be claimed before it is marked as failed when its lease expire. Defaults to 3.
+        poll_interval (float, optional): seconds to wait when every remaining url is leased to another worker. Defaults to 5.
+        worker (str, optional): id of the worker. Defaults to None (hostname, process id and random suffix).
+        concurrency (int, optional): maximum number of in-flight requests. Defaults to None (one request per process).
+        pool_size (int, optional): maximum number of keep-alive connection per host in the session of each token. Defaults to the number of in-flight requests of each process.
+        keep_alive (boolean, optional): reuse the connection of the session across request. Defaults to True.
+        connection_stats (ConnectionStats, optional): counter that will be updated with the number of connection opened and reused. Defaults to None.
+        retry_policy (RetryPolicy, optional): backoff setting of the retry. Defaults to None.
+        output_format (str, optional): output format that save one file per url (see github_crawler_multipage). Defaults to 'json'.
+        http_cache (HttpCache, optional): on-disk cache used to send conditional request. Defaults to None.
+        metrics (CrawlMetrics, optional): metrics of the crawl of this worker. Defaults to None.
+        hooks (list, optional): list of CrawlHooks that is called before and after every request (must be picklable). Defaults to None.
+        json_codec (str, optional): 'orjson', 'json' or 'auto' to decode the page and encode the compact item with orjson if it is installed otherwise json. Defaults to 'auto'.
+        projection (list, optional): list of field path, only these field of each item are saved (every worker should use the same projection). Defaults to None (every field).
+
+    Raises:
+        NoTokenError: Raised when input list of github token is empty
+        OutputFormatNotSupportedError: Raised when output_format is not supported or save every url in a shared store
+        JsonCodecNotSupportedError: Raised when json_codec is not 'auto', 'json' or 'orjson'
+        FieldPathError: Raised when a field path of projection cannot be parsed
+
+    Returns:
+        int: number of url crawled by this worker
+    """
+    _check_input([], [], GHtoken, output_format)
+    if OUTPUT_FORMAT[output_format][3] is not None:
+        # the shard is locked with a process lock that does not work across node
+        raise OutputFormatNotSupportedError(output_format, 'distributed crawl require the output_format that save one file per url')
+    codec = get_codec(json_codec)
+    projection = compile_projection(projection)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    work_queue = WorkQueue(queue_path, lease_seconds, max_attempts)
+    worker = worker or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    token_scheduler = TokenScheduler(GHtoken)
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retry=retry)
+    hooks = _prepare_hooks(hooks, metrics, token_scheduler)
+    page_workers = max((concurrency or pc) // pc, 1)
+    heartbeat = _Heartbeat(work_queue, worker)
+    result = []
+    progress = tqdm()
+    try:
+        with mp.Pool(pc, initializer=_init_worker, initargs=(token_scheduler, retry_policy, pool_size or page_workers, keep_alive, connection_stats,
+                                                             page_workers, None, http_cache, None, metrics, hooks, None, None, codec, projection)) as p:
+            # the thread is started after the worker process are forked
+            heartbeat.start()
+            while True:
+                tasks = work_queue.claim(worker, batch_size)
+                if not tasks:
+                    stats = work_queue.stats()
+                    if stats['pending'] == 0 and stats['leased'] == 0:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                heartbeat.add([task[0] for task in tasks])
+                list_to_crawl = _prepare_crawl_list([task[1] for task in tasks], [task[2] for task in tasks], output_dir, output_format, pretty_json)
+                for task, (url, is_success) in zip(tasks, p.imap(github_crawler.__collect_json_multipage, list_to_crawl, chunksize=1)):
+                    heartbeat.remove(task[0])
+                    # the url whose lease is lost belong to the worker that claimed it again
+                    if work_queue.complete(worker, task[0], is_success):
+                        result.append((url, is_success))
+                    progress.update(1)
+    finally:
+        progress.close()
+        if heartbeat.is_alive():
+            heartbeat.stop()
+    if http_cache is not None:
+        http_cache.prune()
+    _write_fail_log(log_file, result, pretty_json)
+    return len(result)
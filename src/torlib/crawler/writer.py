@@ -0,0 +1,195 @@
+import gzip
+import json
+import os
+import textwrap
+from .codec import JsonCodec
+
+
+class JsonArrayWriter:
+    """Write the item of each page to a json array file as soon as the page arrive
+
+    The output is the same as ``json.dump`` of the list of all item (with ``indent=4`` if pretty_json)
+    but only one page is kept in memory. The file is written to ``save_path + '.part'``
+    and renamed to save_path when it is closed, so save_path only exists when the url is completely crawled.
+    Without pretty_json and projection the body of the page can be written as it is with :meth:`write_raw_page`.
+
+    Args:
+        save_path (string): save file name with path
+        pretty_json (boolean, optional): make to output json file easier to read. Defaults to True.
+        resume (tuple, optional): (offset, count) continue writing the part file after its first offset byte that contain count item. Defaults to None.
+        compression (string, optional): None, 'gzip' or 'zstd' (require zstandard package), the compressed file cannot be resumed. Defaults to None.
+        codec (JsonCodec, optional): codec used to encode the compact item. Defaults to None (json module).
+        projection (FieldProjection, optional): projection applied to the item of the page written by write_page. Defaults to None.
+
+    Attributes:
+        count (int): number of item written, the page written by write_raw_page is counted as one item since it is not parsed
+    """
+
+    def __init__(self, save_path, pretty_json=True, resume=None, compression=None, codec=None, projection=None):
+        self.save_path = save_path
+        self.pretty_json = pretty_json
+        self.compression = compression
+        self.codec = codec or JsonCodec()
+        self.projection = projection
+        self.count = 0
+        self._part_path = save_path + '.part'
+        self.resumed = self._resume(resume)
+        if not self.resumed:
+            self._file = open_text(self._part_path, 'w', compression)
+            self._write_start()
+
+    @property
+    def resumable(self):
+        """ True if the part file can be resumed from the offset returned by tell"""
+        return self.compression is None
+
+    def _resume(self, resume):
+        """ open the part file and remove everything after offset, return False if the part file cannot be resumed"""
+        if not self.resumable or resume is None or not os.path.exists(self._part_path) or os.path.getsize(self._part_path) < resume[0]:
+            return False
+        self._file = open(self._part_path, 'r+', encoding='utf-8')
+        self._file.truncate(resume[0])
+        self._file.seek(resume[0])
+        self.count = resume[1]
+        return True
+
+    def _write_start(self):
+        self._file.write('[')
+
+    def write_page(self, json_r):
+        """ write the json of one page (a dict is written as one item, a list is written as its item)"""
+        if self.projection is not None:
+            json_r = self.projection(json_r)
+        if type(json_r) == dict:
+            self.write_item(json_r)
+        else:
+            for item in json_r:
+                self.write_item(item)
+
+    def write_item(self, item):
+        if self.pretty_json:
+            self._file.write((',\n' if self.count else '\n') + textwrap.indent(json.dumps(item, indent=4), '    '))
+        else:
+            self._file.write((', ' if self.count else '') + self.codec.dumps(item))
+        self.count = self.count+1
+
+    def write_raw_page(self, body):
+        """ write the raw json body of one page without parsing it (the item of a json array body are spliced into the file)
+
+        Args:
+            body (bytes): body of the response
+
+        Returns:
+            boolean: False if the page is not written because the writer need the parsed page (pretty json or projection) or the body is not a json array or object
+        """
+        body = body.strip()
+        if self.pretty_json or self.projection is not None or body[:1] not in (b'[', b'{'):
+            return False
+        if body[:1] == b'[':
+            body = body[1:-1].strip()
+            if not body:
+                return True
+        self._file.write((', ' if self.count else '') + body.decode('utf-8'))
+        self.count = self.count+1
+        return True
+
+    def _write_end(self):
+        self._file.write('\n]' if self.pretty_json and self.count else ']')
+
+    def tell(self):
+        """ flush the written item and return the size of the part file"""
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        """ finish the file and move it to save_path"""
+        self._write_end()
+        self._file.close()
+        os.replace(self._part_path, self.save_path)
+
+    def abort(self, keep_part=False):
+        """ discard the file that is not completely written
+
+        Args:
+            keep_part (boolean, optional): keep the part file so it can be resumed later. Defaults to False.
+        """
+        self._file.close()
+        if not keep_part and os.path.exists(self._part_path):
+            os.remove(self._part_path)
+
+
+class JsonLinesWriter(JsonArrayWriter):
+    """Write the item of each page to a JSON Lines file (one item per line) as soon as the page arrive
+
+    Args:
+        save_path (string): save file name with path
+        pretty_json (boolean, optional): not used, JSON Lines always has one item per line. Defaults to True.
+        resume (tuple, optional): (offset, count) continue writing the part file after its first offset byte that contain count item. Defaults to None.
+        compression (string, optional): None, 'gzip' or 'zstd' (require zstandard package), the compressed file cannot be resumed. Defaults to None.
+        codec (JsonCodec, optional): codec used to encode the item. Defaults to None (json module).
+        projection (FieldProjection, optional): projection applied to the item of the page written by write_page. Defaults to None.
+    """
+
+    def _write_start(self):
+        pass
+
+    def write_item(self, item):
+        self._file.write(self.codec.dumps(item) + '\n')
+        self.count = self.count+1
+
+    def write_raw_page(self, body):
+        """ always return False since the item of the page has to be parsed to write one item per line"""
+        return False
+
+    def _write_end(self):
+        pass
+
+
+def open_text(path, mode, compression=None):
+    """ open the text file that is compressed with compression
+
+    Args:
+        path (string): path of the file
+        mode (string): 'r', 'w' or 'a'
+        compression (string, optional): None, 'gzip' or 'zstd'. Defaults to None.
+
+    Raises:
+        ImportError: Raised when compression is 'zstd' but zstandard package is not installed
+    """
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstandard package is required for zstd output, please install it with 'pip install zstandard'")
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+# file extension, writer, compression and shard store of each output format
+OUTPUT_FORMAT = {
+    'json': ('.json', JsonArrayWriter, None, None),
+    'jsonl': ('.jsonl', JsonLinesWriter, None, None),
+    'json.gz': ('.json.gz', JsonArrayWriter, 'gzip', None),
+    'jsonl.gz': ('.jsonl.gz', JsonLinesWriter, 'gzip', None),
+    'json.zst': ('.json.zst', JsonArrayWriter, 'zstd', None),
+    'jsonl.zst': ('.jsonl.zst', JsonLinesWriter, 'zstd', None),
+    'jsonl_shard': ('.jsonl', JsonLinesWriter, None, 'shard'),
+    'archive': ('.json.gz', JsonArrayWriter, 'gzip', 'archive'),
+}
+
+
+def open_writer(save_path, output_format='json', pretty_json=True, resume=None, codec=None, projection=None):
+    """ return the writer of the output format
+
+    Args:
+        save_path (string): save file name with path
+        output_format (string, optional): one of OUTPUT_FORMAT. Defaults to 'json'.
+        pretty_json (boolean, optional): make to output json file easier to read. Defaults to True.
+        resume (tuple, optional): (offset, count) continue writing the part file. Defaults to None.
+        codec (JsonCodec, optional): codec used to encode the compact item. Defaults to None (json module).
+        projection (FieldProjection, optional): projection applied to the item of the page. Defaults to None.
+    """
+    _, writer_class, compression, _ = OUTPUT_FORMAT[output_format]
+    return writer_class(save_path, pretty_json, resume, compression, codec, projection)
@@ -0,0 +1,62 @@
+import json
+import pytest
+import requests
+import src.torlib.crawler.github_crawler as gc
+from benchmark.mock_github_server import MockGithubServer
+from benchmark.github_crawler_benchmark import run_benchmark
+
+
+def test_mock_github_server_pagination():
+    with MockGithubServer(pages=3, items_per_page=2, item_size=5) as server:
+        r = requests.get(server.api_url(0) + '?per_page=100&page=1', headers={'Authorization': 'token a'})
+        assert r.json() == [{'id': 0, 'url': '/repos/0/items/0', 'payload': 'xxxxx'}, {'id': 1, 'url': '/repos/0/items/1', 'payload': 'xxxxx'}]
+        assert gc._last_page(r.headers) == 3
+        assert r.headers['X-RateLimit-Remaining'] == '4999'
+        r = requests.get(server.api_url(0) + '?per_page=100&page=3', headers={'If-None-Match': r.headers['ETag']})
+        assert 'Link' not in r.headers
+        assert requests.get(server.api_url(0) + '?per_page=100&page=1', headers={'If-None-Match': r.headers['ETag']}).status_code == 200
+        assert requests.get(server.api_url(0) + '?per_page=100&page=3', headers={'If-None-Match': r.headers['ETag']}).status_code == 304
+    assert server.stop()['requests'] == 4
+
+
+def test_mock_github_server_rate_limit_and_failure():
+    with MockGithubServer(rate_limit=1, failure_rate=1.0) as server:
+        assert requests.get(server.api_url(0), headers={'Authorization': 'token a'}).status_code == 502
+        r = requests.get(server.api_url(0), headers={'Authorization': 'token a'})
+        assert r.status_code == 403
+        assert gc._is_rate_limited(r)
+    stats = server.stop()
+    assert (stats['failures'], stats['rate_limited']) == (1, 1)
+
+
+def test_github_crawler_multipage_mock_server(tmp_path):
+    with MockGithubServer(pages=2, items_per_page=2) as server:
+        gc.github_crawler_multipage(['test1', 'test2'], [server.api_url(1), server.api_url(2)], ['token'], pc=2,
+                                    log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path))
+    with open(tmp_path / 'test2.json', 'r') as infile:
+        assert [item['url'] for item in json.load(infile)] == [f'/repos/2/items/{i}' for i in range(4)]
+
+
+@pytest.mark.parametrize('mode', ['process', 'async'])
+def test_run_benchmark(mode):
+    result = run_benchmark(urls=4, pages=2, items_per_page=2, pc=2, mode=mode, concurrency=4)
+    assert result['requests'] == 8
+    assert result['pages_per_s'] == pytest.approx(result['urls_per_s'] * 2)
+    assert result['latency_p99'] >= result['latency_p50'] > 0
+    assert result['peak_rss_mb'] > 0
+
+
+@pytest.mark.parametrize('schedule', ['history', 'probe'])
+def test_run_benchmark_schedule(schedule):
+    result = run_benchmark(urls=4, pages=1, items_per_page=2, pc=2, concurrency=4, large_pages=3, schedule=schedule)
+    # the warm-up crawl of 'history' and the HEAD request of 'probe' are counted
+    assert result['requests'] == (12 if schedule == 'history' else 10)
+    assert result['pages_per_s'] == pytest.approx(result['urls_per_s'] * 6 / 4)
+
+
+def test_mock_github_server_plan_crawl():
+    from src.torlib.crawler.quota import plan_crawl
+    with MockGithubServer(pages={'/repos/0/items': 3, '/repos/1/items': 5}, rate_limit=100) as server:
+        plan = plan_crawl(['a', 'b'], [server.api_url(0), server.api_url(1)], ['token'], concurrency=2)
+    # the rate limit request does not use the quota and the HEAD request of the probe does
+    assert (plan.requests, plan.probed_urls, plan.remaining, plan.fits_quota) == (8, 2, 98, True)
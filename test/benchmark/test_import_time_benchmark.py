@@ -0,0 +1,20 @@
+import sys
+import pytest
+from benchmark.import_time_benchmark import measure_import, main, FORBIDDEN
+
+# python -X importtime is only in python 3.7+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7), reason='python -X importtime require python 3.7+')
+
+
+def test_import_time_budget():
+    ms, imported = measure_import('torlib.crawler.github_crawler')
+    assert not {name.split('.')[0] for name in imported} & set(FORBIDDEN)
+    # about 15 ms on a laptop, the budget leave room for slow ci machine
+    assert ms < 150
+    ms, imported = measure_import('torlib', runs=1)
+    assert imported == {'torlib'}
+
+
+def test_import_time_benchmark_main():
+    assert main(['--runs', '1', '--budget-ms', '1000', 'torlib']) == 0
+    assert main(['--runs', '1', '--budget-ms', '1000', 'torlib.crawler.async_crawler']) == 1
@@ -0,0 +1,146 @@
+import pytest
+import json
+import os
+import src.torlib.crawler.github_crawler as gc
+import src.torlib.crawler.async_crawler as ac
+from src.torlib.crawler.github_crawler import NoTokenError, ModeNotSupportedError
+from benchmark.mock_github_server import MockGithubServer
+import responses
+
+
+def test_github_crawler_multipage_mode_not_supported():
+    with pytest.raises(ModeNotSupportedError):
+        gc.github_crawler_multipage(['1'], ['1'], ['token'], mode='thread')
+
+
+def test_github_crawler_multipage_async_notoken():
+    with pytest.raises(NoTokenError):
+        ac.run_coroutine(ac.github_crawler_multipage_async(['1'], ['1'], []))
+
+
+def test_github_crawler_multipage_async_success(tmp_path):
+    savename = ['test1', 'test2', 'test3']
+    url = ['http://test_github/api/1',
+           'http://test_github/api/2', 'http://test_github/api/3']
+    log_file = str(tmp_path / 'log.txt')
+    gc.github_crawler_multipage(savename, url, ['token'], log_file=log_file, output_dir=str(tmp_path),
+                                for_test=True, mode='async', concurrency=2)
+    with open(log_file, 'r') as outfile:
+        assert json.load(outfile) == []
+    for i in range(1, 4):
+        with open(tmp_path / f'test{i}.json', 'r') as outfile:
+            assert json.load(outfile) == [{"test": f"test{i}"}]
+
+
+def test_github_crawler_multipage_async_fail(tmp_path):
+    savename = ['test1', 'test2', 'test3']
+    url = ['test_github/api/1', 'test_github/api/2', 'test_github/api/3']
+    log_file = str(tmp_path / 'log.txt')
+    gc.github_crawler_multipage(savename, url, ['token'], log_file=log_file, output_dir=str(tmp_path),
+                                for_test=True, mode='async')
+    with open(log_file, 'r') as outfile:
+        log = json.load(outfile)
+    assert [u for u, _ in log] == url
+    assert not os.path.exists(tmp_path / 'test1.json')
+
+
+@responses.activate
+def test_github_crawler_multipage_async_multipage(tmp_path):
+    link = '<http://test_github/api/4?per_page=100&page=2>; rel="next", <http://test_github/api/4?per_page=100&page=3>; rel="last"'
+    responses.add(responses.GET, 'http://test_github/api/4?per_page=100&page=1',
+                  json=[{"id": 1}, {"id": 2}],
+                  headers={'X-RateLimit-Remaining': '100', 'link': link})
+    responses.add(responses.GET, 'http://test_github/api/4?per_page=100&page=2',
+                  json=[{"id": 3}],
+                  headers={'X-RateLimit-Remaining': '100', 'link': link})
+    responses.add(responses.GET, 'http://test_github/api/4?per_page=100&page=3',
+                  json=[{"id": 4}],
+                  headers={'X-RateLimit-Remaining': '100'})
+    log_file = str(tmp_path / 'log.txt')
+    ac.run_coroutine(ac.github_crawler_multipage_async(['test4'], ['http://test_github/api/4'], ['token'],
+                                                       log_file=log_file, output_dir=str(tmp_path), pretty_json=False))
+    with open(tmp_path / 'test4.json', 'r') as outfile:
+        assert outfile.read() == '[{"id": 1}, {"id": 2}, {"id": 3}, {"id": 4}]'
+
+
+def test_iter_github_pages(tmp_path):
+    crawl_input = ((f'test{i}', f'http://test_github/api/{i}') for i in (1, 2, 3, 4))
+    pages = gc.iter_github_pages(crawl_input, ['token'], retry=0, for_test=True, concurrency=2, log_file=str(tmp_path / 'log.txt'))
+    assert sorted(pages) == [(f'test{i}', 1, {"test": f"test{i}"}) for i in (1, 2, 3)]
+    # the url that cannot be crawled is in the log file
+    with open(tmp_path / 'log.txt', 'r') as outfile:
+        assert [url for url, _ in json.load(outfile)] == ['http://test_github/api/4']
+
+
+def test_iter_github_pages_inputnotstring():
+    with pytest.raises(gc.InputNotStringError):
+        list(gc.iter_github_pages([('test1', 1)], ['token'], for_test=True))
+
+
+@responses.activate
+def test_iter_github_pages_async_multipage():
+    link = '<http://test_github/api/1?per_page=100&page=3>; rel="last"'
+    for page in (1, 2, 3):
+        responses.add(responses.GET, f'http://test_github/api/1?per_page=100&page={page}',
+                      json=[{"page": page}], headers={'X-RateLimit-Remaining': '100', 'link': link})
+
+    async def crawl_input():
+        yield 'test1', 'http://test_github/api/1'
+
+    async def crawl():
+        return [page async for page in ac.iter_github_pages_async(crawl_input(), ['token'], concurrency=3)]
+
+    # the page of the same url are yielded in page order
+    assert ac.run_coroutine(crawl()) == [('test1', page, [{"page": page}]) for page in (1, 2, 3)]
+
+
+def test_iter_github_pages_stop_early():
+    with MockGithubServer(pages=50, items_per_page=1) as server:
+        pages = gc.iter_github_pages(((f'test{i}', server.api_url(i)) for i in range(1000)), ['token'], concurrency=4)
+        assert next(pages)[1] == 1
+        pages.close()
+    # the input is read lazily so only the url in progress are requested
+    assert server.stop()['requests'] < 100
+
+
+def test_iter_pages_async_shared_window():
+    import asyncio
+
+    class Response:
+        def __init__(self, page):
+            self.page = page
+            self.headers = {'link': '<http://x?per_page=100&page=20>; rel="last"'}
+
+    class Fetcher:
+        concurrency = 4
+
+        def __init__(self):
+            self.window = asyncio.Semaphore(self.concurrency)
+            self.fetched = 0
+            self.written = 0
+            self.buffered = 0
+
+        async def get(self, url, page):
+            await asyncio.sleep(0.001)
+            self.fetched += 1
+            self.buffered = max(self.buffered, self.fetched - self.written)
+            return Response(page)
+
+    async def crawl(fetcher, url):
+        pages = []
+        async for page, r in ac._iter_pages_async(url, fetcher):
+            # writing the page is slower than fetching it
+            await asyncio.sleep(0.002)
+            fetcher.written += 1
+            pages.append(page)
+        return pages
+
+    async def main():
+        fetcher = Fetcher()
+        result = await asyncio.gather(*[crawl(fetcher, f'http://x/{i}') for i in range(8)])
+        return fetcher, result
+
+    fetcher, result = ac.run_coroutine(main())
+    assert result == [list(range(1, 21))] * 8
+    # at most concurrency page fetched ahead for every url together, plus the first page of each url
+    assert fetcher.buffered <= Fetcher.concurrency + 8
@@ -0,0 +1,61 @@
+import json
+import os
+import src.torlib.crawler.async_crawler as ac
+from src.torlib.crawler.checkpoint import CheckpointManifest
+from src.torlib.crawler.retry import RetryPolicy
+import responses
+
+
+def test_checkpoint_manifest_load(tmp_path):
+    manifest = CheckpointManifest(str(tmp_path))
+    manifest.commit_page(str(tmp_path / 'a.json'), 1, 10, 2)
+    manifest.commit_page(str(tmp_path / 'a.json'), 2, 20, 4)
+    manifest.commit_page(str(tmp_path / 'b.json'), 1, 10, 2)
+    manifest.commit_done(str(tmp_path / 'b.json'))
+    manifest.close()
+    # line written partially when the crawler is killed
+    with open(manifest.path, 'a') as outfile:
+        outfile.write('{"path": "c.js')
+    # the path is relative to output_dir so the output_dir can be moved
+    os.mkdir(tmp_path / 'moved')
+    os.rename(manifest.path, tmp_path / 'moved' / '.github_crawler_checkpoint')
+    manifest = CheckpointManifest(str(tmp_path / 'moved'))
+    manifest.load()
+    assert manifest.resume_state(str(tmp_path / 'moved' / 'a.json')) == (2, 20, 4)
+    assert manifest.is_done(str(tmp_path / 'moved' / 'b.json'))
+    assert manifest.resume_state(str(tmp_path / 'moved' / 'b.json')) is None
+    assert not manifest.is_done(str(tmp_path / 'moved' / 'c.json'))
+    # the log is compacted to the latest progress of each url
+    with open(manifest.path, 'r') as infile:
+        assert len(infile.readlines()) == 2
+
+
+def _crawl(tmp_path):
+    ac.run_coroutine(ac.github_crawler_multipage_async(['test1'], ['http://test_github/api/1'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                                       output_dir=str(tmp_path), concurrency=1, checkpoint=True,
+                                                       retry_policy=RetryPolicy(max_retry=0)))
+
+
+@responses.activate
+def test_github_crawler_multipage_async_checkpoint_resume(tmp_path):
+    link = '<http://test_github/api/1?per_page=100&page=3>; rel="last"'
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1',
+                  json=[{"id": 1}, {"id": 2}], headers={'X-RateLimit-Remaining': '100', 'link': link})
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=2',
+                  json=[{"id": 3}], headers={'X-RateLimit-Remaining': '100', 'link': link})
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=3', status=502)
+    _crawl(tmp_path)
+    assert not os.path.exists(tmp_path / 'test1.json')
+    assert os.path.exists(tmp_path / 'test1.json.part')
+    # crawl again, only page 3 is requested
+    responses.calls.reset()
+    responses.replace(responses.GET, 'http://test_github/api/1?per_page=100&page=3',
+                      json=[{"id": 4}], headers={'X-RateLimit-Remaining': '100'})
+    _crawl(tmp_path)
+    assert [c.request.url[-1] for c in responses.calls] == ['3']
+    with open(tmp_path / 'test1.json', 'r') as outfile:
+        assert json.load(outfile) == [{"id": 1}, {"id": 2}, {"id": 3}, {"id": 4}]
+    # crawl again, the url is completed so nothing is requested
+    responses.calls.reset()
+    _crawl(tmp_path)
+    assert len(responses.calls) == 0
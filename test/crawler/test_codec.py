@@ -0,0 +1,63 @@
+import json
+import pickle
+import pytest
+import responses
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.codec import get_codec, JsonCodec, JsonCodecNotSupportedError
+from src.torlib.crawler.writer import JsonArrayWriter, JsonLinesWriter
+
+
+def test_get_codec():
+    assert get_codec('json').name == 'json'
+    codec = JsonCodec()
+    assert get_codec(codec) is codec
+    with pytest.raises(JsonCodecNotSupportedError) as e:
+        get_codec('simdjson')
+    assert str(e.value) == "json_codec=simdjson -> json_codec must be 'auto', 'json' or 'orjson'"
+
+
+def test_orjson_codec():
+    pytest.importorskip('orjson')
+    codec = get_codec('auto')
+    assert codec.name == 'orjson'
+    assert codec.loads(b'{"a": [1, "\\u00e9"]}') == {'a': [1, 'é']}
+    assert codec.dumps({'a': [1, 'é']}) == '{"a":[1,"é"]}'
+    # the integer larger than 64 bit fall back to the json module
+    assert codec.loads(b'[123456789012345678901234567890, -9223372036854775809]') == [123456789012345678901234567890, -9223372036854775809]
+    assert codec.dumps([123456789012345678901234567890]) == '[123456789012345678901234567890]'
+    assert pickle.loads(pickle.dumps(codec)).dumps([1]) == '[1]'
+
+
+@pytest.mark.parametrize('bodies', [[b'[{"a": 1}, {"b": 2}]', b' [ ] ', b'[3]'], [b'{"c": {}}'], [b'[]']])
+def test_write_raw_page(tmp_path, bodies):
+    save_path = str(tmp_path / 'out.json')
+    writer = JsonArrayWriter(save_path, pretty_json=False)
+    expected = []
+    for body in bodies:
+        assert writer.write_raw_page(body)
+        page = json.loads(body)
+        expected.extend(page if type(page) == list else [page])
+    writer.close()
+    with open(save_path, 'r') as infile:
+        assert json.load(infile) == expected
+
+
+def test_write_raw_page_need_parsing(tmp_path):
+    assert not JsonArrayWriter(str(tmp_path / 'a.json'), pretty_json=True).write_raw_page(b'[1]')
+    assert not JsonArrayWriter(str(tmp_path / 'b.json'), pretty_json=False).write_raw_page(b'1')
+    assert not JsonLinesWriter(str(tmp_path / 'c.jsonl')).write_raw_page(b'[1]')
+
+
+@pytest.mark.parametrize('mode', ['process', 'async'])
+@pytest.mark.parametrize('json_codec', ['json', 'auto'])
+@responses.activate
+def test_github_crawler_multipage_compact(tmp_path, mode, json_codec):
+    link = '<http://test_github/api/1?per_page=100&page=3>; rel="last"'
+    pages = [[{"id": 1, "name": "é"}, {"id": 2}], [], [{"id": 3}]]
+    for i, page in enumerate(pages):
+        responses.add(responses.GET, f'http://test_github/api/1?per_page=100&page={i+1}',
+                      json=page, headers={'X-RateLimit-Remaining': '100', 'link': link})
+    gc.github_crawler_multipage(['test1'], ['http://test_github/api/1'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                output_dir=str(tmp_path), mode=mode, pretty_json=False, json_codec=json_codec)
+    with open(tmp_path / 'test1.json', 'r', encoding='utf-8') as infile:
+        assert json.load(infile) == [item for page in pages for item in page]
@@ -0,0 +1,124 @@
+import asyncio
+import time
+import requests
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.concurrency import AdaptiveConcurrency
+from src.torlib.crawler.async_crawler import run_coroutine
+from src.torlib.crawler.metrics import CrawlMetrics
+from benchmark.mock_github_server import MockGithubServer
+
+
+def _response(status_code=200, headers=None):
+    r = requests.Response()
+    r.status_code = status_code
+    r.headers.update(headers or {})
+    return r
+
+
+def test_adaptive_concurrency_acquire():
+    controller = AdaptiveConcurrency(initial=2)
+    assert controller.try_acquire() and controller.try_acquire()
+    assert not controller.try_acquire()
+    controller.release()
+    assert controller.in_flight == 1
+    assert controller.try_acquire()
+
+
+def test_adaptive_concurrency_acquire_async():
+    controller = AdaptiveConcurrency(initial=1)
+    attempts = []
+    try_acquire = controller._try_acquire
+    controller._try_acquire = lambda: attempts.append(1) or try_acquire()
+
+    async def wait_for_slot():
+        controller.try_acquire()
+        waiting = asyncio.ensure_future(controller.acquire_async())
+        await asyncio.sleep(0.05)
+        # the waiting coroutine does not poll the slot while it is taken
+        assert len(attempts) <= 2 and not waiting.done()
+        start = time.perf_counter()
+        controller.release()
+        await waiting
+        return time.perf_counter() - start
+
+    # the release wake the coroutine up before the timeout
+    assert run_coroutine(wait_for_slot()) < 0.05
+    assert controller.in_flight == 1 and not controller._waiters
+
+
+def test_adaptive_concurrency_increase():
+    controller = AdaptiveConcurrency(initial=2, max_limit=4, latency_tolerance=None)
+    for _ in range(3):
+        controller.acquire()
+        controller.release(_response(), None, 0.1)
+    # about one more slot per limit successful response
+    assert controller.limit == 3
+    for _ in range(20):
+        controller.acquire()
+        controller.release(_response(), None, 0.1)
+    assert controller.limit == 4
+    # the limit does not grow beyond the remaining rate limit
+    controller = AdaptiveConcurrency(initial=5, latency_tolerance=None)
+    for _ in range(20):
+        controller.acquire()
+        controller.release(_response(headers={'X-RateLimit-Remaining': '3'}), None, 0.1)
+    assert controller.limit == 5
+
+
+def test_adaptive_concurrency_decrease():
+    controller = AdaptiveConcurrency(initial=16, latency_tolerance=None)
+    controller.release(_response(502), None, 0.0)
+    assert controller.limit == 8
+    controller.release(None, requests.ConnectionError(), 0.0)
+    assert controller.limit == 4
+    controller.release(_response(403, {'Retry-After': '60'}), None, 0.0)
+    assert controller.limit == 2
+    controller.release(_response(429), None, 0.0)
+    controller.release(_response(429), None, 0.0)
+    assert controller.limit == 1
+    # the primary rate limit is handled by the token scheduler
+    controller = AdaptiveConcurrency(initial=16, latency_tolerance=None)
+    controller.release(_response(403, {'X-RateLimit-Remaining': '0'}), None, 0.0)
+    assert controller.limit == 16
+
+
+def test_adaptive_concurrency_decrease_once_per_latency():
+    controller = AdaptiveConcurrency(initial=16, latency_tolerance=None)
+    controller.release(_response(), None, 60.0)
+    # a burst of error within one round trip only halve the limit once
+    for _ in range(5):
+        controller.release(_response(503), None, 60.0)
+    assert controller.limit == 8
+
+
+def test_adaptive_concurrency_latency():
+    controller = AdaptiveConcurrency(initial=16, latency_tolerance=2.0, smoothing=1.0)
+    controller.release(_response(), None, 0.001)
+    controller.release(_response(), None, 0.001)
+    limit = controller.limit
+    controller.release(_response(), None, 0.01)
+    assert controller.limit == limit // 2
+
+
+def test_github_crawler_multipage_concurrency_controller(tmp_path):
+    controller = AdaptiveConcurrency(initial=1, latency_tolerance=None)
+    metrics = CrawlMetrics()
+    with MockGithubServer(pages=5, item_size=3) as server:
+        gc.github_crawler_multipage([f'test{i}' for i in range(4)], [server.api_url(i) for i in range(4)], ['token'], pc=2, concurrency=8,
+                                    log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path), concurrency_controller=controller, metrics=metrics)
+    assert len(list(tmp_path.glob('test*.json'))) == 4
+    assert controller.max_limit == 8
+    assert 1 < controller.limit <= 8
+    assert controller.in_flight == 0
+    assert metrics.snapshot()['concurrency']['limit'] == controller.limit
+    assert f'github_crawler_concurrency_limit {controller.limit}' in metrics.to_prometheus()
+
+
+def test_github_crawler_multipage_async_concurrency_controller(tmp_path):
+    controller = AdaptiveConcurrency(initial=2, latency_tolerance=None)
+    with MockGithubServer(pages=3, item_size=3, failure_rate=0.3, seed=1) as server:
+        gc.github_crawler_multipage([f'test{i}' for i in range(10)], [server.api_url(i) for i in range(10)], ['token'], mode='async', concurrency=4,
+                                    retry=10, log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path), concurrency_controller=controller)
+    assert len(list(tmp_path.glob('test*.json'))) == 10
+    assert controller.in_flight == 0
+    assert 1 <= controller.limit <= 4
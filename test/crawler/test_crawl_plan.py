@@ -0,0 +1,113 @@
+import json
+import os
+import pytest
+import responses
+from src.torlib.crawler.crawl_plan import github_crawler_plan, CrawlLevel, PlanNotValidError
+from src.torlib.crawler.github_crawler import OutputFormatNotSupportedError
+from src.torlib.crawler.metrics import CrawlMetrics
+
+API = 'http://test_github/api/repos/octo/cat'
+
+
+def _pull(number):
+    return {"id": 100 + number, "number": number, "url": f'{API}/pulls/{number}', "commits_url": f'{API}/pulls/{number}/commits{{/sha}}'}
+
+
+def _add_api():
+    link = f'<{API}/pulls?per_page=100&page=2>; rel="last"'
+    responses.add(responses.GET, f'{API}/pulls?per_page=100&page=1', json=[_pull(1), _pull(2)], headers={'X-RateLimit-Remaining': '100', 'link': link})
+    # the pull request without url has no child
+    responses.add(responses.GET, f'{API}/pulls?per_page=100&page=2', json=[_pull(3), {"id": 4}], headers={'X-RateLimit-Remaining': '100', 'link': link})
+    for number in range(1, 4):
+        responses.add(responses.GET, f'{API}/pulls/{number}/commits?per_page=100&page=1',
+                      json=[{"sha": f"{number}a", "commit": {"message": "fix"}}, {"sha": f"{number}b", "commit": {"message": "test"}}],
+                      headers={'X-RateLimit-Remaining': '100'})
+        responses.add(responses.GET, f'{API}/pulls/{number}/reviews?per_page=100&page=1',
+                      json=[{"id": number * 10, "state": "APPROVED"}], headers={'X-RateLimit-Remaining': '100'})
+        for sha in ('a', 'b'):
+            responses.add(responses.GET, f'{API}/commits/{number}{sha}?per_page=100&page=1',
+                          json={"sha": f"{number}{sha}", "files": []}, headers={'X-RateLimit-Remaining': '100'})
+
+
+def _plan():
+    commit = CrawlLevel('commit', API + '/commits/{sha}', savename='{sha}')
+    return [CrawlLevel('commits', '{commits_url}', savename='{parent}_{number}', children=[commit], projection=['sha']),
+            CrawlLevel('reviews', '{url}/reviews')]
+
+
+def _read(path):
+    with open(path, 'r') as infile:
+        return json.load(infile)
+
+
+@responses.activate
+def test_github_crawler_plan(tmp_path):
+    _add_api()
+    metrics = CrawlMetrics()
+    github_crawler_plan(['pulls'], [f'{API}/pulls'], ['token'], _plan(), concurrency=4, log_file=str(tmp_path / 'log.txt'),
+                        output_dir=str(tmp_path), metrics=metrics)
+    assert len(_read(tmp_path / 'pulls.json')) == 4
+    assert _read(tmp_path / 'commits' / 'pulls_2.json') == [{'sha': '2a'}, {'sha': '2b'}]
+    assert _read(tmp_path / 'reviews' / 'pulls_103.json') == [{'id': 30, 'state': 'APPROVED'}]
+    assert _read(tmp_path / 'commit' / '3b.json') == [{'sha': '3b', 'files': []}]
+    # 2 pulls page, 3 commits, 3 reviews and 6 commit
+    assert len(responses.calls) == 14
+    assert (metrics.urls, metrics.failed_urls) == (13, 0)
+    assert _read(tmp_path / 'log.txt') == []
+
+
+@responses.activate
+def test_github_crawler_plan_again(tmp_path):
+    _add_api()
+    github_crawler_plan(['pulls'], [f'{API}/pulls'], ['token'], _plan(), log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path))
+    os.remove(tmp_path / 'commit' / '1a.json')
+    responses.calls.reset()
+    # the child url is derived from the output file of the previous run and only the missing file is requested
+    github_crawler_plan(['pulls'], [f'{API}/pulls'], ['token'], _plan(), log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path))
+    assert [call.request.url for call in responses.calls] == [f'{API}/commits/1a?per_page=100&page=1']
+
+
+@responses.activate
+def test_github_crawler_plan_again_projection(tmp_path):
+    _add_api()
+    # the projection drop the field of the child url of the pull request
+    github_crawler_plan(['pulls'], [f'{API}/pulls'], ['token'], _plan(), log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path), projection=['number'])
+    assert _read(tmp_path / 'pulls.json') == [{'number': 1}, {'number': 2}, {'number': 3}, {}]
+    assert _read(tmp_path / 'pulls.json.children')['reviews'][0] == ['pulls_101', f'{API}/pulls/1/reviews']
+    os.remove(tmp_path / 'commits' / 'pulls_1.json')
+    responses.calls.reset()
+    # the child url is read from the children file and only the missing file is requested
+    github_crawler_plan(['pulls'], [f'{API}/pulls'], ['token'], _plan(), log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path), projection=['number'])
+    assert [call.request.url for call in responses.calls] == [f'{API}/pulls/1/commits?per_page=100&page=1']
+    assert _read(tmp_path / 'log.txt') == []
+
+
+@responses.activate
+def test_github_crawler_plan_fail(tmp_path):
+    responses.add(responses.GET, f'{API}/pulls?per_page=100&page=1', json=[_pull(1)], headers={'X-RateLimit-Remaining': '100'})
+    responses.add(responses.GET, f'{API}/pulls/1/reviews?per_page=100&page=1', status=404)
+    github_crawler_plan(['pulls'], [f'{API}/pulls'], ['token'], [CrawlLevel('reviews', '{url}/reviews')], retry=0,
+                        log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path))
+    assert [url for url, _ in _read(tmp_path / 'log.txt')] == [f'{API}/pulls/1/reviews']
+
+
+def test_crawl_level():
+    level = CrawlLevel('comments', lambda item: item.get('comments_url'))
+    assert level.child('pulls', {'comments_url': 'http://x/comments{/number}', 'number': 1, 'node_id': 'a'}) == ('pulls_a', 'http://x/comments')
+    assert level.child('pulls', {'number': 1}) is None
+    assert level.child('pulls', 'not a dict') is None
+    assert CrawlLevel('user', '{user[url]}').child('pulls', {'user': None}, 5) is None
+    assert CrawlLevel('user', '{user[url]}').child('pulls', {'user': {'url': 'http://x/u'}}, 5) == ('pulls_5', 'http://x/u')
+
+
+def test_crawl_level_not_valid(tmp_path):
+    with pytest.raises(PlanNotValidError):
+        CrawlLevel('', '{url}')
+    with pytest.raises(PlanNotValidError):
+        CrawlLevel('a', 1)
+    with pytest.raises(PlanNotValidError):
+        CrawlLevel('a', '{url}', children=['b'])
+    with pytest.raises(PlanNotValidError):
+        github_crawler_plan(['pulls'], [f'{API}/pulls'], ['token'], ['b'])
+    with pytest.raises(OutputFormatNotSupportedError):
+        github_crawler_plan(['pulls'], [f'{API}/pulls'], ['token'], [], output_format='jsonl_shard')
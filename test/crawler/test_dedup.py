@@ -0,0 +1,62 @@
+import json
+import os
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.dedup import normalize_url, dedup_crawl_list
+from src.torlib.crawler.metrics import CrawlMetrics
+from src.torlib.crawler.output_store import read_output
+from benchmark.mock_github_server import MockGithubServer
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://API.github.com:443/repos/Octo/Cat/') == 'https://api.github.com/repos/Octo/Cat'
+    assert normalize_url('http://localhost:8080/a?b=2&a=1#top') == 'http://localhost:8080/a?a=1&b=2'
+    assert normalize_url('https://api.github.com') == normalize_url('https://api.github.com/') == 'https://api.github.com'
+
+
+def test_dedup_crawl_list(tmp_path):
+    (tmp_path / 'd.json').write_text('[]')
+    list_to_crawl = [(str(tmp_path / f'{name}.json'), url, 'json', True, None)
+                     for name, url in [('a', 'https://x/1'), ('b', 'https://x/2'), ('c', 'https://X/1/'), ('d', 'https://x/1')]]
+    unique, aliases = dedup_crawl_list(list_to_crawl)
+    # the existing output file is processed by itself
+    assert unique == [list_to_crawl[0], list_to_crawl[1], list_to_crawl[3]]
+    assert aliases == {list_to_crawl[0][0]: [list_to_crawl[2]]}
+
+
+def test_github_crawler_multipage_dedup(tmp_path):
+    metrics = CrawlMetrics()
+    with MockGithubServer(pages={'/repos/0/items': 3, '/repos/1/items': 2}, item_size=3) as server:
+        url = [server.api_url(0), server.api_url(1), server.api_url(0) + '/', server.api_url(0), 'http://127.0.0.1:1/x', 'http://127.0.0.1:1/y',
+               'http://127.0.0.1:1/x/']
+        gc.github_crawler_multipage([f'test{i}' for i in range(7)], url, ['token'], pc=2, retry=0, log_file=str(tmp_path / 'log.txt'),
+                                    output_dir=str(tmp_path), metrics=metrics, dedup=True)
+    assert server.stop()['requests'] == 5
+    assert os.stat(tmp_path / 'test0.json').st_ino == os.stat(tmp_path / 'test2.json').st_ino == os.stat(tmp_path / 'test3.json').st_ino
+    with open(tmp_path / 'test3.json', 'r') as infile:
+        assert len(json.load(infile)) == 300
+    assert (metrics.deduplicated_urls, metrics.saved_requests) == (3, 6)
+    # the duplicate of the url that cannot be crawled get the same error and the log keep the input order
+    with open(tmp_path / 'log.txt', 'r') as infile:
+        assert [u for u, _ in json.load(infile)] == [url[4], url[5], url[6]]
+
+
+def test_github_crawler_multipage_no_dedup_by_default(tmp_path):
+    with MockGithubServer(pages=2, item_size=3) as server:
+        gc.github_crawler_multipage(['a', 'b'], [server.api_url(0), server.api_url(0)], ['token'], log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path))
+    assert server.stop()['requests'] == 4
+    assert os.stat(tmp_path / 'a.json').st_ino != os.stat(tmp_path / 'b.json').st_ino
+
+
+def test_github_crawler_multipage_dedup_output_store(tmp_path):
+    with MockGithubServer(pages=2, item_size=3) as server:
+        url = [server.api_url(0), server.api_url(1), server.api_url(0)]
+        gc.github_crawler_multipage(['a', 'b', 'c'], url, ['token'], mode='async', log_file=str(tmp_path / 'log.txt'),
+                                    output_dir=str(tmp_path), output_format='jsonl_shard', checkpoint=True, dedup=True)
+    assert server.stop()['requests'] == 4
+    assert read_output(str(tmp_path), 'c', 'jsonl_shard') == read_output(str(tmp_path), 'a', 'jsonl_shard')
+    assert len(read_output(str(tmp_path), 'c', 'jsonl_shard')) == 200
+    # the duplicate is done in the checkpoint and the store so nothing is requested again
+    with MockGithubServer(pages=2, item_size=3) as server:
+        gc.github_crawler_multipage(['a', 'b', 'c'], url, ['token'], mode='async', log_file=str(tmp_path / 'log.txt'),
+                                    output_dir=str(tmp_path), output_format='jsonl_shard', checkpoint=True, dedup=True)
+    assert server.stop()['requests'] == 0
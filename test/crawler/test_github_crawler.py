@@ -3,6 +3,8 @@ import json
 import os
 import src.torlib.crawler.github_crawler as gc
 from src.torlib.crawler.github_crawler import NoTokenError, LengthNotMatchError, InputNotStringError
+from src.torlib.crawler.token_scheduler import TokenScheduler
+from src.torlib.crawler.retry import RetryPolicy
 import responses
 
 
@@ -97,3 +99,43 @@ def test_github_crawler_multipage_pretty_json():
             assert outfile.read() == '[\n    {\n        "test": "test'+str(i)+'"\n    }\n]'
         os.remove(f'test{i}.json')
 
+
+
+def test_last_page():
+    assert gc._last_page({}) == 1
+    assert gc._last_page({'link': '<http://test_github/api/1?per_page=100&page=2>; rel="next"'}) == 1
+    link = '<http://test_github/api/1?per_page=100&page=2>; rel="next", <http://test_github/api/1?per_page=100&page=34>; rel="last"'
+    assert gc._last_page({'link': link}) == 34
+    with pytest.raises(ValueError):
+        gc._last_page({'link': '<http://test_github/api/1>; rel="last"'})
+
+
+@responses.activate
+def test_collect_json_multipage_fan_out(tmp_path):
+    link = '<http://test_github/api/4?per_page=100&page=2>; rel="next", <http://test_github/api/4?per_page=100&page=3>; rel="last"'
+    for page in range(1, 4):
+        responses.add(responses.GET, f'http://test_github/api/4?per_page=100&page={page}',
+                      json=[{"page": page}],
+                      headers={'X-RateLimit-Remaining': '100', 'link': link if page < 3 else ''})
+    save_path = str(tmp_path / 'test4.json')
+    gc._init_worker(TokenScheduler(['token']), RetryPolicy(), 10, True, None, 2)
+    assert gc.__collect_json_multipage((save_path, 'http://test_github/api/4', 'json', False, None)) == ('http://test_github/api/4', 1)
+    with open(save_path, 'r') as outfile:
+        assert json.load(outfile) == [{"page": 1}, {"page": 2}, {"page": 3}]
+    # only the first page is requested sequentially, page 2 and 3 are requested once each
+    assert len(responses.calls) == 3
+
+
+def test_github_crawler_multipage_default_concurrency(tmp_path):
+    import time
+    from benchmark.mock_github_server import MockGithubServer
+    with MockGithubServer(pages=4, latency=0.2) as server:
+        elapsed = {}
+        for concurrency in (None, 4):
+            start = time.perf_counter()
+            gc.github_crawler_multipage([f'test{concurrency}'], [server.api_url(0)], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                        output_dir=str(tmp_path), concurrency=concurrency)
+            elapsed[concurrency] = time.perf_counter() - start
+    # by default the process send one request at a time (4 x 0.2 second), with concurrency=4 the last 3 pages are sent together
+    assert elapsed[None] >= 0.8
+    assert elapsed[4] < 0.7
@@ -0,0 +1,90 @@
+import json
+import pytest
+import requests
+import src.torlib.crawler.github_crawler as gc
+import src.torlib.crawler.graphql_crawler as gql
+from src.torlib.crawler.token_scheduler import TokenScheduler
+from src.torlib.crawler.retry import RetryPolicy
+from benchmark.mock_github_server import MockGithubServer
+import responses
+
+
+def test_parse_url():
+    assert gql._parse_url('https://api.github.com/repos/octo/cat') == ('repository', 'octo', 'cat', None)
+    assert gql._parse_url('https://api.github.com/repos/octo/cat/issues/12') == ('issue', 'octo', 'cat', 12)
+    assert gql._parse_url('https://github.example.com/api/v3/repos/octo/cat/pulls/3/') == ('pullRequest', 'octo', 'cat', 3)
+    with pytest.raises(gql.UrlNotSupportedError):
+        gql._parse_url('https://api.github.com/repos/octo/cat/commits')
+    assert gql._graphql_endpoint('https://api.github.com/repos/octo/cat') == 'https://api.github.com/graphql'
+    assert gql._graphql_endpoint('https://github.example.com/api/v3/repos/octo/cat') == 'https://github.example.com/api/graphql'
+
+
+def test_build_query():
+    lookups = [(None, ('repository', 'octo', 'cat', None)), (None, ('issue', 'octo', 'cat', 12))]
+    assert gql._build_query(lookups, {'repository': 'id', 'issue': 'title'}) == (
+        'query {\nu0: repository(owner: "octo", name: "cat") { id }\n'
+        'u1: repository(owner: "octo", name: "cat") { issue(number: 12) { title } }\n}')
+
+
+@responses.activate
+def test_collect_graphql_batch_split(tmp_path):
+    def graphql_api(request):
+        query = json.loads(request.body)['query']
+        if query.count('repository(') > 1:
+            return (200, {}, json.dumps({'errors': [{'type': 'MAX_NODE_LIMIT_EXCEEDED', 'message': 'too many node'}]}))
+        return (200, {'X-RateLimit-Remaining': '100'}, json.dumps({'data': {'u0': {'id': query.split('"')[1]}}}))
+    responses.add_callback(responses.POST, 'https://api.github.com/graphql', callback=graphql_api)
+    gc._init_worker(TokenScheduler(['token']), RetryPolicy(), 1, True, None, 1)
+    lookups = [((str(tmp_path / f'test{i}.json'), f'https://api.github.com/repos/octo{i}/cat', 'json', False, None), ('repository', f'octo{i}', 'cat', None))
+               for i in range(3)]
+    result = gql._collect_graphql_batch(('https://api.github.com/graphql', gql.DEFAULT_FIELDS, lookups))
+    assert result == [(f'https://api.github.com/repos/octo{i}/cat', 1) for i in range(3)]
+    # the batch is split until each query is accepted
+    assert len(responses.calls) == 5
+    with open(tmp_path / 'test2.json', 'r') as infile:
+        assert json.load(infile) == [{'id': 'octo2'}]
+
+
+@pytest.mark.parametrize('slow', ['502', 'timeout'])
+@responses.activate
+def test_collect_graphql_batch_split_slow_query(tmp_path, slow):
+    def graphql_api(request):
+        query = json.loads(request.body)['query']
+        if query.count('repository(') > 1:
+            if slow == 'timeout':
+                raise requests.ReadTimeout('read timed out')
+            return (502, {}, 'Bad Gateway')
+        return (200, {'X-RateLimit-Remaining': '100'}, json.dumps({'data': {'u0': {'id': query.split('"')[1]}}}))
+    responses.add_callback(responses.POST, 'https://api.github.com/graphql', callback=graphql_api)
+    gc._init_worker(TokenScheduler(['token']), RetryPolicy(backoff_base=0), 1, True, None, 1)
+    lookups = [((str(tmp_path / f'test{i}.json'), f'https://api.github.com/repos/octo{i}/cat', 'json', False, None), ('repository', f'octo{i}', 'cat', None))
+               for i in range(3)]
+    result = gql._collect_graphql_batch(('https://api.github.com/graphql', gql.DEFAULT_FIELDS, lookups))
+    assert result == [(f'https://api.github.com/repos/octo{i}/cat', 1) for i in range(3)]
+    # the slow batch is split on the first failure instead of being retried
+    assert len(responses.calls) == 5
+
+
+def test_github_crawler_multipage_graphql_unsupported():
+    for argument in [{'for_test': True}, {'http_cache': object()}, {'incremental': True}, {'dedup': True}, {'schedule': 'probe'}, {'pace': True}, {'concurrency': 10}]:
+        with pytest.raises(gc.ModeNotSupportedError) as e:
+            gc.github_crawler_multipage(['a'], ['https://api.github.com/repos/octo/cat'], ['token'], mode='graphql', **argument)
+        assert str(e.value) == f"mode=graphql -> {next(iter(argument))} is not supported in 'graphql' mode"
+
+
+def test_github_crawler_multipage_graphql(tmp_path):
+    with MockGithubServer(item_size=3, graphql_max_alias=4) as server:
+        url = [server.repo_url(f'owner{i}', 'repo') for i in range(10)] + [server.repo_url('missing', 'repo'), server.url + '/repos/a/b/issues/7',
+                                                                           server.url + '/repos/a/b/commits']
+        gc.github_crawler_multipage([f'test{i}' for i in range(13)], url, ['token'], pc=2, mode='graphql',
+                                    log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path))
+    # 11 lookup in batch of 50 that is split into query of at most 4 alias
+    assert server.stop()['requests'] == 7
+    with open(tmp_path / 'test3.json', 'r') as infile:
+        assert json.load(infile) == [{'nameWithOwner': 'owner3/repo', 'payload': 'xxx'}]
+    with open(tmp_path / 'test11.json', 'r') as infile:
+        assert json.load(infile) == [{'number': 7, 'title': 'a/b#7', 'payload': 'xxx'}]
+    with open(tmp_path / 'log.txt', 'r') as infile:
+        fail_list = dict(json.load(infile))
+    assert list(fail_list) == [url[12], url[10]]
+    assert 'Could not resolve' in fail_list[url[10]]
@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import requests
+import src.torlib.crawler.github_crawler as gc
+import src.torlib.crawler.async_crawler as ac
+from src.torlib.crawler.http_cache import HttpCache
+import responses
+
+
+def _github_api(request):
+    link = '<http://test_github/api/1?per_page=100&page=2>; rel="last"'
+    page = request.url[-1]
+    headers = {'X-RateLimit-Remaining': '100', 'ETag': f'"etag{page}"'}
+    if page == '1':
+        headers['Link'] = link
+    if request.headers.get('If-None-Match') == f'"etag{page}"':
+        return (304, {'X-RateLimit-Remaining': '100', 'ETag': f'"etag{page}"'}, '')
+    return (200, headers, json.dumps([{"page": int(page)}]))
+
+
+@responses.activate
+def test_github_crawler_multipage_async_http_cache(tmp_path):
+    for page in (1, 2):
+        responses.add_callback(responses.GET, f'http://test_github/api/1?per_page=100&page={page}',
+                               callback=_github_api, content_type='application/json')
+    http_cache = HttpCache(str(tmp_path / 'cache'))
+    for output_dir in ('day1', 'day2'):
+        ac.run_coroutine(ac.github_crawler_multipage_async(['test1'], ['http://test_github/api/1'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                                           output_dir=str(tmp_path / output_dir), http_cache=http_cache))
+        with open(tmp_path / output_dir / 'test1.json', 'r') as outfile:
+            assert json.load(outfile) == [{"page": 1}, {"page": 2}]
+    # the second crawl send conditional request
+    assert [c.request.headers.get('If-None-Match') for c in responses.calls] == [None, None, '"etag1"', '"etag2"']
+    assert http_cache.stats() == {'hits': 2, 'misses': 2, 'hit_rate': 0.5}
+
+
+@pytest.mark.parametrize('mode', ['process', 'async'])
+@responses.activate
+def test_http_cache_removed_before_304(tmp_path, mode):
+    http_cache = HttpCache(str(tmp_path / 'cache'))
+
+    def github_api(request):
+        if request.headers.get('If-None-Match'):
+            # the entry is pruned by another process after the conditional request is sent
+            os.remove(http_cache._path(request.url))
+        return _github_api(request)
+    for page in (1, 2):
+        responses.add_callback(responses.GET, f'http://test_github/api/1?per_page=100&page={page}',
+                               callback=github_api, content_type='application/json')
+    for output_dir in ('day1', 'day2'):
+        gc.github_crawler_multipage(['test1'], ['http://test_github/api/1'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                    output_dir=str(tmp_path / output_dir), http_cache=http_cache, mode=mode)
+        with open(tmp_path / output_dir / 'test1.json', 'r') as outfile:
+            assert json.load(outfile) == [{"page": 1}, {"page": 2}]
+    if mode == 'async':
+        # the page is requested again without the conditional header
+        assert [c.request.headers.get('If-None-Match') for c in responses.calls] == [None, None, '"etag1"', None, '"etag2"', None]
+
+
+def test_http_cache_prune(tmp_path):
+    http_cache = HttpCache(str(tmp_path), max_size=250)
+    for i in range(3):
+        path = http_cache._path(f'http://test_github/api/{i}')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as outfile:
+            outfile.write(b'x' * 100)
+        os.utime(path, (time.time() - 10 + i, time.time() - 10 + i))
+    assert http_cache.prune() == 1
+    # the least recently used entry is removed
+    assert not os.path.exists(http_cache._path('http://test_github/api/0'))
+    assert os.path.exists(http_cache._path('http://test_github/api/2'))
+
+
+def _response(url, body):
+    r = requests.Response()
+    r.status_code = 200
+    r.url = url
+    r.headers.update({'ETag': '"etag"'})
+    r._content = body
+    return r
+
+
+def _cache_size(cache_dir):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(cache_dir) for name in files)
+
+
+def test_http_cache_write_from_threads(tmp_path):
+    http_cache = HttpCache(str(tmp_path))
+    url = 'http://test_github/api/1'
+    # the thread of the same process write the same page at the same time
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda i: http_cache.process(url, _response(url, b'x' * 100)), range(200)))
+    assert http_cache.conditional_headers(url) == {'If-None-Match': '"etag"'}
+    assert os.listdir(os.path.dirname(http_cache._path(url))) == [os.path.basename(http_cache._path(url))]
+    assert http_cache._size.value == _cache_size(tmp_path)
+
+
+def test_http_cache_prune_while_writing(tmp_path):
+    http_cache = HttpCache(str(tmp_path), max_size=500)
+    for i in range(10):
+        url = f'http://test_github/api/{i}'
+        http_cache.process(url, _response(url, b'x' * 100))
+        # the cache never grow larger than max_size during the crawl
+        assert _cache_size(tmp_path) <= 500
+    assert http_cache.conditional_headers('http://test_github/api/9') == {'If-None-Match': '"etag"'}
+    assert http_cache.conditional_headers('http://test_github/api/0') == {}
+    # the size of the existing cache is counted when the cache is opened again
+    assert HttpCache(str(tmp_path), max_size=500)._size.value == _cache_size(tmp_path)
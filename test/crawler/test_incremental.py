@@ -0,0 +1,81 @@
+import json
+import pytest
+from urllib.parse import urlparse, parse_qs
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.incremental import HighWaterMark, DeltaCollector, merge_output
+from src.torlib.crawler.output_store import read_output
+import responses
+
+
+def _issue(number, updated_at):
+    return {"id": number, "title": f"issue {number}", "updated_at": updated_at}
+
+
+def _crawl(tmp_path, output_format='json', checkpoint=False):
+    gc.github_crawler_multipage(['issues'], ['http://test_github/api/issues'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                output_dir=str(tmp_path), mode='async', incremental=True, output_format=output_format, checkpoint=checkpoint)
+
+
+@pytest.mark.parametrize('output_format, checkpoint', [('json', False), ('jsonl.gz', False), ('json', True)])
+@responses.activate
+def test_github_crawler_multipage_incremental(tmp_path, output_format, checkpoint):
+    issues = [_issue(3, '2026-01-03T00:00:00Z'), _issue(2, '2026-01-02T00:00:00Z'), _issue(1, '2026-01-01T00:00:00Z')]
+
+    def issue_api(request):
+        query = parse_qs(urlparse(request.url).query)
+        since = query.get('since', [''])[0]
+        return (200, {'X-RateLimit-Remaining': '100'}, json.dumps([i for i in issues if i['updated_at'] >= since]))
+    responses.add_callback(responses.GET, 'http://test_github/api/issues', callback=issue_api, content_type='application/json')
+    _crawl(tmp_path, output_format, checkpoint)
+    assert HighWaterMark(str(tmp_path)).load() == {f'issues.{output_format}': '2026-01-03T00:00:00Z'}
+    # issue 1 is updated and issue 4 is created
+    issues = [_issue(1, '2026-01-05T00:00:00Z'), _issue(4, '2026-01-04T00:00:00Z')] + issues[:2]
+    responses.calls.reset()
+    # the url that is done in the checkpoint is still requested for the new item
+    _crawl(tmp_path, output_format, checkpoint)
+    assert len(responses.calls) == 1
+    query = parse_qs(urlparse(responses.calls[0].request.url).query)
+    assert (query['since'], query['sort'], query['direction']) == (['2026-01-03T00:00:00Z'], ['updated'], ['desc'])
+    assert [i['id'] for i in read_output(str(tmp_path), 'issues', output_format)] == [1, 4, 3, 2]
+    assert HighWaterMark(str(tmp_path)).load() == {f'issues.{output_format}': '2026-01-05T00:00:00Z'}
+
+
+@responses.activate
+def test_github_crawler_multipage_incremental_stop_early(tmp_path):
+    # the endpoint ignore since but is sorted newest first
+    with open(tmp_path / 'issues.json', 'w') as outfile:
+        json.dump([_issue(2, '2026-01-02T00:00:00Z'), _issue(1, '2026-01-01T00:00:00Z')], outfile)
+    link = '<http://test_github/api/issues?per_page=100&page=3>; rel="last"'
+    responses.add(responses.GET, 'http://test_github/api/issues', json=[_issue(3, '2026-01-03T00:00:00Z'), _issue(2, '2026-01-02T00:00:00Z'),
+                                                                     _issue(1, '2026-01-01T00:00:00Z')], headers={'link': link})
+    _crawl(tmp_path)
+    # the mark is read from the existing file and the crawl stop at the first page that contain older item
+    assert len(responses.calls) == 1
+    with open(tmp_path / 'issues.json', 'r') as infile:
+        assert [i['id'] for i in json.load(infile)] == [3, 2, 1]
+
+
+def test_github_crawler_multipage_incremental_output_format():
+    with pytest.raises(gc.OutputFormatNotSupportedError):
+        gc.github_crawler_multipage(['1'], ['1'], ['token'], output_format='jsonl_shard', incremental=True)
+
+
+def test_delta_collector():
+    delta = DeltaCollector('2026-01-02T00:00:00Z')
+    delta.add_page([{"sha": "c", "commit": {"committer": {"date": "2026-01-03T00:00:00Z"}}}])
+    assert not delta.done
+    delta.add_page([{"sha": "b", "commit": {"committer": {"date": "2026-01-02T00:00:00Z"}}},
+                    {"sha": "a", "commit": {"committer": {"date": "2026-01-01T00:00:00Z"}}}])
+    assert delta.done
+    assert [item['sha'] for item in delta.items] == ['c', 'b']
+    assert delta.newest == '2026-01-03T00:00:00Z'
+
+
+def test_merge_output(tmp_path):
+    save_path = str(tmp_path / 'commits.json')
+    with open(save_path, 'w') as outfile:
+        json.dump([{"sha": "b"}, {"sha": "a"}], outfile, indent=4)
+    assert merge_output(save_path, 'json', True, [{"sha": "c"}, {"sha": "b", "new": True}]) == 3
+    with open(save_path, 'r') as infile:
+        text = infile.read()
+    assert text == json.dumps([{"sha": "c"}, {"sha": "b", "new": True}, {"sha": "a"}], indent=4)
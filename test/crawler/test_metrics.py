@@ -0,0 +1,65 @@
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.metrics import CrawlHooks, CrawlMetrics
+from src.torlib.crawler.retry import RetryPolicy
+from benchmark.mock_github_server import MockGithubServer
+import responses
+
+
+class _RecordHook(CrawlHooks):
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, page_url, GHtoken):
+        self.calls.append(('before', page_url[-1], GHtoken))
+
+    def after_request(self, page_url, response, error, elapsed):
+        self.calls.append(('after', page_url[-1], response.status_code))
+
+
+@responses.activate
+def test_github_crawler_multipage_metrics_and_hooks(tmp_path):
+    link = '<http://test_github/api/1?per_page=100&page=2>; rel="last"'
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1',
+                  json=[{"id": 1}], headers={'X-RateLimit-Remaining': '100', 'link': link})
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=2', status=502)
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=2',
+                  json=[{"id": 2}], headers={'X-RateLimit-Remaining': '99'})
+    metrics = CrawlMetrics()
+    hook = _RecordHook()
+    gc.github_crawler_multipage(['test1'], ['http://test_github/api/1'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                output_dir=str(tmp_path), mode='async', concurrency=1, metrics=metrics, hooks=[hook],
+                                retry_policy=RetryPolicy(backoff_base=0.01, jitter=False))
+    assert hook.calls == [('before', '1', 'token'), ('after', '1', 200), ('before', '2', 'token'), ('after', '2', 502),
+                          ('before', '2', 'token'), ('after', '2', 200)]
+    snapshot = metrics.snapshot()
+    assert (snapshot['requests'], snapshot['errors'], snapshot['retries'], snapshot['urls'], snapshot['pages']) == (3, 1, 1, 1, 2)
+    assert snapshot['bytes'] == sum(len(c.response.content) for c in responses.calls)
+    assert snapshot['retry_wait_seconds'] == 0.01
+    assert snapshot['request_latency']['count'] == 3
+    assert snapshot['pages_per_url']['buckets']['2'] == 1
+    assert snapshot['token_quota'] == {'0': {'remaining': 99.0, 'reset': 0.0}}
+
+
+def test_github_crawler_multipage_metrics_process(tmp_path):
+    metrics = CrawlMetrics()
+    with MockGithubServer(pages=3, items_per_page=1) as server:
+        gc.github_crawler_multipage([f'test{i}' for i in range(4)], [server.api_url(i) for i in range(4)], ['token1', 'token2'], pc=2,
+                                    log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path), metrics=metrics)
+    # the counter of every worker process is read from the parent process
+    assert (metrics.requests, metrics.urls, metrics.failed_urls, metrics.errors) == (12, 4, 0, 0)
+    assert metrics.snapshot()['pages_per_url']['buckets']['5'] == 4
+    # the token is exported as its position in GHtoken
+    assert sorted(metrics.snapshot()['token_quota']) == ['0', '1']
+
+
+def test_crawl_metrics_to_prometheus():
+    metrics = CrawlMetrics()
+    metrics.after_request('http://test_github/api/1?per_page=100&page=1', None, ConnectionError(), 0.02)
+    metrics.add_url(0, False)
+    text = metrics.to_prometheus()
+    assert 'github_crawler_requests_total 1\n' in text
+    assert 'github_crawler_errors_total 1\n' in text
+    assert 'github_crawler_request_latency_seconds_bucket{le="0.01"} 0\n' in text
+    assert 'github_crawler_request_latency_seconds_bucket{le="0.025"} 1\n' in text
+    assert 'github_crawler_request_latency_seconds_bucket{le="+Inf"} 1\n' in text
+    assert 'github_crawler_pages_per_url_count 1\n' in text
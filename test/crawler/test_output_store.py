@@ -0,0 +1,64 @@
+import pytest
+import gzip
+import os
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.output_store import ShardStore, read_output
+import responses
+
+
+def _add_github_api():
+    for i in range(1, 4):
+        responses.add(responses.GET, f'http://test_github/api/{i}?per_page=100&page=1',
+                      json=[{"id": i, "text": "x" * 20}], headers={'X-RateLimit-Remaining': '100'})
+
+
+def _crawl(tmp_path, output_format, **kwargs):
+    gc.github_crawler_multipage(['test1', 'test2', 'test3'], [f'http://test_github/api/{i}' for i in range(1, 4)], ['token'],
+                                log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path / 'data'), mode='async',
+                                output_format=output_format, **kwargs)
+
+
+@pytest.mark.parametrize('output_format', ['json', 'jsonl', 'json.gz', 'jsonl.gz', 'jsonl_shard', 'archive'])
+@responses.activate
+def test_read_output(tmp_path, output_format):
+    _add_github_api()
+    _crawl(tmp_path, output_format)
+    for i in range(1, 4):
+        assert read_output(str(tmp_path / 'data'), f'test{i}', output_format) == [{"id": i, "text": "x" * 20}]
+
+
+@responses.activate
+def test_json_gz_output(tmp_path):
+    _add_github_api()
+    _crawl(tmp_path, 'json.gz', pretty_json=False)
+    with gzip.open(tmp_path / 'data' / 'test1.json.gz', 'rt') as infile:
+        assert infile.read() == '[{"id": 1, "text": "xxxxxxxxxxxxxxxxxxxx"}]'
+
+
+@responses.activate
+def test_jsonl_shard_output(tmp_path):
+    _add_github_api()
+    _crawl(tmp_path, 'jsonl_shard', shard_size=90, concurrency=1, json_codec='json')
+    # each url is 42 byte so the shard roll over after two url
+    assert sorted(os.listdir(tmp_path / 'data')) == ['github_crawler-00000.jsonl', 'github_crawler-00001.jsonl', 'github_crawler.idx']
+    store = ShardStore(str(tmp_path / 'data'))
+    assert store.load() == {'test1': (0, 0, 42), 'test2': (0, 42, 42), 'test3': (1, 0, 42)}
+    # crawl again, the url in the store are skipped
+    responses.calls.reset()
+    _crawl(tmp_path, 'jsonl_shard', shard_size=90, concurrency=1)
+    assert len(responses.calls) == 0
+
+
+@responses.activate
+def test_archive_output(tmp_path):
+    _add_github_api()
+    _crawl(tmp_path, 'archive')
+    assert sorted(os.listdir(tmp_path / 'data')) == ['github_crawler.archive', 'github_crawler.idx']
+
+
+@responses.activate
+def test_zstd_output(tmp_path):
+    pytest.importorskip('zstandard')
+    _add_github_api()
+    _crawl(tmp_path, 'jsonl.zst')
+    assert read_output(str(tmp_path / 'data'), 'test2', 'jsonl.zst') == [{"id": 2, "text": "x" * 20}]
@@ -0,0 +1,82 @@
+import json
+import pickle
+import pytest
+from urllib.parse import urlparse, parse_qs
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.projection import FieldProjection, FieldPathError, compile_projection
+from src.torlib.crawler.output_store import read_output
+import responses
+
+
+def _issue(number, updated_at='2026-01-01T00:00:00Z'):
+    return {"id": number, "number": number, "title": f"issue {number}", "body": "x" * 100, "updated_at": updated_at,
+            "user": {"login": f"user{number}", "id": number, "avatar_url": "https://avatars"},
+            "labels": [{"name": "bug", "color": "red"}, {"name": "help", "color": "blue"}], "assignee": None}
+
+
+def test_field_projection():
+    projection = FieldProjection(['$.number', 'user.login', 'labels[*].name', 'assignee.login', 'milestone.title'])
+    assert projection(_issue(1)) == {'number': 1, 'user': {'login': 'user1'}, 'labels': [{'name': 'bug'}, {'name': 'help'}], 'assignee': None}
+    # a list of item is projected item by item
+    assert projection([_issue(1), _issue(2)])[1] == projection(_issue(2))
+    # the parent field keep the whole value
+    assert FieldProjection(['user.login', 'user'])(_issue(1))['user'] == _issue(1)['user']
+    assert FieldProjection(['user', 'user.login'])(_issue(1))['user'] == _issue(1)['user']
+    assert pickle.loads(pickle.dumps(projection))(_issue(3)) == projection(_issue(3))
+
+
+@pytest.mark.parametrize('fields', [['user..login'], ['labels[0].name'], [''], [1], []])
+def test_field_projection_error(fields):
+    with pytest.raises(FieldPathError):
+        FieldProjection(fields)
+
+
+def test_compile_projection():
+    assert compile_projection(None) is None
+    projection = FieldProjection(['id'])
+    assert compile_projection(projection) is projection
+    assert compile_projection('id')({'id': 1, 'a': 2}) == {'id': 1}
+
+
+@pytest.mark.parametrize('mode', ['process', 'async'])
+@pytest.mark.parametrize('pretty_json', [True, False])
+@responses.activate
+def test_github_crawler_multipage_projection(tmp_path, mode, pretty_json):
+    link = '<http://test_github/api/1?per_page=100&page=2>; rel="last"'
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1',
+                  json=[_issue(1), _issue(2)], headers={'X-RateLimit-Remaining': '100', 'link': link})
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=2',
+                  json=[_issue(3)], headers={'X-RateLimit-Remaining': '100'})
+    gc.github_crawler_multipage(['test1'], ['http://test_github/api/1'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                output_dir=str(tmp_path), mode=mode, pretty_json=pretty_json, projection=['number', 'user.login'])
+    with open(tmp_path / 'test1.json', 'r') as infile:
+        assert json.load(infile) == [{'number': i, 'user': {'login': f'user{i}'}} for i in range(1, 4)]
+
+
+def test_github_crawler_multipage_projection_error(tmp_path):
+    with pytest.raises(FieldPathError) as e:
+        gc.github_crawler_multipage(['test1'], ['http://test_github/api/1'], ['token'], projection=['labels[0]'])
+    assert str(e.value).startswith('field=labels[0] -> ')
+
+
+@responses.activate
+def test_github_crawler_multipage_incremental_projection(tmp_path):
+    issues = [_issue(2, '2026-01-02T00:00:00Z'), _issue(1, '2026-01-01T00:00:00Z')]
+
+    def issue_api(request):
+        since = parse_qs(urlparse(request.url).query).get('since', [''])[0]
+        return (200, {'X-RateLimit-Remaining': '100'}, json.dumps([i for i in issues if i['updated_at'] >= since]))
+    responses.add_callback(responses.GET, 'http://test_github/api/issues', callback=issue_api, content_type='application/json')
+    for _ in range(2):
+        gc.github_crawler_multipage(['issues'], ['http://test_github/api/issues'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                    output_dir=str(tmp_path), incremental=True, projection=['id', 'updated_at'])
+        # issue 1 is updated
+        issues = [_issue(1, '2026-01-03T00:00:00Z'), issues[0]]
+    assert read_output(str(tmp_path), 'issues') == [{'id': 1, 'updated_at': '2026-01-03T00:00:00Z'}, {'id': 2, 'updated_at': '2026-01-02T00:00:00Z'}]
+
+
+@responses.activate
+def test_iter_github_pages_projection():
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1', json=[_issue(1)], headers={'X-RateLimit-Remaining': '100'})
+    pages = list(gc.iter_github_pages([('test1', 'http://test_github/api/1')], ['token'], projection=['title']))
+    assert pages == [('test1', 1, [{'title': 'issue 1'}])]
@@ -0,0 +1,108 @@
+import json
+import time
+import pytest
+import responses
+from responses import matchers
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.quota import QuotaPlan, RateLimitNotAvailableError, fetch_quota, plan_crawl, rate_limit_url_of, simulate_quota, _drain
+from src.torlib.crawler.schedule import PageCountHistory
+from src.torlib.crawler.token_scheduler import TokenScheduler
+
+RATE_LIMIT_URL = 'https://api.github.com/rate_limit'
+TEST_RATE_LIMIT_URL = 'http://test_github/rate_limit'
+
+
+def _add_rate_limit(token, limit, remaining, reset, url=TEST_RATE_LIMIT_URL):
+    responses.add(responses.GET, url, json={'resources': {'core': {'limit': limit, 'remaining': remaining, 'reset': reset, 'used': limit - remaining}}},
+                  match=[matchers.header_matcher({'Authorization': 'token ' + token})])
+
+
+def test_simulate_quota():
+    now = 1000.0
+    quota = {'token1': (5000, 100, now + 100), 'token2': (5000, 50, now + 200)}
+    assert simulate_quota(100, quota, 10, now) == (10, 0, {'token1': None, 'token2': None})
+    # every token run dry after 15 second and the crawl wait until token1 is reset
+    seconds, stall, dry_at = simulate_quota(300, quota, 10, now)
+    assert (seconds, stall) == pytest.approx((115, 85))
+    assert dry_at == pytest.approx({'token1': now + 15, 'token2': now + 15})
+    assert simulate_quota(10, {'token1': (5000, 0, now + 10)}, 1, now) == (20, 10, {'token1': now})
+    assert simulate_quota(10, {'token1': (0, 0, now + 10)}, 1, now)[0] == float('inf')
+
+
+def test_drain():
+    assert _drain([10, 4, 2], 8) == pytest.approx([3, 3, 2])
+    assert _drain([10, 4, 2], 20) == [0, 0, 0]
+
+
+def test_token_scheduler_pace():
+    scheduler = TokenScheduler(['token1', 'token2'], pace=True)
+    scheduler.update('token1', {'X-RateLimit-Remaining': '11', 'X-RateLimit-Reset': str(time.time() + 100)})
+    scheduler.update('token2', {'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': str(time.time() + 100)})
+    assert scheduler.try_acquire() == ('token1', 0)
+    assert scheduler.try_acquire() == ('token2', 0)
+    # the next request of token1 is sent after 100 / 10 second
+    token, wait_time = scheduler.try_acquire()
+    assert token is None
+    assert 9 < wait_time <= 10
+    # the token that has not been used yet is not paced
+    scheduler = TokenScheduler(['token1'], pace=True)
+    assert [scheduler.try_acquire()[0] for _ in range(3)] == ['token1'] * 3
+
+
+def test_rate_limit_url_of():
+    assert rate_limit_url_of('https://api.github.com/repos/octo/cat') == RATE_LIMIT_URL
+    assert rate_limit_url_of('https://github.example.com/api/v3/repos/octo/cat') == 'https://github.example.com/api/v3/rate_limit'
+    assert rate_limit_url_of('http://127.0.0.1:8080/repos/1/items') == 'http://127.0.0.1:8080/rate_limit'
+
+
+@responses.activate
+def test_fetch_quota():
+    _add_rate_limit('token1', 5000, 4000, 1700000000, RATE_LIMIT_URL)
+    responses.add(responses.GET, RATE_LIMIT_URL, status=401, json={'message': 'Bad credentials'},
+                  match=[matchers.header_matcher({'Authorization': 'token token2'})])
+    assert fetch_quota(['token1'])[0] == {'token1': (5000, 4000, 1700000000)}
+    with pytest.raises(RateLimitNotAvailableError) as e:
+        fetch_quota(['token1', 'token2'])
+    assert str(e.value).startswith('token=toke... -> ')
+
+
+@responses.activate
+def test_plan_crawl(tmp_path):
+    reset = int(time.time()) + 1800
+    _add_rate_limit('token1', 5000, 100, reset)
+    _add_rate_limit('token2', 5000, 60, reset)
+    for i, last in enumerate([150, 3]):
+        responses.add(responses.HEAD, f'http://test_github/api/{i}?per_page=100&page=1', headers={'X-RateLimit-Remaining': '100',
+                      'link': f'<http://test_github/api/{i}?per_page=100&page={last}>; rel="last"'})
+    responses.add(responses.HEAD, 'http://test_github/api/2?per_page=100&page=1', status=404)
+    (tmp_path / 'done.json').write_text('[]')
+    PageCountHistory(str(tmp_path)).update([('', 'http://test_github/api/3', 'json', True, None)], [('http://test_github/api/3', 1, 7)])
+    plan = plan_crawl(['a', 'b', 'c', 'd', 'done', 'dup'], [f'http://test_github/api/{i}' for i in range(5)] + ['http://test_github/api/0/'],
+                      ['token1', 'token2'], output_dir=str(tmp_path), retry=0, latency=0.1, concurrency=10, dedup=True)
+    # 150 + 3 probed page, 7 page from history and one page for the url that cannot be probed
+    assert (plan.urls, plan.done_urls, plan.known_urls, plan.probed_urls, plan.unknown_urls) == (5, 1, 1, 2, 1)
+    assert (plan.requests, plan.probe_requests, plan.remaining, plan.fits_quota) == (161, 3, 160, False)
+    assert plan.stall_seconds > 0
+    assert set(plan.dry_at) == {'token1', 'token2'} and None not in plan.dry_at.values()
+    assert plan.rate == 100
+    assert json.loads(json.dumps(plan.as_dict()))['tokens'][0] == {'token': 'toke...', 'limit': 5000, 'remaining': 100, 'reset': reset,
+                                                                   'dry_at': plan.dry_at['token1']}
+    assert 'token1' not in str(plan)
+
+
+@responses.activate
+def test_github_crawler_multipage_dry_run(tmp_path):
+    _add_rate_limit('token', 5000, 5000, int(time.time()) + 3600)
+    responses.add(responses.HEAD, 'http://test_github/api/1?per_page=100&page=1', headers={'X-RateLimit-Remaining': '100'})
+    plan = gc.github_crawler_multipage(['test1'], ['http://test_github/api/1'], ['token'], output_dir=str(tmp_path / 'data'), dry_run=True)
+    assert isinstance(plan, QuotaPlan)
+    assert (plan.requests, plan.fits_quota, plan.stall_seconds, plan.dry_at) == (1, True, 0, {'token': None})
+    # nothing is written and only the rate limit of the host of the url is requested by this process (before and after the probe of the worker process)
+    assert not (tmp_path / 'data').exists()
+    assert [call.request.url for call in responses.calls] == [TEST_RATE_LIMIT_URL] * 2
+    # the rate limit endpoint can be given when it is not on the host of the url
+    _add_rate_limit('token', 5000, 5000, int(time.time()) + 3600, 'http://mock/rate_limit')
+    responses.calls.reset()
+    gc.github_crawler_multipage(['test1'], ['http://test_github/api/1'], ['token'], output_dir=str(tmp_path / 'data'), dry_run=True,
+                                rate_limit_url='http://mock/rate_limit')
+    assert [call.request.url for call in responses.calls] == ['http://mock/rate_limit'] * 2
@@ -0,0 +1,72 @@
+import json
+import requests
+import src.torlib.crawler.async_crawler as ac
+from src.torlib.crawler.retry import RetryPolicy, is_secondary_rate_limited
+import responses
+
+
+def _response(status_code, headers={}, text=''):
+    r = requests.Response()
+    r.status_code = status_code
+    r.headers.update(headers)
+    r._content = text.encode()
+    return r
+
+
+def test_retry_policy_should_retry():
+    policy = RetryPolicy()
+    assert policy.should_retry(_response(502))
+    assert policy.should_retry(_response(429))
+    assert not policy.should_retry(_response(200))
+    assert not policy.should_retry(_response(404))
+    assert policy.should_retry(error=requests.ConnectionError())
+    assert not policy.should_retry(error=requests.exceptions.MissingSchema())
+
+
+def test_retry_policy_secondary_rate_limit():
+    policy = RetryPolicy(secondary_rate_limit_wait=60)
+    r = _response(403, {'X-RateLimit-Remaining': '100'}, '{"message": "You have exceeded a secondary rate limit."}')
+    assert is_secondary_rate_limited(r)
+    assert policy.should_retry(r)
+    assert policy.delay(0, r) == 60
+    assert policy.delay(0, _response(403, {'Retry-After': '7'})) == 7
+    assert not is_secondary_rate_limited(_response(403, text='{"message": "Resource not accessible"}'))
+
+
+def test_retry_policy_backoff():
+    policy = RetryPolicy(backoff_base=1, backoff_max=10, jitter=False)
+    assert [policy.delay(i) for i in range(5)] == [1, 2, 4, 8, 10]
+    policy = RetryPolicy(backoff_base=1, backoff_max=10)
+    assert all(0 <= policy.delay(3) <= 8 for _ in range(20))
+
+
+@responses.activate
+def test_github_crawler_multipage_async_retry_page(tmp_path):
+    link = '<http://test_github/api/1?per_page=100&page=2>; rel="last"'
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1',
+                  json=[{"id": 1}], headers={'X-RateLimit-Remaining': '100', 'link': link})
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=2', status=502)
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=2',
+                  body=requests.ConnectionError('connection reset'))
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=2',
+                  json=[{"id": 2}], headers={'X-RateLimit-Remaining': '100'})
+    log_file = str(tmp_path / 'log.txt')
+    ac.run_coroutine(ac.github_crawler_multipage_async(['test1'], ['http://test_github/api/1'], ['token'], log_file=log_file,
+                                                       output_dir=str(tmp_path), retry_policy=RetryPolicy(backoff_base=0.01)))
+    with open(tmp_path / 'test1.json', 'r') as outfile:
+        assert json.load(outfile) == [{"id": 1}, {"id": 2}]
+    # page 1 is not requested again
+    assert [c.request.url[-1] for c in responses.calls] == ['1', '2', '2', '2']
+
+
+@responses.activate
+def test_github_crawler_multipage_async_retry_exhausted(tmp_path):
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1', status=503)
+    log_file = str(tmp_path / 'log.txt')
+    ac.run_coroutine(ac.github_crawler_multipage_async(['test1'], ['http://test_github/api/1'], ['token'], log_file=log_file,
+                                                       output_dir=str(tmp_path), retry_policy=RetryPolicy(max_retry=2, backoff_base=0.01)))
+    with open(log_file, 'r') as outfile:
+        log = json.load(outfile)
+    assert log[0][0] == 'http://test_github/api/1'
+    assert '503' in log[0][1]
+    assert len(responses.calls) == 3
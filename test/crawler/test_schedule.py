@@ -0,0 +1,89 @@
+import json
+import pytest
+import responses
+from multiprocessing.dummy import Pool
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.schedule import PageCountHistory, ScheduleNotSupportedError, estimate_pages, plan_chunks
+from src.torlib.crawler.token_scheduler import TokenScheduler
+from src.torlib.crawler.retry import RetryPolicy
+
+
+def _add_api(pages):
+    for i, last in enumerate(pages):
+        link = f'<http://test_github/api/{i}?per_page=100&page={last}>; rel="last"'
+        for page in range(1, last+1):
+            responses.add(responses.GET, f'http://test_github/api/{i}?per_page=100&page={page}', json=[{'id': page}],
+                          headers={'X-RateLimit-Remaining': '100', 'link': link})
+        responses.add(responses.HEAD, f'http://test_github/api/{i}?per_page=100&page=1', headers={'X-RateLimit-Remaining': '100', 'link': link})
+
+
+def test_plan_chunks():
+    # the unknown url first, then from the largest url and the small url are grouped
+    assert plan_chunks([1, None, 20, 1, 1, 2, 0, 1], 1) == [[1], [2], [5, 0, 3], [4, 7, 6]]
+    assert plan_chunks([0, 0, 0], 2, max_chunk=2) == [[0, 1], [2]]
+    assert plan_chunks([], 4) == []
+
+
+def test_page_count_history(tmp_path):
+    history = PageCountHistory(str(tmp_path))
+    assert history.load() == {}
+    (tmp_path / 'b.json').write_text('[]')
+    list_to_crawl = [(str(tmp_path / 'a.json'), 'HTTP://X/a/', 'json', True, None), (str(tmp_path / 'b.json'), 'http://x/b', 'json', True, None),
+                     (str(tmp_path / 'c.json'), 'http://x/c', 'json', True, (3, 10, 3)), (str(tmp_path / 'd.json'), 'http://x/d', 'json', True, None)]
+    history.update(list_to_crawl, [('HTTP://X/a/', 1, 5), ('http://x/b', 1, 0), ('http://x/c', 1, 2), ('http://x/d', 'error', 1)])
+    # only the url that is crawled from the first page is recorded
+    assert json.loads((tmp_path / '.github_crawler_pages').read_text()) == {'http://x/a': 5}
+    history = PageCountHistory(str(tmp_path))
+    history.load()
+    assert estimate_pages(list_to_crawl, history) == [5, 0, None, None]
+    assert estimate_pages(list_to_crawl, history, incremental=True) == [5, None, None, None]
+    (tmp_path / '.github_crawler_pages').write_text('{"broken')
+    assert history.load() == {}
+
+
+@pytest.mark.parametrize('probe', [False, True])
+@responses.activate
+def test_collect_by_size(tmp_path, probe):
+    pages = [1, 2, 5, 1]
+    _add_api(pages)
+    gc._init_worker(TokenScheduler(['token']), RetryPolicy(), 1, True, None, 1)
+    list_to_crawl = [(str(tmp_path / f'{i}.json'), f'http://test_github/api/{i}', 'json', True, None) for i in range(4)]
+    history = PageCountHistory(str(tmp_path))
+    if not probe:
+        history.update(list_to_crawl, [(u, 1, pages[i]) for i, (_, u, *_) in enumerate(list_to_crawl)])
+    with Pool(1) as p:
+        result = gc._collect_by_size(p, gc._collect_pages, list_to_crawl, history, 1, 1, probe=probe)
+    # the result is in input order but the largest url is crawled first
+    assert result == [(f'http://test_github/api/{i}', 1, pages[i]) for i in range(4)]
+    requested = [call.request.url for call in responses.calls if call.request.method == 'GET']
+    assert requested[0] == 'http://test_github/api/2?per_page=100&page=1'
+    assert len([call for call in responses.calls if call.request.method == 'HEAD']) == (4 if probe else 0)
+
+
+@responses.activate
+def test_github_crawler_multipage_schedule(tmp_path):
+    _add_api([3, 1])
+    for _ in range(2):
+        gc.github_crawler_multipage(['a', 'b'], ['http://test_github/api/0', 'http://test_github/api/1'], ['token'], pc=2,
+                                    log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path), schedule='history')
+        with open(tmp_path / 'a.json', 'r') as infile:
+            assert json.load(infile) == [{'id': 1}, {'id': 2}, {'id': 3}]
+        (tmp_path / 'a.json').unlink()
+    # the page count of the previous crawl is kept
+    assert json.loads((tmp_path / '.github_crawler_pages').read_text()) == {'http://test_github/api/0': 3, 'http://test_github/api/1': 1}
+    # the run with the default schedule only record the page count when asked
+    (tmp_path / '.github_crawler_pages').unlink()
+    gc.github_crawler_multipage(['a'], ['http://test_github/api/0'], ['token'], log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path))
+    assert not (tmp_path / '.github_crawler_pages').exists()
+    (tmp_path / 'a.json').unlink()
+    gc.github_crawler_multipage(['a'], ['http://test_github/api/0'], ['token'], log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path),
+                                record_history=True)
+    assert json.loads((tmp_path / '.github_crawler_pages').read_text()) == {'http://test_github/api/0': 3}
+    (tmp_path / 'a.json').unlink()
+    (tmp_path / 'b.json').unlink()
+    gc.github_crawler_multipage(['a', 'b'], ['http://test_github/api/0', 'http://test_github/api/1'], ['token'], mode='async',
+                                log_file=str(tmp_path / 'log.txt'), output_dir=str(tmp_path), record_history=True)
+    assert json.loads((tmp_path / '.github_crawler_pages').read_text()) == {'http://test_github/api/0': 3, 'http://test_github/api/1': 1}
+    with pytest.raises(ScheduleNotSupportedError) as e:
+        gc.github_crawler_multipage(['a'], ['http://test_github/api/0'], ['token'], schedule='random')
+    assert str(e.value).startswith('schedule=random -> ')
@@ -0,0 +1,71 @@
+import json
+import time
+import pytest
+from src.torlib.crawler.service import CrawlerService, CrawlerClient, serve, PathNotAllowedError, JobNotFoundError
+from src.torlib.crawler.github_crawler import OutputFormatNotSupportedError, NoTokenError
+from src.torlib.crawler.metrics import CrawlMetrics
+from benchmark.mock_github_server import MockGithubServer
+
+
+def test_crawler_service(tmp_path):
+    metrics = CrawlMetrics()
+    with MockGithubServer(pages=2, item_size=3) as server, CrawlerService(['token'], pc=2, output_dir=str(tmp_path), metrics=metrics) as service:
+        job_id = service.submit(['a', 'b', 'c'], [server.api_url(0), server.api_url(1), server.api_url(0)], output_dir='job1', log_file='job1.log', dedup=True)
+        status = service.wait(job_id, timeout=30)
+        assert (status['state'], status['urls'], status['finished'], status['failed']) == ('done', 3, 3, [])
+        # the pool and the token state are reused by the next job
+        job_id = service.submit(['d'], [server.api_url(2)], pretty_json=False)
+        assert service.wait(job_id, timeout=30)['state'] == 'done'
+        assert [job['id'] for job in service.jobs()][-1] == job_id
+    with open(tmp_path / 'job1' / 'c.json', 'r') as infile:
+        assert len(json.load(infile)) == 200
+    with open(tmp_path / 'job1.log', 'r') as infile:
+        assert json.load(infile) == []
+    assert (tmp_path / 'd.json').exists()
+    assert server.stop()['requests'] == 6
+    assert metrics.deduplicated_urls == 1
+
+
+def test_crawler_service_round_robin(tmp_path):
+    with MockGithubServer(latency=0.05) as server, CrawlerService(['token'], output_dir=str(tmp_path)) as service:
+        large = service.submit([f'large{i}' for i in range(20)], [server.api_url(i) for i in range(20)])
+        small = service.submit(['small'], [server.api_url(100)])
+        assert service.wait(small, timeout=30)['state'] == 'done'
+        # the small job does not wait for the large job submitted before it
+        assert service.status(large)['state'] == 'running'
+        assert service.wait(large, timeout=30)['finished'] == 20
+
+
+def test_crawler_service_input(tmp_path):
+    with pytest.raises(NoTokenError):
+        CrawlerService([])
+    with CrawlerService(['token'], output_dir=str(tmp_path)) as service:
+        with pytest.raises(PathNotAllowedError):
+            service.submit(['a'], ['http://localhost/a'], output_dir='../other')
+        with pytest.raises(PathNotAllowedError):
+            service.submit(['../a'], ['http://localhost/a'])
+        with pytest.raises(OutputFormatNotSupportedError):
+            service.submit(['a'], ['http://localhost/a'], output_format='jsonl_shard')
+        with pytest.raises(JobNotFoundError):
+            service.status('missing')
+        assert service.wait(service.submit([], []), timeout=1)['state'] == 'done'
+
+
+@pytest.mark.parametrize('unix_socket', [False, True])
+def test_crawler_client(tmp_path, unix_socket):
+    with MockGithubServer(pages=3, item_size=3) as server, CrawlerService(['token'], retry=0, output_dir=str(tmp_path / 'data'), metrics=CrawlMetrics()) as service:
+        http_server = serve(service, port=0, unix_socket=str(tmp_path / 'crawler.sock') if unix_socket else None)
+        try:
+            client = CrawlerClient(str(tmp_path / 'crawler.sock') if unix_socket else 'http://%s:%d' % http_server.server_address[:2], timeout=30)
+            start = time.perf_counter()
+            job_id = client.submit(['a', 'b'], [server.api_url(0), 'http://127.0.0.1:1/x'])
+            assert sorted(url for url, _ in client.stream(job_id)) == sorted([server.api_url(0), 'http://127.0.0.1:1/x'])
+            status = client.wait(job_id, timeout=10)
+            assert (status['state'], status['finished'], [url for url, _ in status['failed']]) == ('done', 2, ['http://127.0.0.1:1/x'])
+            assert time.perf_counter() - start < 10
+            with pytest.raises(ValueError):
+                client.submit(['a'], ['http://localhost/a'], output_dir='/')
+            with pytest.raises(JobNotFoundError):
+                client.status('missing')
+        finally:
+            http_server.shutdown()
@@ -0,0 +1,61 @@
+import pytest
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from src.torlib.crawler.session import SessionPool, ConnectionStats
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'[]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_pool_reuse_session_per_token():
+    pool = SessionPool()
+    assert pool.get('token1') is pool.get('token1')
+    assert pool.get('token1') is not pool.get('token2')
+    assert pool.get('token1').headers['Authorization'] == 'token token1'
+    pool.close()
+
+
+def test_session_pool_keep_alive(server_url):
+    stats = ConnectionStats()
+    pool = SessionPool(stats=stats)
+    for i in range(3):
+        pool.get('token').get(f'{server_url}/api/{i}')
+    pool.close()
+    assert stats.as_dict() == {'opened': 1, 'reused': 2, 'requests': 3}
+
+
+def test_session_pool_no_keep_alive(server_url):
+    stats = ConnectionStats()
+    pool = SessionPool(keep_alive=False, stats=stats)
+    for i in range(3):
+        pool.get('token').get(f'{server_url}/api/{i}')
+    pool.close()
+    assert stats.opened == 3
+    assert stats.reused == 0
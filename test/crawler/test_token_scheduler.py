@@ -0,0 +1,51 @@
+import json
+import time
+import src.torlib.crawler.async_crawler as ac
+from src.torlib.crawler.token_scheduler import TokenScheduler
+import responses
+from responses import matchers
+
+
+def test_token_scheduler_most_remaining():
+    scheduler = TokenScheduler(['token1', 'token2', 'token3'])
+    scheduler.update('token1', {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': '0'})
+    scheduler.update('token2', {'X-RateLimit-Remaining': '300', 'X-RateLimit-Reset': '0'})
+    scheduler.update('token3', {'X-RateLimit-Remaining': '200', 'X-RateLimit-Reset': '0'})
+    assert scheduler.acquire() == 'token2'
+    assert scheduler.quota()['token2'][0] == 299
+
+
+def test_token_scheduler_exhausted():
+    scheduler = TokenScheduler(['token1', 'token2'])
+    reset = time.time() + 100
+    scheduler.update('token1', {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)})
+    assert scheduler.try_acquire() == ('token2', 0)
+    scheduler.update('token2', {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset + 50)})
+    token, wait_time = scheduler.try_acquire()
+    assert token is None
+    assert 90 < wait_time <= 100
+
+
+def test_token_scheduler_reset():
+    scheduler = TokenScheduler(['token1'], default_limit=10)
+    scheduler.update('token1', {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() - 1)})
+    assert scheduler.try_acquire() == ('token1', 0)
+    assert scheduler.quota()['token1'][0] == 9
+
+
+@responses.activate
+def test_github_crawler_multipage_async_switch_token(tmp_path):
+    reset = str(int(time.time()) + 3600)
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1', status=403,
+                  json={"message": "API rate limit exceeded"},
+                  headers={'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': reset},
+                  match=[matchers.header_matcher({'Authorization': 'token token1'})])
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1',
+                  json=[{"id": 1}],
+                  headers={'X-RateLimit-Remaining': '4000', 'X-RateLimit-Reset': reset},
+                  match=[matchers.header_matcher({'Authorization': 'token token2'})])
+    log_file = str(tmp_path / 'log.txt')
+    ac.run_coroutine(ac.github_crawler_multipage_async(['test1'], ['http://test_github/api/1'], ['token1', 'token2'],
+                                                       log_file=log_file, output_dir=str(tmp_path)))
+    with open(tmp_path / 'test1.json', 'r') as outfile:
+        assert json.load(outfile) == [{"id": 1}]
@@ -0,0 +1,81 @@
+import json
+import multiprocessing as mp
+import os
+import time
+import pytest
+from src.torlib.crawler.work_queue import WorkQueue, github_crawler_worker
+from src.torlib.crawler.github_crawler import OutputFormatNotSupportedError
+from benchmark.mock_github_server import MockGithubServer
+
+
+def test_work_queue_lease(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=0.5)
+    assert work_queue.enqueue(['a', 'b', 'c'], ['url/a', 'url/b', 'url/c']) == 3
+    # the savename already in the queue is ignored
+    assert work_queue.enqueue(['a'], ['url/a']) == 0
+    assert [task[1] for task in work_queue.claim('worker1', 2)] == ['a', 'b']
+    assert [task[1] for task in work_queue.claim('worker2', 2)] == ['c']
+    assert work_queue.claim('worker2', 2) == []
+    assert work_queue.stats() == {'pending': 0, 'leased': 3, 'done': 0, 'failed': 0}
+    assert work_queue.complete('worker1', 1, 1)
+    assert work_queue.complete('worker2', 3, '404 Client Error')
+    # the lease of b is expired and it is claimed by worker2
+    time.sleep(0.6)
+    assert work_queue.stats() == {'pending': 1, 'leased': 0, 'done': 1, 'failed': 1}
+    assert [task[1] for task in work_queue.claim('worker2', 2)] == ['b']
+    assert work_queue.failed() == [('url/c', '404 Client Error')]
+    assert work_queue.retry_failed() == 1
+    # worker1 lost the lease of b so it cannot overwrite the result of worker2
+    assert not work_queue.complete('worker1', 2, 'timeout')
+    assert work_queue.complete('worker2', 2, 1)
+    assert not work_queue.complete('worker2', 2, 'timeout')
+    assert work_queue.stats() == {'pending': 1, 'leased': 0, 'done': 2, 'failed': 0}
+
+
+def test_work_queue_max_attempts(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=0.1, max_attempts=2)
+    work_queue.enqueue(['a'], ['url/a'])
+    # the url that kill the worker is claimed max_attempts times and then failed
+    for worker in ['worker1', 'worker2']:
+        assert len(work_queue.claim(worker)) == 1
+        time.sleep(0.2)
+    assert work_queue.claim('worker3') == []
+    assert work_queue.failed() == [('url/a', 'lease expired after 2 attempts')]
+    assert work_queue.retry_failed() == 1
+    assert len(work_queue.claim('worker3')) == 1
+
+
+def test_work_queue_heartbeat(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=0.5)
+    work_queue.enqueue(['a'], ['url/a'])
+    task_id = work_queue.claim('worker1')[0][0]
+    time.sleep(0.3)
+    work_queue.heartbeat('worker1', [task_id])
+    time.sleep(0.3)
+    assert work_queue.claim('worker2') == []
+
+
+def _worker(queue_path, output_dir, log_file):
+    github_crawler_worker(queue_path, ['token'], output_dir=output_dir, log_file=log_file, batch_size=3, poll_interval=0.1)
+
+
+def test_github_crawler_worker(tmp_path):
+    queue_path = str(tmp_path / 'queue.db')
+    with MockGithubServer(pages=2, items_per_page=1) as server:
+        WorkQueue(queue_path).enqueue([f'test{i}' for i in range(20)], [server.api_url(i) for i in range(20)])
+        workers = [mp.Process(target=_worker, args=(queue_path, str(tmp_path / 'data'), str(tmp_path / f'log{i}.txt'))) for i in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    # every url is crawled exactly once by one of the worker
+    assert server.stop()['requests'] == 40
+    assert WorkQueue(queue_path).stats() == {'pending': 0, 'leased': 0, 'done': 20, 'failed': 0}
+    assert len(os.listdir(tmp_path / 'data')) == 20
+    with open(tmp_path / 'data' / 'test7.json', 'r') as infile:
+        assert [item['url'] for item in json.load(infile)] == ['/repos/7/items/0', '/repos/7/items/1']
+
+
+def test_github_crawler_worker_output_format(tmp_path):
+    with pytest.raises(OutputFormatNotSupportedError):
+        github_crawler_worker(str(tmp_path / 'queue.db'), ['token'], output_format='archive')
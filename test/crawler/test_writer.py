@@ -0,0 +1,59 @@
+import pytest
+import json
+import os
+import src.torlib.crawler.github_crawler as gc
+from src.torlib.crawler.github_crawler import OutputFormatNotSupportedError
+from src.torlib.crawler.writer import JsonArrayWriter, JsonLinesWriter
+import responses
+
+
+@pytest.mark.parametrize('pretty_json', [True, False])
+@pytest.mark.parametrize('pages', [[], [[]], [{"test": "test1"}], [[{"a": [1, {"b": "x\ny"}]}, 2], {"c": {}}, [[3, []]]]])
+def test_json_array_writer_same_as_json_dump(tmp_path, pages, pretty_json):
+    save_path = str(tmp_path / 'out.json')
+    writer = JsonArrayWriter(save_path, pretty_json)
+    expected = []
+    for page in pages:
+        writer.write_page(page)
+        expected.extend([page] if type(page) == dict else page)
+    # the file only exist when the writer is closed
+    assert not os.path.exists(save_path)
+    writer.close()
+    with open(save_path, 'r') as outfile:
+        assert outfile.read() == (json.dumps(expected, indent=4) if pretty_json else json.dumps(expected))
+
+
+def test_json_lines_writer(tmp_path):
+    save_path = str(tmp_path / 'out.jsonl')
+    writer = JsonLinesWriter(save_path)
+    writer.write_page([{"id": 1}, {"id": 2}])
+    writer.write_page({"id": 3})
+    writer.close()
+    with open(save_path, 'r') as outfile:
+        assert [json.loads(line) for line in outfile] == [{"id": 1}, {"id": 2}, {"id": 3}]
+
+
+def test_writer_abort(tmp_path):
+    save_path = str(tmp_path / 'out.json')
+    writer = JsonArrayWriter(save_path)
+    writer.write_page([{"id": 1}])
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+
+def test_github_crawler_multipage_output_format_not_supported():
+    with pytest.raises(OutputFormatNotSupportedError):
+        gc.github_crawler_multipage(['1'], ['1'], ['token'], output_format='csv')
+
+
+@responses.activate
+def test_github_crawler_multipage_async_jsonl(tmp_path):
+    link = '<http://test_github/api/1?per_page=100&page=2>; rel="last"'
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=1',
+                  json=[{"id": 1}, {"id": 2}], headers={'X-RateLimit-Remaining': '100', 'link': link})
+    responses.add(responses.GET, 'http://test_github/api/1?per_page=100&page=2',
+                  json=[{"id": 3}], headers={'X-RateLimit-Remaining': '100'})
+    gc.github_crawler_multipage(['test1'], ['http://test_github/api/1'], ['token'], log_file=str(tmp_path / 'log.txt'),
+                                output_dir=str(tmp_path), mode='async', output_format='jsonl', json_codec='json')
+    with open(tmp_path / 'test1.jsonl', 'r') as outfile:
+        assert outfile.read() == '{"id": 1}\n{"id": 2}\n{"id": 3}\n'